@@ -0,0 +1,203 @@
+"""
+Lightweight extraction of Catalog function arguments from utterances.
+
+Values that commands usually carry (quoted text, file names, URLs, numbers,
+the word after "called" and the text after "saying") are picked out with
+regular expressions and assigned to a function's parameters by name and
+annotation. One parameterized function then serves every variant of a
+command, e.g. "create a file called notes.txt" and "... called todo.txt",
+without planning a new function for each.
+"""
+
+import ast
+import inspect
+import re
+import textwrap
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .plan_cache import normalize_utterance
+
+QUOTED_PATTERN = re.compile(r'"([^"]+)"|“([^”]+)”|(?:^|(?<=\s))\'([^\']+)\'(?=\s|$|[.,!?])')
+URL_PATTERN = re.compile(
+    r'\b(?:https?://[^\s,]+|www\.[^\s,]+|[a-z0-9-]+(?:\.[a-z0-9-]+)*\.(?:com|org|net|io|dev|edu|gov|ai|app)\b'
+    r'(?:/[^\s,]*)?)',
+    re.IGNORECASE,
+)
+PATH_PATTERN = re.compile(r'(?:~|\.{1,2})?/[\w./-]+|\b[\w-]+\.[a-zA-Z][a-zA-Z0-9]{0,4}\b')
+NUMBER_PATTERN = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])')
+# "a file called notes", "a folder named Projects"
+NAME_PATTERN = re.compile(r'\b(?:called|named|titled)\s+([^\s,]+)', re.IGNORECASE)
+# "a note saying buy milk", "a file with the text hello world"
+TEXT_PATTERN = re.compile(
+    r'\b(?:saying|that says|containing|with (?:the )?(?:text|content|message))\s+(.+)$',
+    re.IGNORECASE,
+)
+
+# Kinds of values tried for a parameter, chosen by words in its name
+NUMBER_HINTS = ("count", "number", "seconds", "minutes", "hours", "volume", "level", "percent", "amount",
+                "times", "delay", "size")
+URL_HINTS = ("url", "link", "site", "address")
+PATH_HINTS = ("path", "file", "dir", "folder")
+TEXT_HINTS = ("text", "content", "message", "body", "note")
+
+TRAILING_PUNCTUATION = ".,!?;:"
+
+
+@dataclass(frozen=True)
+class Parameter:
+    """A parameter of a Catalog function."""
+
+    name: str
+    # Annotation as source text, e.g. "str"; None if unannotated
+    annotation: Optional[str] = None
+    # Default value as source text; None if the parameter is required
+    default: Optional[str] = None
+
+    @property
+    def required(self) -> bool:
+        return self.default is None
+
+    def source(self) -> str:
+        """The parameter as written in a function signature."""
+        text = f"{self.name}: {self.annotation}" if self.annotation else self.name
+        if self.default is None:
+            return text
+        return f"{text} = {self.default}" if self.annotation else f"{text}={self.default}"
+
+
+def function_parameters(func: Callable) -> List[Parameter]:
+    """Parameters of a function object that can be passed by keyword."""
+    parameters = []
+    for param in inspect.signature(func).parameters.values():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD, param.POSITIONAL_ONLY):
+            continue
+        annotation = param.annotation
+        if annotation is param.empty:
+            annotation = None
+        elif not isinstance(annotation, str):
+            annotation = getattr(annotation, "__name__", None) or str(annotation)
+        default = None if param.default is param.empty else repr(param.default)
+        parameters.append(Parameter(param.name, annotation, default))
+    return parameters
+
+
+def parameters_from_code(code: str) -> List[Parameter]:
+    """
+    Parameters of the last function defined in a snippet of source code.
+
+    Raises:
+        SyntaxError: If the code is not valid Python.
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    functions = [node for node in tree.body if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    if not functions:
+        return []
+    args = functions[-1].args
+    positional = args.args
+    defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+    pairs = list(zip(positional, defaults)) + list(zip(args.kwonlyargs, args.kw_defaults))
+    return [Parameter(arg.arg, ast.unparse(arg.annotation) if arg.annotation else None,
+                      ast.unparse(default) if default is not None else None)
+            for arg, default in pairs]
+
+
+def _strip(value: str) -> str:
+    return value.strip().rstrip(TRAILING_PUNCTUATION)
+
+
+def candidate_values(utterance: str) -> List[Tuple[str, str]]:
+    """
+    Values found in an utterance, as ``(kind, value)`` pairs in order of appearance.
+
+    Kinds are "quoted", "url", "path", "number", "name" and "text". A span of
+    the utterance yields one value per kind at most, and URLs are never also
+    reported as paths.
+    """
+    found: List[Tuple[int, str, str]] = []
+    for match in QUOTED_PATTERN.finditer(utterance):
+        found.append((match.start(), "quoted", next(group for group in match.groups() if group)))
+    urls = []
+    for match in URL_PATTERN.finditer(utterance):
+        urls.append(match.span())
+        found.append((match.start(), "url", _strip(match.group())))
+    for match in PATH_PATTERN.finditer(utterance):
+        if not any(start <= match.start() < end for start, end in urls):
+            found.append((match.start(), "path", _strip(match.group())))
+    for match in NUMBER_PATTERN.finditer(utterance):
+        found.append((match.start(), "number", match.group()))
+    for match in NAME_PATTERN.finditer(utterance):
+        found.append((match.start(1), "name", _strip(match.group(1)).strip("\"'“”")))
+    for match in TEXT_PATTERN.finditer(utterance):
+        found.append((match.start(1), "text", _strip(match.group(1)).strip("\"'“”")))
+    found.sort(key=lambda item: item[0])
+    return [(kind, value) for _, kind, value in found if value]
+
+
+def value_words(utterance: str) -> Set[str]:
+    """Normalized words of every value in an utterance, i.e. the words that are arguments."""
+    return {word for _, value in candidate_values(utterance) for word in normalize_utterance(value).split()}
+
+
+def _kinds(parameter: Parameter) -> Tuple[str, ...]:
+    """Kinds of values to try for a parameter, most likely first."""
+    name = parameter.name.lower()
+    annotation = (parameter.annotation or "").lower()
+    if annotation in ("int", "float") or any(hint in name for hint in NUMBER_HINTS):
+        return ("number",)
+    if annotation == "bool":
+        return ()
+    if any(hint in name for hint in URL_HINTS):
+        return ("url", "quoted")
+    if any(hint in name for hint in PATH_HINTS):
+        return ("path", "quoted", "name")
+    if any(hint in name for hint in TEXT_HINTS):
+        return ("text", "quoted")
+    return ("quoted", "name", "path", "url", "text")
+
+
+def convert_argument(parameter: Parameter, value: Any) -> Any:
+    """Convert a value to the parameter's annotated type where that is unambiguous."""
+    annotation = (parameter.annotation or "").lower()
+    try:
+        if annotation == "int":
+            return int(float(value))
+        if annotation == "float":
+            return float(value)
+    except (TypeError, ValueError):
+        return value
+    if annotation == "str":
+        return str(value)
+    if isinstance(value, str) and NUMBER_PATTERN.fullmatch(value):
+        return float(value) if "." in value else int(value)
+    return value
+
+
+def extract_arguments(parameters: List[Parameter], utterance: str) -> Dict[str, Any]:
+    """
+    Fill parameters from the values in an utterance.
+
+    Every value is used for one parameter at most, and parameters are filled
+    in order. Parameters without a matching value are left out, so defaults
+    apply; see ``missing_arguments``.
+    """
+    candidates = candidate_values(utterance)
+    used: Set[int] = set()
+    arguments: Dict[str, Any] = {}
+    for parameter in parameters:
+        for kind in _kinds(parameter):
+            index = next((i for i, (found_kind, _) in enumerate(candidates)
+                          if found_kind == kind and i not in used), None)
+            if index is None:
+                continue
+            value = candidates[index][1]
+            # The same text may have been found as several kinds; use it only once
+            used.update(i for i, (_, other) in enumerate(candidates) if other == value)
+            arguments[parameter.name] = convert_argument(parameter, value)
+            break
+    return arguments
+
+
+def missing_arguments(parameters: List[Parameter], arguments: Dict[str, Any]) -> List[str]:
+    """Names of required parameters that have no argument."""
+    return [parameter.name for parameter in parameters if parameter.required and parameter.name not in arguments]
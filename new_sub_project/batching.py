@@ -0,0 +1,112 @@
+"""Coalescing of utterances that arrive in bursts, so they are planned together."""
+
+import asyncio
+import contextvars
+import logging
+import os
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from . import metrics
+from .trace_log import in_context, stage
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for more utterances before planning; 0 plans every utterance on its own.
+# Off by default, since the wait delays every command that needs the planner.
+BATCH_WINDOW = float(os.environ.get("META_AGENT_BATCH_WINDOW", "0"))
+
+# Maximum number of utterances planned in one model call
+BATCH_SIZE = int(os.environ.get("META_AGENT_BATCH_SIZE", "8"))
+
+BatchHandler = Callable[[List[str]], Awaitable[None]]
+
+
+class CoalescingBatcher:
+    """
+    Groups utterances submitted close together and handles them as one batch.
+
+    The first utterance opens a window of ``window`` seconds; everything
+    submitted until the window closes, or until ``max_size`` utterances are
+    waiting, goes into the same batch. Batches are handled one at a time, and
+    utterances arriving while one is being handled join the next, so a burst
+    costs one planning call and one catalog reload per batch instead of one
+    per utterance. A batch is handled in the context of its first utterance,
+    so it is traced as part of that command; the others record the wait.
+    """
+
+    def __init__(self, handle: BatchHandler, window: float = BATCH_WINDOW, max_size: int = BATCH_SIZE):
+        self.handle = handle
+        self.window = window
+        self.max_size = max(max_size, 1)
+        self._pending: List[Tuple[str, asyncio.Future, contextvars.Context]] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._full: Optional[asyncio.Event] = None
+
+    async def submit(self, utterance: str) -> None:
+        """
+        Add an utterance to the open batch and wait until its batch was handled.
+
+        Must be called on the event loop. Raises whatever handling the batch
+        raised, and CancelledError if handling was cancelled.
+        """
+        if self.window <= 0:
+            await self.handle([utterance])
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((utterance, future, contextvars.copy_context()))
+        if self._flusher is None or self._flusher.done():
+            self._full = asyncio.Event()
+            self._flusher = asyncio.ensure_future(self._flush())
+        if len(self._pending) >= self.max_size:
+            self._full.set()
+        with stage("planning_batch"):
+            await asyncio.shield(future)
+
+    async def _flush(self) -> None:
+        """
+        Once the window has passed, handle batches until no utterance is waiting.
+
+        Every submitted utterance gets its outcome, even if this task is
+        cancelled or handling raises something other than an Exception;
+        utterances that were not handled then fail the same way.
+        """
+        error: Optional[BaseException] = None
+        try:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.window)
+            except asyncio.TimeoutError:
+                pass
+            # Utterances that arrive while a batch is handled form the next one
+            while self._pending:
+                batch = self._pending[:self.max_size]
+                utterances = [utterance for utterance, _, _ in batch]
+                metrics.increment("batching.batches")
+                metrics.increment("batching.utterances", len(utterances))
+                if len(utterances) > 1:
+                    logger.info(f"Planning {len(utterances)} utterances together")
+                try:
+                    await in_context(batch[0][2], lambda: self.handle(utterances))
+                except Exception as e:
+                    self._resolve(batch, e)
+                else:
+                    self._resolve(batch, None)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if self._pending:
+                self._resolve(self._pending, error or asyncio.CancelledError())
+
+    def _resolve(self, batch: List[Tuple[str, asyncio.Future, contextvars.Context]],
+                 error: Optional[BaseException]) -> None:
+        """Remove a batch from the waiting utterances and hand its outcome to their submitters."""
+        self._pending = [entry for entry in self._pending if entry not in batch]
+        for _, future, _ in batch:
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(None)
+            elif isinstance(error, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(error)
@@ -0,0 +1,284 @@
+"""
+End-to-end latency benchmark from utterance to execution, without network.
+
+Scripted utterances from a corpus are fed through a stand-in for
+LiveTranscriber into ``process_utterance`` (or ``process_command`` of the
+simple prototype), with a deterministic fake model behind the SDK's
+``Runner``. Every round runs in a fresh copy of the package with an empty
+catalog and with the home directory pointed at that copy, so planning,
+catalog appends and reloads happen as they would for a new user and nothing
+outside the copy is touched. The p50/p95/p99 of every stage go to a JSON
+report; with ``--baseline`` the run fails if a stage got slower than the
+tolerance allows.
+
+Run it from the repository root:
+
+    python -m new_sub_project.benchmark --rounds 5 --output benchmark.json
+    python -m new_sub_project.benchmark --baseline benchmark.json
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PACKAGE_DIR = Path(__file__).parent
+DEFAULT_CORPUS_PATH = PACKAGE_DIR / "benchmark_corpus.json"
+DEFAULT_REPORT_PATH = Path("benchmark.json")
+
+# Stages in the order they happen; "utterance" is the whole path from transcript to result
+STAGES = ["plan", "parse", "catalog_append", "reload", "execute", "utterance"]
+PERCENTILES = [50, 95, 99]
+
+# Slowdown of a stage's p95 over the baseline that counts as a regression
+REGRESSION_TOLERANCE = 0.2
+
+# Smaller differences are noise, however large relative to the baseline (seconds)
+REGRESSION_FLOOR = 0.002
+
+# State files that are not copied into a benchmark workspace
+STATE_FILES = {"journal.db", "journal.db-wal", "journal.db-shm", "plan_cache.json", "intents.json",
+               "metrics.json", "handover.json", "startup_profile.json", "usage.json", "manifest.json"}
+
+
+class FakeTranscriber:
+    """
+    Stand-in for LiveTranscriber that reads utterances from a script.
+
+    Takes the same callbacks as LiveTranscriber. With an interim callback,
+    every utterance is first reported word by word as interim transcripts.
+    With ``burst`` above 1, utterances are delivered that many at a time
+    without waiting for each other, as when commands are spoken in quick
+    succession. The time each final callback takes is recorded as the
+    "utterance" stage.
+    """
+
+    def __init__(self, callback: Callable, utterances: List[str],
+                 interim_callback: Optional[Callable] = None, burst: int = 1):
+        self.callback = callback
+        self.utterances = utterances
+        self.interim_callback = interim_callback
+        self.burst = max(burst, 1)
+
+    def run(self) -> None:
+        """Deliver every utterance and wait until its callback returns."""
+        asyncio.run(self._deliver())
+
+    async def _deliver(self) -> None:
+        for start in range(0, len(self.utterances), self.burst):
+            await asyncio.gather(*(self._deliver_one(utterance)
+                                   for utterance in self.utterances[start:start + self.burst]))
+
+    async def _deliver_one(self, utterance: str) -> None:
+        from . import metrics
+
+        if self.interim_callback is not None:
+            words = utterance.split()
+            for count in range(1, len(words)):
+                await _call(self.interim_callback, " ".join(words[:count]), self)
+        with metrics.timed("stage.utterance"):
+            await _call(self.callback, utterance, self)
+
+
+async def _call(callback: Callable, text: str, transcriber: FakeTranscriber) -> None:
+    """Call a transcriber callback, awaiting it if it is a coroutine function."""
+    result = callback(text, transcriber)
+    if inspect.isawaitable(result):
+        await result
+
+
+def percentile(values: List[float], q: float) -> float:
+    """The q-th percentile of the values, interpolating between the nearest ranks."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    """Count, mean, max and percentiles of every stage that has samples, in seconds."""
+    summary = {}
+    for stage in STAGES + sorted(set(samples) - set(STAGES)):
+        values = samples.get(stage)
+        if not values:
+            continue
+        summary[stage] = {"count": len(values), "mean": sum(values) / len(values), "max": max(values),
+                          **{f"p{q}": percentile(values, q) for q in PERCENTILES}}
+    return summary
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any],
+            tolerance: float = REGRESSION_TOLERANCE) -> List[str]:
+    """Describe every stage whose p95 regressed against the baseline."""
+    regressions = []
+    for stage, stats in report["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if before is None:
+            continue
+        if stats["p95"] > before["p95"] * (1 + tolerance) and stats["p95"] - before["p95"] > REGRESSION_FLOOR:
+            regressions.append(f"{stage}: p95 {before['p95'] * 1000:.1f} ms -> {stats['p95'] * 1000:.1f} ms")
+    return regressions
+
+
+def _ignore_state(directory: str, names: List[str]) -> List[str]:
+    """Leave caches, state files and stored catalog functions out of a workspace copy."""
+    ignored = [name for name in names if name == "__pycache__" or name in STATE_FILES]
+    if Path(directory).name in ("functions", "archive") and Path(directory).parent.name == "catalog":
+        ignored += [name for name in names if name.endswith(".py") and name != "__init__.py"]
+    return ignored
+
+
+def _run_round(workspace: Path, corpus_path: Path, target: str, model_latency: float,
+               burst: int = 1) -> Dict[str, List[float]]:
+    """Run the corpus once in a fresh copy of the package; returns the stage samples."""
+    shutil.copytree(PACKAGE_DIR, workspace / PACKAGE_DIR.name, ignore=_ignore_state)
+    samples_path = workspace / "samples.json"
+    # Functions that write to the home directory write to the workspace instead
+    (workspace / "Desktop").mkdir()
+    # Restarting the process would end the benchmark, so catalog changes are always hot-reloaded
+    env = dict(os.environ, META_AGENT_RELOAD_MODE="hot", HOME=str(workspace))
+    subprocess.run(
+        [sys.executable, "-m", f"{__package__}.benchmark", "--worker", str(samples_path),
+         "--corpus", str(corpus_path), "--target", target, "--model-latency", str(model_latency),
+         "--burst", str(burst)],
+        cwd=workspace, env=env, check=True,
+    )
+    return json.loads(samples_path.read_text())
+
+
+def run_benchmark(corpus_path: Path = DEFAULT_CORPUS_PATH, rounds: int = 3, target: str = "full",
+                  model_latency: float = 0.0, burst: int = 1) -> Dict[str, Any]:
+    """
+    Run the corpus ``rounds`` times, each in its own workspace.
+
+    Returns:
+        The report: run settings and the summary of every stage.
+    """
+    corpus_path = corpus_path.resolve()
+    samples: Dict[str, List[float]] = defaultdict(list)
+    for round_number in range(1, rounds + 1):
+        logger.info(f"Benchmark round {round_number} of {rounds}")
+        with tempfile.TemporaryDirectory(prefix="meta-agent-benchmark-") as workspace:
+            for stage, values in _run_round(Path(workspace), corpus_path, target, model_latency, burst).items():
+                samples[stage].extend(values)
+    return {
+        "settings": {
+            "target": target,
+            "rounds": rounds,
+            "corpus": str(corpus_path),
+            "model_latency": model_latency,
+            "burst": burst,
+            "planner_mode": os.environ.get("META_AGENT_PLANNER_MODE", "text").lower(),
+            "executor": os.environ.get("META_AGENT_EXECUTOR", "pool").lower(),
+            "python": platform.python_version(),
+            "timestamp": time.time(),
+        },
+        "stages": summarize(samples),
+    }
+
+
+def _worker_main(samples_path: Path, corpus_path: Path, target: str, model_latency: float,
+                 burst: int = 1) -> None:
+    """Run the corpus through the assistant in this process and save the stage samples."""
+    from . import metrics
+    from .executor_pool import shutdown, warm_up
+
+    corpus = json.loads(corpus_path.read_text())
+    samples: Dict[str, List[float]] = defaultdict(list)
+
+    def keep_stage_samples(name: str, value: float) -> None:
+        if name.startswith("stage."):
+            samples[name[len("stage."):]].append(value)
+
+    metrics.add_observer(keep_stage_samples)
+    if target == "simple":
+        from . import simple_prototype
+
+        transcriber = FakeTranscriber(simple_prototype.manager, [entry["utterance"] for entry in corpus],
+                                      burst=burst)
+    else:
+        from agents import set_tracing_disabled
+        from . import prototype
+        from .fake_model import FakeModelProvider
+
+        # Nothing may leave the machine, traces included
+        set_tracing_disabled(True)
+        prototype.set_model_provider(FakeModelProvider(corpus, model_latency))
+        prototype.start()
+        transcriber = FakeTranscriber(prototype.manager, [entry["utterance"] for entry in corpus],
+                                      burst=burst, **prototype.transcriber_options(FakeTranscriber))
+    warm_up()
+    try:
+        transcriber.run()
+    finally:
+        shutdown()
+    samples_path.write_text(json.dumps(samples))
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    """Print the stage summary as a table, in milliseconds."""
+    print(f"{'stage':<16}{'count':>7}" + "".join(f"{f'p{q}':>10}" for q in PERCENTILES) + f"{'max':>10}")
+    for stage, stats in report["stages"].items():
+        print(f"{stage:<16}{stats['count']:>7}"
+              + "".join(f"{stats[f'p{q}'] * 1000:>10.2f}" for q in PERCENTILES)
+              + f"{stats['max'] * 1000:>10.2f}")
+
+
+def main() -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark the meta-agent from utterance to execution")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS_PATH,
+                        help="JSON list of utterances and the plans the fake model returns for them")
+    parser.add_argument("--rounds", type=int, default=3, help="fresh-catalog runs of the corpus (default 3)")
+    parser.add_argument("--target", choices=["full", "simple"], default="full",
+                        help="drive prototype.process_utterance or simple_prototype.process_command")
+    parser.add_argument("--model-latency", type=float, default=0.0,
+                        help="seconds the fake model waits before answering (default 0)")
+    parser.add_argument("--burst", type=int, default=1,
+                        help="utterances delivered at once, to exercise batched planning (default 1)")
+    parser.add_argument("--output", type=Path, default=DEFAULT_REPORT_PATH,
+                        help=f"where to write the JSON report (default {DEFAULT_REPORT_PATH})")
+    parser.add_argument("--baseline", type=Path,
+                        help="earlier report to compare against; exits with status 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help=f"allowed relative p95 slowdown per stage (default {REGRESSION_TOLERANCE:g})")
+    parser.add_argument("--worker", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        logging.basicConfig(level=logging.WARNING)
+        _worker_main(args.worker, args.corpus, args.target, args.model_latency, args.burst)
+        return
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # Read the baseline first, since it may be the file about to be overwritten
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    report = run_benchmark(args.corpus, args.rounds, args.target, args.model_latency, args.burst)
+    args.output.write_text(json.dumps(report, indent=2))
+    _print_report(report)
+    print(f"Report written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
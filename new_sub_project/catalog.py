@@ -1,6 +0,0 @@
-class Catalog:
-    """
-    Catalog of functions that can be called by the meta-agent.
-    This class will be dynamically extended by the meta-agent based on user commands.
-    """
-    pass 
\ No newline at end of file
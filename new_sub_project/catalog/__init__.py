@@ -0,0 +1,96 @@
+"""
+Catalog of functions that can be called by the meta-agent.
+
+Each function lives in its own module under ``functions/`` and is listed in
+``manifest.json``. Modules are imported lazily on first attribute access, so
+startup cost does not grow with the size of the catalog. Cold functions are
+moved to ``archive/``, whose manifest is only read when an archived function
+is asked for by name.
+"""
+
+import importlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from .. import usage_stats
+from ..catalog_store import ARCHIVE_MANIFEST_PATH, load_manifest
+
+_manifest = load_manifest()
+_archive: Optional[Dict[str, Dict[str, Any]]] = None
+
+
+def _archived(name: str) -> Optional[Dict[str, Any]]:
+    """Manifest entry of an archived function, reading the archive manifest on first use."""
+    global _archive
+    if _archive is None:
+        _archive = load_manifest(ARCHIVE_MANIFEST_PATH)
+    return _archive.get(name)
+
+
+def function_names() -> List[str]:
+    """
+    Names of the hot functions, most frequently used first, without importing them.
+
+    Aliases and archived functions are left out.
+    """
+    names = [name for name, entry in _manifest.items() if not entry.get("alias_of")]
+    return sorted(names, key=usage_stats.call_count, reverse=True)
+
+
+def function_docs() -> Dict[str, Optional[str]]:
+    """Docstrings of the hot functions, without importing them. Aliases are left out."""
+    return {name: entry.get("doc") for name, entry in _manifest.items() if not entry.get("alias_of")}
+
+
+def _reload_manifests() -> None:
+    """Read both manifests again, after functions were moved or removed by another process."""
+    global _manifest, _archive
+    _manifest = load_manifest()
+    _archive = None
+    importlib.invalidate_caches()
+
+
+def _lookup(name: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Package and manifest entry of a function, looking in the archive if it is not hot."""
+    entry = _manifest.get(name)
+    if entry is not None:
+        return "functions", entry
+    if name.startswith("__"):
+        return None
+    entry = _archived(name)
+    return ("archive", entry) if entry is not None else None
+
+
+class _LazyCatalog(type):
+    """Metaclass that imports catalog functions on first access."""
+
+    def __getattr__(cls, name: str):
+        found = _lookup(name)
+        if found is None:
+            raise AttributeError(name)
+        try:
+            module = importlib.import_module(f"{__name__}.{found[0]}.{found[1]['module']}")
+        except ImportError:
+            # The manifest read at import time is stale if the function was
+            # archived, restored or removed since; look it up again
+            _reload_manifests()
+            found = _lookup(name)
+            if found is None:
+                raise AttributeError(name) from None
+            try:
+                module = importlib.import_module(f"{__name__}.{found[0]}.{found[1]['module']}")
+            except ImportError as e:
+                raise AttributeError(f"{name}: its module cannot be imported: {e}") from e
+        func = getattr(module, found[1].get("alias_of", name))
+        setattr(cls, name, staticmethod(func))
+        return func
+
+    def __dir__(cls) -> List[str]:
+        return sorted(set(super().__dir__()) | set(_manifest))
+
+
+class Catalog(metaclass=_LazyCatalog):
+    """
+    Catalog of functions that can be called by the meta-agent.
+    This class will be dynamically extended by the meta-agent based on user commands.
+    """
+    pass
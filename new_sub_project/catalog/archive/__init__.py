@@ -0,0 +1 @@
+"""Archived Catalog function modules, imported only when asked for by name."""
@@ -0,0 +1 @@
+"""Generated Catalog function modules, one per function."""
@@ -0,0 +1,99 @@
+"""
+Compaction of the Catalog into a small hot tier and an archive of cold functions.
+
+Run it from the repository root, e.g. from a periodic job:
+
+    python -m new_sub_project.catalog_compaction --hot-size 50 --cold-after-days 30
+"""
+
+import argparse
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from . import usage_stats
+from .catalog_store import (ARCHIVE_DIR, ARCHIVE_MANIFEST_PATH, FUNCTIONS_DIR, archive_functions,
+                            catalog_lock, load_manifest, restore_functions)
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of functions kept in the hot tier
+HOT_SIZE = int(os.environ.get("META_AGENT_HOT_SIZE", "50"))
+
+# Functions not used for this many days are archived regardless of rank
+COLD_AFTER_DAYS = float(os.environ.get("META_AGENT_COLD_AFTER_DAYS", "30"))
+
+
+def _last_activity(name: str, entry: Dict[str, Any], directory: Path) -> float:
+    """When a function was last used, or added if it never ran."""
+    last_used = usage_stats.last_used(name)
+    if last_used is not None:
+        return last_used
+    if "added_at" in entry:
+        return entry["added_at"]
+    try:
+        return (directory / f"{entry['module']}.py").stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+@catalog_lock()
+def compact_catalog(hot_size: int = HOT_SIZE, cold_after_days: float = COLD_AFTER_DAYS,
+                    now: Optional[float] = None) -> Dict[str, List[str]]:
+    """
+    Keep only the most used, recently active functions in the hot tier.
+
+    Functions are ranked by call count, including calls through their
+    aliases, then by last activity. The top
+    ``hot_size`` among those active in the last ``cold_after_days`` days stay
+    in or return to the hot tier; all others move to the archive, together
+    with their aliases. The catalog stays locked throughout, so the
+    assistant can keep adding functions while this runs as a separate job.
+
+    Returns:
+        Names of the functions archived and restored.
+    """
+    cutoff = (time.time() if now is None else now) - cold_after_days * 86400
+    hot_manifest = load_manifest()
+    archive_manifest = load_manifest(ARCHIVE_MANIFEST_PATH)
+    hot = {name: entry for name, entry in hot_manifest.items() if not entry.get("alias_of")}
+    archived = {name: entry for name, entry in archive_manifest.items() if not entry.get("alias_of")}
+    calls = {name: usage_stats.call_count(name) for name in {**hot, **archived}}
+    for alias, entry in {**archive_manifest, **hot_manifest}.items():
+        if entry.get("alias_of") in calls:
+            calls[entry["alias_of"]] += usage_stats.call_count(alias)
+
+    activity = {name: _last_activity(name, entry, FUNCTIONS_DIR) for name, entry in hot.items()}
+    activity.update({name: _last_activity(name, entry, ARCHIVE_DIR) for name, entry in archived.items()})
+    ranked = sorted((name for name, last in activity.items() if last >= cutoff),
+                    key=lambda name: (calls[name], activity[name]), reverse=True)
+    keep = set(ranked[:hot_size])
+
+    result = {
+        "archived": archive_functions(name for name in hot if name not in keep),
+        "restored": restore_functions(name for name in archived if name in keep),
+    }
+    logger.info(f"Compacted catalog: {len(result['archived'])} archived, "
+                f"{len(result['restored'])} restored, {len(keep)} hot")
+    return result
+
+
+def main() -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Move cold Catalog functions to the archive tier")
+    parser.add_argument("--hot-size", type=int, default=HOT_SIZE,
+                        help=f"functions to keep in the hot tier (default {HOT_SIZE})")
+    parser.add_argument("--cold-after-days", type=float, default=COLD_AFTER_DAYS,
+                        help=f"archive functions unused for this many days (default {COLD_AFTER_DAYS:g})")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    result = compact_catalog(args.hot_size, args.cold_after_days)
+    for action, names in result.items():
+        if names:
+            print(f"{action}: {', '.join(names)}")
+
+
+if __name__ == "__main__":
+    main()
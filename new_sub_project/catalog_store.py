@@ -0,0 +1,294 @@
+"""
+Storage for the Catalog: one module per function plus a JSON manifest.
+
+Functions live in one of two tiers. The hot tier (``functions/`` and
+``manifest.json``) is loaded at startup and shown to the planner; the archive
+tier (``archive/`` with its own manifest) holds cold functions and is only
+read when one of them is asked for by name.
+"""
+
+import ast
+import fcntl
+import hashlib
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from types import CodeType
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .fingerprint import function_fingerprint
+from .function_parser import function_signature, functions_from_block
+from .function_staging import StagedFunction, StagingError, stage_function, write_bytecode
+
+logger = logging.getLogger(__name__)
+
+CATALOG_DIR = Path(__file__).parent / "catalog"
+FUNCTIONS_DIR = CATALOG_DIR / "functions"
+MANIFEST_PATH = CATALOG_DIR / "manifest.json"
+ARCHIVE_DIR = CATALOG_DIR / "archive"
+ARCHIVE_MANIFEST_PATH = ARCHIVE_DIR / "manifest.json"
+LOCK_PATH = CATALOG_DIR / ".lock"
+
+MODULE_HEADER = '''"""Catalog function ``{name}``."""
+
+from .. import Catalog
+'''
+
+# Serializes catalog updates between the threads of this process; the file
+# lock does the same between processes, such as the compaction job
+_thread_lock = threading.RLock()
+_lock_depth = 0
+
+
+@contextmanager
+def catalog_lock() -> Iterator[None]:
+    """
+    Hold the catalog's file lock, for reading, modifying and writing its files.
+
+    Re-entrant within a thread, so locked operations can call each other.
+    """
+    global _lock_depth
+    with _thread_lock:
+        if _lock_depth:
+            _lock_depth += 1
+            try:
+                yield
+            finally:
+                _lock_depth -= 1
+            return
+        CATALOG_DIR.mkdir(parents=True, exist_ok=True)
+        with open(LOCK_PATH, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            _lock_depth = 1
+            try:
+                yield
+            finally:
+                _lock_depth = 0
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_manifest(path: Path = MANIFEST_PATH) -> Dict[str, Dict[str, Any]]:
+    """Load the manifest mapping function names to their module and docstring."""
+    if path.exists():
+        return json.loads(path.read_text())
+    return {}
+
+
+def save_manifest(manifest: Dict[str, Dict[str, Any]], path: Path = MANIFEST_PATH) -> None:
+    """Atomically write the manifest to disk."""
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    tmp_path.replace(path)
+
+
+def _module_prefix(name: str) -> str:
+    """Text of a function module before the function's source."""
+    return f"{MODULE_HEADER.format(name=name)}\n\n"
+
+
+@catalog_lock()
+def write_function(name: str, source: str, fingerprint: Optional[str] = None,
+                   code: Optional[CodeType] = None) -> None:
+    """
+    Write a single function module and register it in the manifest.
+
+    ``code`` is the staged, compiled module; it is written as the module's
+    cached bytecode.
+    """
+    FUNCTIONS_DIR.mkdir(parents=True, exist_ok=True)
+    module_path = FUNCTIONS_DIR / f"{name}.py"
+    module_source = f"{_module_prefix(name)}{source}\n".encode("utf-8")
+    module_path.write_bytes(module_source)
+    if code is not None:
+        try:
+            write_bytecode(code, module_path, module_source)
+        except OSError as e:
+            logger.warning(f"Could not cache the bytecode of {name}: {e}")
+
+    # An archived function of the same name is superseded by the new code
+    archive = load_manifest(ARCHIVE_MANIFEST_PATH)
+    if name in archive:
+        _remove_group(archive, name, ARCHIVE_DIR)
+        save_manifest(archive, ARCHIVE_MANIFEST_PATH)
+
+    node = ast.parse(source).body[-1]
+    manifest = load_manifest()
+    # Aliases stood for the previous code, which is gone now
+    for alias in [alias for alias, entry in manifest.items() if entry.get("alias_of") == name]:
+        logger.info(f"Dropping alias {alias} of rewritten function {name}")
+        del manifest[alias]
+    manifest[name] = {"module": name, "doc": ast.get_docstring(node), "signature": function_signature(node),
+                      "fingerprint": fingerprint, "added_at": time.time()}
+    save_manifest(manifest)
+
+
+@catalog_lock()
+def add_alias(name: str, target: str) -> None:
+    """Register ``name`` as another name for the existing function ``target``."""
+    manifest = load_manifest()
+    entry = manifest[target]
+    manifest[name] = {"module": entry["module"], "doc": entry.get("doc"),
+                      "fingerprint": entry.get("fingerprint"), "alias_of": entry.get("alias_of", target)}
+    save_manifest(manifest)
+
+
+def fingerprint_index(manifest: Dict[str, Dict[str, Any]], directory: Path = FUNCTIONS_DIR) -> Dict[str, str]:
+    """
+    Map the fingerprint of every stored function to its name.
+
+    Entries written before fingerprints were recorded are fingerprinted from
+    their module source in ``directory``.
+    """
+    index = {}
+    for name, entry in manifest.items():
+        if entry.get("alias_of"):
+            continue
+        fingerprint = entry.get("fingerprint")
+        if fingerprint is None:
+            try:
+                source = (directory / f"{entry['module']}.py").read_text(encoding="utf-8")
+                fingerprint = function_fingerprint(source)
+            except (OSError, SyntaxError, ValueError):
+                continue
+        index.setdefault(fingerprint, name)
+    return index
+
+
+def stage_code(code: str) -> Dict[str, StagedFunction]:
+    """
+    Compile and check every function defined in a snippet of catalog code as its own module.
+
+    Nothing is written or executed. Missing imports of well-known names are added.
+
+    Raises:
+        StagingError: If any function cannot be made into a working module;
+            the message lists the problems of every such function.
+    """
+    try:
+        functions = functions_from_block(code)
+    except SyntaxError as e:
+        raise StagingError(f"Invalid Python: {e}") from e
+    staged = {}
+    problems = []
+    for name, source in functions.items():
+        try:
+            staged[name] = stage_function(name, source, _module_prefix(name), str(FUNCTIONS_DIR / f"{name}.py"))
+        except StagingError as e:
+            problems.append(str(e))
+    if problems:
+        raise StagingError("; ".join(problems))
+    return staged
+
+
+@catalog_lock()
+def append_to_catalog(code: str, staged: Optional[Dict[str, StagedFunction]] = None) -> List[str]:
+    """
+    Store every function defined in a snippet of catalog code.
+
+    Accepts code written for the Catalog class body (indented and decorated
+    with ``@staticmethod``) as well as plain top-level functions. The code is
+    staged first, unless ``staged`` holds the result of ``stage_code`` for
+    it, so nothing is stored if any function is broken. A function whose
+    normalized AST matches one already in the catalog is not written again:
+    under the same name it is reused as is, under a new name it is registered
+    as an alias of the existing function. Matching archived functions are
+    moved back to the hot tier.
+
+    Returns:
+        Names of the functions whose code was written.
+
+    Raises:
+        StagingError: If the code does not stage.
+    """
+    if staged is None:
+        staged = stage_code(code)
+    manifest = load_manifest()
+    archive = load_manifest(ARCHIVE_MANIFEST_PATH)
+    archived = fingerprint_index(archive, ARCHIVE_DIR)
+    index = fingerprint_index(manifest)
+    written = []
+    for name, function in staged.items():
+        source = function.source
+        fingerprint = function_fingerprint(source)
+        existing = index.get(fingerprint)
+        if existing is None and fingerprint in archived:
+            existing = archived.pop(fingerprint)
+            restore_functions([existing])
+            manifest = load_manifest()
+            index[fingerprint] = existing
+            logger.info(f"Restored archived catalog function: {existing}")
+        if existing == name or (existing and manifest.get(name, {}).get("alias_of") == existing):
+            logger.info(f"Reusing catalog function: {name}")
+            continue
+        if existing and name not in manifest:
+            add_alias(name, existing)
+            manifest = load_manifest()
+            logger.info(f"Reusing catalog function {existing} as {name}")
+            continue
+        write_function(name, source, fingerprint, function.code)
+        manifest = load_manifest()
+        index[fingerprint] = name
+        written.append(name)
+        logger.info(f"Stored catalog function: {name}")
+    return written
+
+
+def _group(manifest: Dict[str, Dict[str, Any]], name: str) -> List[str]:
+    """A function and all of its aliases."""
+    return [name] + [alias for alias, entry in manifest.items() if entry.get("alias_of") == name]
+
+
+def _remove_group(manifest: Dict[str, Dict[str, Any]], name: str, directory: Path) -> None:
+    """Delete a function, its aliases and its module from a tier."""
+    for member in _group(manifest, name):
+        del manifest[member]
+    (directory / f"{name}.py").unlink(missing_ok=True)
+
+
+@catalog_lock()
+def _move_functions(names: Iterable[str], source_dir: Path, source_manifest_path: Path,
+                    target_dir: Path, target_manifest_path: Path) -> List[str]:
+    """Move functions, with their aliases and modules, from one tier to the other."""
+    source = load_manifest(source_manifest_path)
+    target = load_manifest(target_manifest_path)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    moved = []
+    for name in names:
+        entry = source.get(name)
+        if entry is None or entry.get("alias_of"):
+            continue
+        module_path = source_dir / f"{entry['module']}.py"
+        if module_path.exists():
+            module_path.replace(target_dir / module_path.name)
+        for member in _group(source, name):
+            target[member] = source.pop(member)
+        moved.append(name)
+    save_manifest(target, target_manifest_path)
+    save_manifest(source, source_manifest_path)
+    return moved
+
+
+def archive_functions(names: Iterable[str]) -> List[str]:
+    """Move functions from the hot tier to the archive; returns the ones moved."""
+    return _move_functions(names, FUNCTIONS_DIR, MANIFEST_PATH, ARCHIVE_DIR, ARCHIVE_MANIFEST_PATH)
+
+
+def restore_functions(names: Iterable[str]) -> List[str]:
+    """Move archived functions back to the hot tier; returns the ones moved."""
+    return _move_functions(names, ARCHIVE_DIR, ARCHIVE_MANIFEST_PATH, FUNCTIONS_DIR, MANIFEST_PATH)
+
+
+def manifest_version() -> str:
+    """
+    Version of the catalog on disk; changes whenever the manifest content changes.
+
+    It is a hash of the manifest rather than its modification time, which
+    some filesystems only record to the second.
+    """
+    try:
+        return hashlib.sha256(MANIFEST_PATH.read_bytes()).hexdigest()[:16]
+    except FileNotFoundError:
+        return ""
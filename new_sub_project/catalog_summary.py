@@ -0,0 +1,106 @@
+"""Compact, token-budgeted listings of Catalog functions for the planner."""
+
+import ast
+import os
+from typing import Dict, List, Optional
+
+from .catalog_store import FUNCTIONS_DIR, load_manifest, manifest_version
+from .function_parser import function_signature
+
+# Maximum size of one page of tool output, in estimated tokens
+TOKEN_BUDGET = int(os.environ.get("META_AGENT_TOOL_TOKEN_BUDGET", "800"))
+
+# Rough characters-per-token ratio of English text and code
+CHARS_PER_TOKEN = 4
+
+# Tokens kept free on every page for the pagination note
+FOOTER_TOKENS = 20
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a text without a tokenizer."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _first_line(doc: Optional[str]) -> str:
+    """First line of a docstring, or an empty string."""
+    return doc.strip().splitlines()[0] if doc and doc.strip() else ""
+
+
+def _signature_from_module(name: str, module: str) -> str:
+    """Read the signature of a function stored before signatures were recorded."""
+    try:
+        tree = ast.parse((FUNCTIONS_DIR / f"{module}.py").read_text(encoding="utf-8"))
+    except (OSError, SyntaxError):
+        return f"{name}()"
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == name:
+            return function_signature(node)
+    return f"{name}()"
+
+
+class CatalogSummary:
+    """
+    One line per hot Catalog function: its signature and one-line docstring.
+
+    The lines are built from the manifest, without importing any function,
+    and rebuilt only when the manifest changes. Listings are split into pages
+    that each fit the token budget, so the planner's input stays the same size
+    however large the catalog grows.
+    """
+
+    def __init__(self, token_budget: int = TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self._version: Optional[str] = None
+        self._lines: Dict[str, str] = {}
+
+    def lines(self) -> Dict[str, str]:
+        """Summary line of every hot function, keyed by name."""
+        version = manifest_version()
+        if version != self._version:
+            lines = {}
+            for name, entry in load_manifest().items():
+                if entry.get("alias_of"):
+                    continue
+                signature = entry.get("signature") or _signature_from_module(name, entry["module"])
+                doc = _first_line(entry.get("doc"))
+                lines[name] = f"- {signature}: {doc}" if doc else f"- {signature}"
+            self._lines = lines
+            self._version = version
+        return self._lines
+
+    def _pages(self, names: List[str]) -> List[List[str]]:
+        """Split the summary lines of the given functions into pages."""
+        budget = max(self.token_budget - FOOTER_TOKENS, 1)
+        lines = self.lines()
+        pages: List[List[str]] = [[]]
+        used = 0
+        for name in names:
+            line = lines.get(name)
+            if line is None:
+                continue
+            # A single line never exceeds a page
+            line = line[:budget * CHARS_PER_TOKEN]
+            tokens = estimate_tokens(line)
+            if used + tokens > budget and pages[-1]:
+                pages.append([])
+                used = 0
+            pages[-1].append(line)
+            used += tokens
+        return pages
+
+    def render(self, names: List[str], page: int = 1) -> str:
+        """
+        Render one page of the listing of the given functions, in the given order.
+
+        Pages are numbered from 1; out-of-range pages are clamped.
+        """
+        pages = self._pages(names)
+        if not pages[0]:
+            return ""
+        page = min(max(page, 1), len(pages))
+        text = "\n".join(pages[page - 1])
+        if len(pages) > 1:
+            text += f"\n(page {page} of {len(pages)}"
+            text += f"; call again with page={page + 1} for more)" if page < len(pages) else ")"
+        return text
@@ -0,0 +1,145 @@
+"""Durable journal of Catalog calls that still have to run or already ran."""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_PATH = Path(__file__).parent / "journal.db"
+
+# Days that failed and interrupted calls are kept for inspection; done calls are pruned at startup
+JOURNAL_RETENTION_DAYS = float(os.environ.get("META_AGENT_JOURNAL_RETENTION_DAYS", "7"))
+
+# Entry lifecycle: pending -> running -> done | failed. Entries still running
+# when the process died become interrupted and are not run again.
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+INTERRUPTED = "interrupted"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    call TEXT NOT NULL,
+    kwargs TEXT NOT NULL,
+    details TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calls_by_status ON calls (status, id);
+"""
+
+
+@dataclass
+class JournalEntry:
+    """One journaled call."""
+
+    id: int
+    call: str
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    # Context needed after the call ran, e.g. the utterance and plan steps
+    details: Dict[str, Any] = field(default_factory=dict)
+    status: str = PENDING
+    created_at: float = 0.0
+
+
+class CommandJournal:
+    """
+    Log of calls, stored in SQLite in WAL mode.
+
+    Every call is appended as pending and claimed before it runs, so a call
+    runs at most once even if several processes replay the same journal.
+    """
+
+    def __init__(self, path: Path = JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def recover(self) -> int:
+        """
+        Mark calls left running by a previous process as interrupted, and prune finished calls.
+
+        Done calls are deleted, failed and interrupted ones once they are
+        older than ``JOURNAL_RETENTION_DAYS``, so the journal only grows with
+        the calls still to run. Call once at startup, before any call is
+        claimed. Returns the number of interrupted calls.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE calls SET status = ?, updated_at = ? WHERE status = ?",
+                (INTERRUPTED, now, RUNNING))
+            pruned = self._conn.execute(
+                "DELETE FROM calls WHERE status = ? OR (status IN (?, ?) AND updated_at < ?)",
+                (DONE, FAILED, INTERRUPTED, now - JOURNAL_RETENTION_DAYS * 86400)).rowcount
+        if cursor.rowcount:
+            logger.warning(f"{cursor.rowcount} call(s) were interrupted by a restart and will not be repeated")
+        if pruned:
+            logger.info(f"Pruned {pruned} finished call(s) from the journal")
+        return cursor.rowcount
+
+    def append(self, call: str, kwargs: Optional[Dict[str, Any]] = None, **details: Any) -> int:
+        """Add a pending call; returns its id."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO calls (call, kwargs, details, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (call, json.dumps(kwargs or {}), json.dumps(details), PENDING, now, now))
+        return cursor.lastrowid
+
+    def claim_next(self) -> Optional[JournalEntry]:
+        """Mark the oldest pending call as running and return it, or None if there is none."""
+        with self._lock:
+            while True:
+                row = self._conn.execute(
+                    "SELECT id, call, kwargs, details, created_at FROM calls "
+                    "WHERE status = ? ORDER BY id LIMIT 1", (PENDING,)).fetchone()
+                if row is None:
+                    return None
+                cursor = self._conn.execute(
+                    "UPDATE calls SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                    (RUNNING, time.time(), row[0], PENDING))
+                # Another process may have claimed it between the two statements
+                if cursor.rowcount:
+                    return JournalEntry(id=row[0], call=row[1], kwargs=json.loads(row[2]),
+                                        details=json.loads(row[3]), status=RUNNING,
+                                        created_at=row[4])
+
+    def complete(self, entry_id: int) -> None:
+        """Mark a running call as done."""
+        self._set_status(entry_id, DONE)
+
+    def fail(self, entry_id: int, error: str) -> None:
+        """Mark a running call as failed."""
+        self._set_status(entry_id, FAILED, error)
+
+    def _set_status(self, entry_id: int, status: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE calls SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                               (status, error, time.time(), entry_id))
+
+    def pending_count(self) -> int:
+        """Number of calls waiting to run."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM calls WHERE status = ?",
+                                      (PENDING,)).fetchone()[0]
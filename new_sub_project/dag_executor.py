@@ -0,0 +1,135 @@
+"""Dependency-aware execution of plan steps."""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+StepRunner = Callable[[str, Dict[str, Any]], Awaitable[Any]]
+
+Node = TypeVar("Node", bound=Hashable)
+
+
+class DependencyError(RuntimeError):
+    """Raised when a step cannot run because a step it depends on failed."""
+
+
+def chain_dependencies(sequence: List[str]) -> Dict[str, List[str]]:
+    """Dependencies that make every step wait for the one before it."""
+    return {step: [prev] for prev, step in zip(sequence, sequence[1:])}
+
+
+def topological_order(steps: List[Node], dependencies: Dict[Node, List[Node]]) -> List[Node]:
+    """
+    Order steps so that every step comes after its dependencies.
+
+    Raises:
+        ValueError: If a dependency is not a step or the dependencies form a cycle.
+    """
+    order: List[Node] = []
+    state: Dict[Node, str] = {}
+
+    def visit(step: Node) -> None:
+        if state.get(step) == "done":
+            return
+        if state.get(step) == "visiting":
+            raise ValueError(f"Dependency cycle involving {step}")
+        state[step] = "visiting"
+        for dep in dependencies.get(step, []):
+            if dep not in steps:
+                raise ValueError(f"{step} depends on unknown step {dep}")
+            visit(dep)
+        state[step] = "done"
+        order.append(step)
+
+    for step in steps:
+        visit(step)
+    return order
+
+
+def _step_dependencies(steps: List[str], dependencies: Dict[str, List[str]]) -> Dict[int, List[int]]:
+    """
+    Dependencies between step positions, so that a step can appear in the sequence more than once.
+
+    A dependency on a repeated step means its closest occurrence before the
+    dependent step, or its first occurrence if there is none before it. A
+    step depending on its own name waits for its previous occurrence, if any.
+
+    Raises:
+        ValueError: If a dependency is not a step.
+    """
+    positions: Dict[str, List[int]] = {}
+    for index, step in enumerate(steps):
+        positions.setdefault(step, []).append(index)
+    edges: Dict[int, List[int]] = {}
+    for index, step in enumerate(steps):
+        for dep in dependencies.get(step, []):
+            if dep not in positions:
+                raise ValueError(f"{step} depends on unknown step {dep}")
+            earlier = [position for position in positions[dep] if position < index]
+            if earlier:
+                edges.setdefault(index, []).append(earlier[-1])
+            elif dep != step:
+                edges.setdefault(index, []).append(positions[dep][0])
+    return edges
+
+
+async def run_dag(
+    steps: List[str],
+    dependencies: Optional[Dict[str, List[str]]],
+    run_step: StepRunner,
+) -> Dict[str, Any]:
+    """
+    Run steps as soon as their dependencies have finished.
+
+    Independent steps run concurrently, so the total time approaches the
+    critical path rather than the sum of all steps. Each step receives the
+    results of its direct dependencies, keyed by step name. Without
+    dependency information the steps run strictly in order. A step listed
+    more than once runs once per occurrence.
+
+    Returns:
+        Results of all steps, keyed by step name; a repeated step's result is
+        that of its last occurrence.
+
+    Raises:
+        The first exception raised by a step, once every runnable step has finished.
+    """
+    positions = list(range(len(steps)))
+    if dependencies is None:
+        edges = {index: [index - 1] for index in positions[1:]}
+    else:
+        edges = _step_dependencies(steps, dependencies)
+    try:
+        topological_order(positions, edges)
+    except ValueError:
+        raise ValueError(f"The dependencies between {', '.join(dict.fromkeys(steps))} form a cycle") from None
+
+    tasks: List["asyncio.Task[Any]"] = []
+
+    async def run(index: int) -> Any:
+        upstream = {}
+        for dep in edges.get(index, []):
+            try:
+                upstream[steps[dep]] = await tasks[dep]
+            except Exception as e:
+                raise DependencyError(f"{steps[index]} skipped because {steps[dep]} failed") from e
+        return await run_step(steps[index], upstream)
+
+    for index in positions:
+        tasks.append(asyncio.ensure_future(run(index)))
+
+    outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+    results = {}
+    first_error = None
+    for step, outcome in zip(steps, outcomes):
+        if isinstance(outcome, BaseException):
+            logger.error(f"Step {step} failed: {outcome}")
+            if first_error is None and not isinstance(outcome, DependencyError):
+                first_error = outcome
+            continue
+        results[step] = outcome
+    if first_error is not None:
+        raise first_error
+    return results
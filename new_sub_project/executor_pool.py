@@ -0,0 +1,341 @@
+"""
+Pool of warm worker processes that execute Catalog functions.
+
+Each worker imports the catalog once and then runs functions on request, so a
+crashing or hanging function cannot take the assistant down and blocking calls
+never stall its event loop. Requests and results are exchanged as pickled
+messages over the worker's stdin/stdout, so arguments and return values keep
+their Python types just as with inline execution; anything a function prints
+is streamed back line by line while it runs.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+from . import usage_stats
+from .catalog_store import manifest_version
+
+logger = logging.getLogger(__name__)
+
+# "pool" runs Catalog functions in worker processes, "inline" in the assistant process
+EXECUTOR_MODE = os.environ.get("META_AGENT_EXECUTOR", "pool").lower()
+POOL_SIZE = int(os.environ.get("META_AGENT_POOL_SIZE", str(min(os.cpu_count() or 1, 4))))
+CALL_TIMEOUT = float(os.environ.get("META_AGENT_CALL_TIMEOUT", "30"))
+
+PACKAGE_ROOT = Path(__file__).parent.parent
+
+
+class ExecutionError(RuntimeError):
+    """Raised when a Catalog function fails or its worker dies."""
+
+
+class _Worker:
+    """A single worker process and its pipes."""
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", f"{__package__}.executor_pool"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            cwd=PACKAGE_ROOT,
+        )
+
+    def send(self, message: Dict[str, Any]) -> None:
+        """Send a request to the worker."""
+        self.process.stdin.write(pickle.dumps(message))
+        self.process.stdin.flush()
+
+    def receive(self) -> Optional[Dict[str, Any]]:
+        """
+        Block until the worker sends a message; None if it exited.
+
+        Raises:
+            ExecutionError: If the message cannot be unpickled here; the rest
+                of the stream cannot be trusted then, so the worker is killed.
+        """
+        try:
+            return pickle.load(self.process.stdout)
+        except EOFError:
+            return None
+        except Exception as e:
+            self.kill()
+            raise ExecutionError(f"Cannot read the worker's reply: {type(e).__name__}: {e}") from e
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def kill(self) -> None:
+        """Terminate the worker process."""
+        self.process.kill()
+        self.process.wait()
+
+
+class ExecutorPool:
+    """
+    Runs Catalog functions on a fixed number of warm worker processes.
+
+    Callers waiting for a worker hold no thread: idle workers are handed to
+    waiting callers, on whichever event loop they wait. Worker output is read
+    on a thread pool of the pool's own size, so there is always a reader
+    thread for every busy worker.
+    """
+
+    def __init__(self, size: int = POOL_SIZE, timeout: float = CALL_TIMEOUT):
+        self.size = max(size, 1)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle: List[_Worker] = []
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._readers: Optional[ThreadPoolExecutor] = None
+        self._ids = itertools.count(1)
+        self._started = False
+
+    def start(self) -> None:
+        """Start the worker processes."""
+        if self._started:
+            return
+        self._readers = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="executor-reader")
+        for _ in range(self.size):
+            self._release(_Worker())
+        self._started = True
+        logger.info(f"Started {self.size} executor worker(s)")
+
+    def stop(self) -> None:
+        """Terminate all idle workers."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.kill()
+        if self._readers is not None:
+            self._readers.shutdown(wait=False)
+            self._readers = None
+        self._started = False
+
+    async def _acquire(self) -> _Worker:
+        """Wait for an idle worker without blocking a thread."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+        return await waiter
+
+    def _release(self, worker: _Worker) -> None:
+        """Hand a worker to the longest waiting caller, or make it idle. Thread-safe."""
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if not waiter.done():
+                    waiter.get_loop().call_soon_threadsafe(self._deliver, waiter, worker)
+                    return
+            self._idle.append(worker)
+
+    def _deliver(self, waiter: asyncio.Future, worker: _Worker) -> None:
+        """Complete a waiter on its own loop; a waiter cancelled meanwhile passes the worker on."""
+        if waiter.done():
+            self._release(worker)
+        else:
+            waiter.set_result(worker)
+
+    def _replace(self, dead: _Worker) -> None:
+        """Start a worker in place of one that died or was killed."""
+        try:
+            worker = _Worker()
+        except Exception:
+            # The next caller handed the dead worker tries to start one again
+            logger.exception("Could not start a replacement executor worker")
+            worker = dead
+        self._release(worker)
+
+    async def run(self, name: str, kwargs: Optional[Dict[str, Any]] = None,
+                  timeout: Optional[float] = None) -> Any:
+        """
+        Execute a Catalog function in a worker.
+
+        A worker is only reused once it has answered the call. If the call
+        times out or the caller is cancelled, the worker may still be about
+        to reply, so it is killed and replaced instead.
+
+        Raises:
+            TimeoutError: If the call takes longer than the timeout; the worker is replaced.
+            ExecutionError: If the function raised, its result cannot be
+                passed back, or the worker died.
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        worker = await self._acquire()
+        if not worker.alive():
+            try:
+                worker = await loop.run_in_executor(None, _Worker)
+            except BaseException:
+                self._release(worker)
+                raise
+
+        call_id = next(self._ids)
+        answered = False
+        try:
+            worker.send({"id": call_id, "name": name, "kwargs": kwargs or {}, "version": manifest_version()})
+            result = await asyncio.wait_for(
+                loop.run_in_executor(self._readers, self._collect, worker, name), timeout or self.timeout)
+            answered = True
+            return result
+        except asyncio.TimeoutError:
+            logger.error(f"{name} timed out, replacing its worker")
+            raise TimeoutError(f"{name} did not finish within {timeout or self.timeout}s")
+        except ExecutionError:
+            answered = True
+            raise
+        finally:
+            if answered and worker.alive():
+                self._release(worker)
+            else:
+                if worker.alive():
+                    worker.kill()
+                # Starting a process takes a while; do it off the event loop
+                loop.run_in_executor(None, self._replace, worker)
+
+    @staticmethod
+    def _collect(worker: _Worker, name: str) -> Any:
+        """Read streamed output from a worker until the call completes."""
+        while True:
+            message = worker.receive()
+            if message is None:
+                raise ExecutionError(f"Worker exited while running {name}")
+            if message["type"] == "output":
+                logger.info(f"[{name}] {message['text']}")
+            elif message["type"] == "result":
+                return message["value"]
+            else:
+                raise ExecutionError(f"{name} failed:\n{message['error']}")
+
+
+_pool: Optional[ExecutorPool] = None
+
+
+def get_executor_pool() -> ExecutorPool:
+    """Return the shared executor pool, starting its workers on first use."""
+    global _pool
+    if _pool is None:
+        _pool = ExecutorPool()
+        _pool.start()
+    return _pool
+
+
+def warm_up() -> None:
+    """Start the shared pool ahead of the first call when pool mode is enabled."""
+    if EXECUTOR_MODE == "pool":
+        get_executor_pool()
+
+
+def shutdown() -> None:
+    """Terminate the shared pool's workers, if it was started, and write the recorded usage."""
+    if _pool is not None:
+        _pool.stop()
+    usage_stats.flush()
+
+
+async def run_function(catalog: type, name: str, kwargs: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Run a Catalog function according to EXECUTOR_MODE, without blocking the event loop.
+
+    Every call is recorded in the function's usage stats.
+    """
+    start = time.perf_counter()
+    ok = False
+    try:
+        if EXECUTOR_MODE == "pool":
+            result = await get_executor_pool().run(name, kwargs)
+        else:
+            func = getattr(catalog, name)
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(None, lambda: func(**(kwargs or {})))
+        ok = True
+        return result
+    finally:
+        usage_stats.record_call(name, time.perf_counter() - start, ok)
+
+
+class _StreamingOutput:
+    """Stand-in for sys.stdout in a worker that forwards printed lines to the pool."""
+
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.call_id = None
+        self._buffer = ""
+
+    def write(self, text: str) -> int:
+        self._buffer += text
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            _send(self.protocol, {"id": self.call_id, "type": "output", "text": line})
+        return len(text)
+
+    def flush(self) -> None:
+        if self._buffer:
+            _send(self.protocol, {"id": self.call_id, "type": "output", "text": self._buffer})
+            self._buffer = ""
+
+
+def _send(protocol, message: Dict[str, Any]) -> None:
+    """
+    Write one protocol message to the parent.
+
+    A result that cannot be pickled is reported as the call's error rather
+    than passed back in some other form.
+    """
+    try:
+        data = pickle.dumps(message)
+    except Exception as e:
+        data = pickle.dumps({"id": message["id"], "type": "error",
+                             "error": f"The result cannot be passed back: {type(e).__name__}: {e}"})
+    protocol.write(data)
+    protocol.flush()
+
+
+def _worker_main() -> None:
+    """Serve function calls read from stdin until it is closed."""
+    # Keep the real stdout for the protocol; stray writes, including those of
+    # child processes, go to stderr instead
+    protocol = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    output = _StreamingOutput(protocol)
+    sys.stdout = output
+
+    from .reloader import reload_catalog
+
+    # Import the catalog up front so the first call does not pay for it
+    version = manifest_version()
+    catalog = reload_catalog()
+    while True:
+        try:
+            request = pickle.load(sys.stdin.buffer)
+        except EOFError:
+            return
+        if request["version"] != version:
+            catalog = reload_catalog()
+            version = request["version"]
+        output.call_id = request["id"]
+        try:
+            value = getattr(catalog, request["name"])(**request["kwargs"])
+        except Exception:
+            output.flush()
+            _send(protocol, {"id": request["id"], "type": "error", "error": traceback.format_exc()})
+        else:
+            output.flush()
+            _send(protocol, {"id": request["id"], "type": "result", "value": value})
+
+
+if __name__ == "__main__":
+    _worker_main()
@@ -0,0 +1,146 @@
+"""
+Deterministic stand-in for the planner's model, used by the benchmark.
+
+``FakeModel`` answers planning prompts from a scripted corpus instead of
+calling an API. It implements the SDK's ``Model`` interface, so it runs
+behind the real ``Runner`` and the timings include the SDK's own overhead.
+Each corpus entry gives an utterance and the plan to return for it; the plan
+is rendered in the planner's text format, or as JSON when the agent asks for
+structured output. Batch prompts get one plan per command. Entries marked
+``"hard"`` are only planned by the default model, so cheaper planner tiers
+fail on them and the planner has to escalate.
+"""
+
+import asyncio
+import json
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from agents import Model, ModelProvider, ModelResponse, Usage
+from openai.types.responses import (Response, ResponseCompletedEvent, ResponseOutputMessage, ResponseOutputText,
+                                    ResponseTextDeltaEvent)
+
+from .plan_cache import normalize_utterance
+
+# Characters per streamed text delta
+CHUNK_SIZE = 16
+
+# The utterance inside a planning prompt built by build_planning_prompt()
+PROMPT_UTTERANCE_PATTERN = re.compile(r"command: '(.*)'")
+
+# The utterances inside a prompt built by build_batch_planning_prompt()
+BATCH_UTTERANCE_PATTERN = re.compile(r"^Command \d+: '(.*)'$", re.MULTILINE)
+
+
+def render_text_plan(plan: Dict[str, Any]) -> str:
+    """Render a plan in the format the text planner is asked to use."""
+    lines = ["Here is the plan."]
+    for function in plan.get("new_functions", []):
+        lines += ["```python", function["code"], "```"]
+    lines.append(f"Call sequence: {', '.join(plan.get('sequence', []))}")
+    for dependency in plan.get("dependencies", []):
+        lines.append(f"{dependency['step']} depends on {', '.join(dependency['depends_on'])}")
+    if plan.get("composite_name"):
+        lines.append(f"Composite function name: {plan['composite_name']}")
+    for argument in plan.get("arguments", []):
+        lines.append(f"Argument {argument['name']} = {argument['value']}")
+    return "\n".join(lines)
+
+
+def render_structured_plan(plan: Dict[str, Any]) -> str:
+    """Render a plan as CommandPlan JSON, with every field present."""
+    return json.dumps({
+        "new_functions": [{"docstring": "", **function} for function in plan.get("new_functions", [])],
+        "sequence": plan.get("sequence", []),
+        "dependencies": plan.get("dependencies", []),
+        "composite_name": plan.get("composite_name") or "run_task",
+        "arguments": plan.get("arguments", []),
+    })
+
+
+def _prompt(input: Any) -> str:
+    """Text of the latest user message in the model input."""
+    if isinstance(input, str):
+        return input
+    for item in reversed(input):
+        if isinstance(item, dict) and item.get("role") == "user":
+            content = item.get("content")
+            return content if isinstance(content, str) else json.dumps(content)
+    return ""
+
+
+def _message(text: str) -> ResponseOutputMessage:
+    return ResponseOutputMessage(
+        id="msg_fake",
+        type="message",
+        role="assistant",
+        status="completed",
+        content=[ResponseOutputText(type="output_text", text=text, annotations=[])],
+    )
+
+
+class FakeModel(Model):
+    """Answers planning prompts with the scripted plan of the utterance they mention."""
+
+    def __init__(self, plans: Dict[str, Dict[str, Any]], latency: float = 0.0, strong: bool = True):
+        self.plans = plans
+        self.latency = latency
+        # Weak models have no answer for hard commands
+        self.strong = strong
+
+    def _plan(self, utterance: str) -> Optional[Dict[str, Any]]:
+        plan = self.plans.get(normalize_utterance(utterance))
+        if plan is not None and plan.get("hard") and not self.strong:
+            return None
+        return plan
+
+    def _respond(self, input: Any, output_schema: Any) -> str:
+        """The response text for a prompt: the scripted plan, or a non-answer for unknown commands."""
+        prompt = _prompt(input)
+        structured = output_schema is not None and not output_schema.is_plain_text()
+        batch = BATCH_UTTERANCE_PATTERN.findall(prompt)
+        if batch:
+            plans = [self._plan(utterance) or {} for utterance in batch]
+            if structured:
+                return json.dumps({"plans": [json.loads(render_structured_plan(plan)) for plan in plans]})
+            return "\n\n".join(f"Command {number}:\n{render_text_plan(plan)}"
+                               for number, plan in enumerate(plans, 1))
+        match = PROMPT_UTTERANCE_PATTERN.search(prompt)
+        plan = self._plan(match.group(1)) if match else None
+        if plan is None:
+            return render_structured_plan({}) if structured else "I am not sure how to do that."
+        return render_structured_plan(plan) if structured else render_text_plan(plan)
+
+    async def get_response(self, system_instructions: Optional[str], input: Any, model_settings: Any,
+                           tools: List[Any], output_schema: Any, handoffs: List[Any], tracing: Any,
+                           **kwargs: Any) -> ModelResponse:
+        await asyncio.sleep(self.latency)
+        text = self._respond(input, output_schema)
+        return ModelResponse(output=[_message(text)], usage=Usage(), response_id=None)
+
+    async def stream_response(self, system_instructions: Optional[str], input: Any, model_settings: Any,
+                              tools: List[Any], output_schema: Any, handoffs: List[Any], tracing: Any,
+                              **kwargs: Any) -> AsyncIterator[Any]:
+        await asyncio.sleep(self.latency)
+        text = self._respond(input, output_schema)
+        for number, start in enumerate(range(0, len(text), CHUNK_SIZE)):
+            yield ResponseTextDeltaEvent(type="response.output_text.delta", item_id="msg_fake", output_index=0,
+                                         content_index=0, delta=text[start:start + CHUNK_SIZE],
+                                         sequence_number=number, logprobs=[])
+        response = Response(id="resp_fake", object="response", created_at=0, model="fake", output=[_message(text)],
+                            tool_choice="auto", tools=[], parallel_tool_calls=False, top_p=None, usage=None)
+        yield ResponseCompletedEvent(type="response.completed", response=response,
+                                     sequence_number=len(text) // CHUNK_SIZE + 1)
+
+
+class FakeModelProvider(ModelProvider):
+    """Serves a strong FakeModel as the default model and a weak one for every model name."""
+
+    def __init__(self, corpus: List[Dict[str, Any]], latency: float = 0.0):
+        plans = {normalize_utterance(entry["utterance"]): dict(entry["plan"], hard=entry.get("hard", False))
+                 for entry in corpus if entry.get("plan")}
+        self.model = FakeModel(plans, latency)
+        self.weak_model = FakeModel(plans, latency, strong=False)
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        return self.model if model_name is None else self.weak_model
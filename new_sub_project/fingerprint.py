@@ -0,0 +1,71 @@
+"""Structural fingerprints used to spot duplicate Catalog functions."""
+
+import ast
+import hashlib
+import os
+import textwrap
+from typing import Dict, FrozenSet, Iterable
+
+# Differences that do not make two functions different:
+# "docstrings" ignores docstrings, "names" ignores the function name and local variable names
+FINGERPRINT_IGNORE = frozenset(
+    part.strip() for part in os.environ.get("META_AGENT_FINGERPRINT_IGNORE", "docstrings,names").split(",")
+    if part.strip()
+)
+
+
+class _Normalizer(ast.NodeTransformer):
+    """Rewrites a function so that ignored differences disappear from its AST."""
+
+    def __init__(self, ignore: FrozenSet[str]):
+        self.ignore = ignore
+        self._locals: Dict[str, str] = {}
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.AST:
+        if "docstrings" in self.ignore and ast.get_docstring(node) is not None:
+            node.body = node.body[1:] or [ast.Pass()]
+        if "names" in self.ignore:
+            node.name = "_"
+            self._locals.update(_local_names(node, len(self._locals)))
+        node.decorator_list = [d for d in node.decorator_list
+                               if not (isinstance(d, ast.Name) and d.id == "staticmethod")]
+        return self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        node.id = self._locals.get(node.id, node.id)
+        return node
+
+
+def _local_names(node: ast.AST, start: int) -> Dict[str, str]:
+    """Map variables assigned inside a function to positional placeholders."""
+    params = {arg.arg for arg in ast.walk(node.args) if isinstance(arg, ast.arg)}
+    declared = {name for child in ast.walk(node) if isinstance(child, (ast.Global, ast.Nonlocal))
+                for name in child.names}
+    mapping: Dict[str, str] = {}
+    for child in ast.walk(node):
+        if (isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store)
+                and child.id not in params and child.id not in declared and child.id not in mapping):
+            mapping[child.id] = f"_v{start + len(mapping)}"
+    return mapping
+
+
+def function_fingerprint(source: str, ignore: Iterable[str] = FINGERPRINT_IGNORE) -> str:
+    """
+    Hash the normalized AST of the last function defined in ``source``.
+
+    Imports, formatting and comments never affect the fingerprint; docstrings
+    and names are ignored as configured.
+
+    Raises:
+        SyntaxError: If the source is not valid Python.
+        ValueError: If the source does not define a function.
+    """
+    tree = ast.parse(textwrap.dedent(source))
+    functions = [node for node in tree.body if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    if not functions:
+        raise ValueError("Source does not define a function")
+    node = _Normalizer(frozenset(ignore)).visit(functions[-1])
+    dump = ast.dump(node, annotate_fields=False, include_attributes=False)
+    return hashlib.sha256(dump.encode()).hexdigest()
@@ -0,0 +1,208 @@
+"""
+Zygote process model for near-instant assistant restarts.
+
+The launching process imports the heavy modules once, then forks a single-
+threaded zygote before it starts listening. The launcher keeps the
+LiveTranscriber connection for the whole session and writes every utterance
+into a pipe. The zygote forks a fresh child that reads utterances from the
+pipe and processes them with an up-to-date catalog. When that child needs a
+restart it lets in-flight utterances finish, saves the ones it has not
+processed yet and exits; the zygote immediately forks a replacement, which
+picks up the saved utterances and whatever queued up in the pipe meanwhile.
+Listening never stops, and a reload costs a fork instead of an interpreter
+start plus SDK imports.
+"""
+
+import asyncio
+import importlib
+import json
+import logging
+import os
+import select
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Iterator, List, Optional
+
+from . import executor_pool, reloader
+from .utterance_queue import UtteranceQueue
+
+logger = logging.getLogger(__name__)
+
+# Exit code a child uses to ask the zygote for a fresh child
+RELOAD_EXIT_CODE = 75
+
+# Imported once by the launcher and inherited by every child
+PRELOAD_MODULES = ("agents", "openai", "pydantic", "livetranscriber")
+
+# Utterances a child had not processed yet when it exited for a reload
+HANDOVER_PATH = Path(__file__).parent / "handover.json"
+
+# Delay before replacing a child that crashed, to avoid a tight crash loop
+CRASH_BACKOFF = 1.0
+
+Handler = Callable[[str], Awaitable[None]]
+StartHook = Callable[[], Awaitable[None]]
+
+
+def preload_modules() -> None:
+    """Import the heavy modules so forked children inherit them."""
+    for name in PRELOAD_MODULES:
+        start = time.perf_counter()
+        importlib.import_module(name)
+        logger.info(f"Preloaded {name} in {time.perf_counter() - start:.3f}s")
+
+
+def run_fork_server(handler: Handler, on_start: Optional[StartHook] = None) -> None:
+    """
+    Listen in this process and process utterances in forked children.
+
+    ``on_start`` runs in every child alongside the utterances, e.g. to replay
+    calls journaled by the previous child.
+    """
+    preload_modules()
+    read_fd, write_fd = os.pipe()
+
+    # Fork the zygote before any threads or audio devices exist
+    zygote_pid = os.fork()
+    if zygote_pid == 0:
+        os.close(write_fd)
+        _run_zygote(read_fd, handler, on_start)
+
+    os.close(read_fd)
+    try:
+        _run_transcriber(write_fd)
+    finally:
+        # Closing the pipe tells the current child to finish and the zygote to stop
+        os.close(write_fd)
+        os.waitpid(zygote_pid, 0)
+
+
+def _run_transcriber(write_fd: int) -> None:
+    """Run the LiveTranscriber, forwarding every utterance into the pipe."""
+    from livetranscriber import LiveTranscriber
+
+    def forward(utterance: str, transcriber=None) -> None:
+        logger.info(f"User said: {utterance}")
+        os.write(write_fd, (json.dumps(utterance) + "\n").encode())
+
+    logger.info("Starting LiveTranscriber in fork-server mode...")
+    tr = LiveTranscriber(callback=forward)
+    tr.run()
+    logger.info("LiveTranscriber stopped")
+
+
+def _run_zygote(read_fd: int, handler: Handler, on_start: Optional[StartHook]) -> None:
+    """Fork children one after another until a child exits for good."""
+    while True:
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            # The child must never return into this loop, or two processes would read the pipe
+            code = 1
+            try:
+                code = _run_child(read_fd, handler, on_start, start)
+            except BaseException:
+                logger.exception("Child failed")
+            finally:
+                os._exit(code)
+
+        _, status = os.waitpid(pid, 0)
+        code = os.waitstatus_to_exitcode(status)
+        if code == RELOAD_EXIT_CODE:
+            logger.info("Child exited for a reload, forking a fresh one")
+            continue
+        if code == 0:
+            os._exit(0)
+        logger.error(f"Child exited with status {code}, forking a replacement")
+        time.sleep(CRASH_BACKOFF)
+
+
+class _PipeReader:
+    """
+    Reads newline-delimited JSON utterances from a file descriptor.
+
+    Iteration ends when the pipe is closed or once ``stop()`` is called; text
+    read but not yielded yet stays in ``partial``.
+    """
+
+    def __init__(self, fd: int, partial: str = ""):
+        self.fd = fd
+        self.partial = partial
+        self._stopped = threading.Event()
+        self._wake_read, self._wake_write = os.pipe()
+
+    def stop(self) -> None:
+        """End the iteration, from any thread."""
+        self._stopped.set()
+        os.write(self._wake_write, b"x")
+
+    def __iter__(self) -> Iterator[str]:
+        while not self._stopped.is_set():
+            while "\n" in self.partial:
+                line, rest = self.partial.split("\n", 1)
+                if self._stopped.is_set():
+                    return
+                self.partial = rest
+                yield json.loads(line)
+            ready, _, _ = select.select([self.fd, self._wake_read], [], [])
+            if self.fd not in ready:
+                continue
+            chunk = os.read(self.fd, 4096)
+            if not chunk:
+                return
+            self.partial += chunk.decode()
+
+
+def _load_handover() -> dict:
+    """Read and remove the utterances left by the previous child."""
+    if not HANDOVER_PATH.exists():
+        return {"utterances": [], "partial": ""}
+    data = json.loads(HANDOVER_PATH.read_text())
+    HANDOVER_PATH.unlink()
+    return data
+
+
+def _save_handover(utterances: List[str], partial: str) -> None:
+    """Store unprocessed utterances for the next child."""
+    HANDOVER_PATH.write_text(json.dumps({"utterances": utterances, "partial": partial}))
+
+
+def _run_child(read_fd: int, handler: Handler, on_start: Optional[StartHook], forked_at: float) -> int:
+    """Process utterances from the pipe; returns the exit code."""
+    handover = _load_handover()
+    reader = _PipeReader(read_fd, handover["partial"])
+    queue = UtteranceQueue(handler)
+    queue.start()
+    executor_pool.warm_up()
+    started = asyncio.run_coroutine_threadsafe(on_start(), queue.loop) if on_start else None
+    exiting = threading.Event()
+
+    def restart() -> None:
+        # Stop reading; the main thread then hands the remaining utterances over
+        exiting.set()
+        reader.stop()
+
+    reloader.set_restart_handler(restart)
+    # Journaled calls run before any new utterance; those wait in the pipe meanwhile
+    if started is not None:
+        started.result()
+    logger.info(f"Child ready {time.perf_counter() - forked_at:.3f}s after fork")
+
+    for utterance in handover["utterances"]:
+        queue.submit(utterance)
+    for utterance in reader:
+        queue.submit(utterance)
+
+    if exiting.is_set():
+        # Nothing is submitted any more, so every utterance is either queued,
+        # being processed or still in the reader. Utterances being processed,
+        # including the one that asked for the restart, finish first.
+        held = asyncio.run_coroutine_threadsafe(queue.hand_over(), queue.loop).result()
+        _save_handover(held, reader.partial)
+        executor_pool.shutdown()
+        return RELOAD_EXIT_CODE
+
+    queue.stop()
+    executor_pool.shutdown()
+    return 0
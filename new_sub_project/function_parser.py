@@ -1,62 +1,308 @@
 """Module for parsing and extracting function definitions from agent responses."""
 
+import ast
 import re
-from typing import Dict, List, Tuple
+import textwrap
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# "call sequence: func1, func2, func3"
+SEQUENCE_PATTERN = re.compile(
+    r'(?:call|execute|run|invoke)(?:\s+in)?(?:\s+this)?\s+sequence[:\s]*([a-zA-Z0-9_, `()]*)',
+    re.IGNORECASE,
+)
+# "call `func1`"
+CALL_PATTERN = re.compile(r'call\s+`?([a-zA-Z0-9_]+)`?')
+# "composite function name: run_task"
+COMPOSITE_PATTERN = re.compile(
+    r'(?:composite|combined|wrapper)\s+function(?:\s+name)?[:\s]+`?([a-zA-Z0-9_]+)`?',
+    re.IGNORECASE,
+)
+# "`func2` depends on `func1`" or "func2 runs after func1, func3"
+DEPENDS_PATTERN = re.compile(
+    r'`?([a-zA-Z_][a-zA-Z0-9_]*)`?(?:\(\))?\s+(?:depends\s+on|runs\s+after)\s+(.+)',
+    re.IGNORECASE,
+)
+# "Dependencies: none" declares that the steps are independent
+DEPENDENCIES_HEADER_PATTERN = re.compile(r'^\W*dependencies\W*$|^\W*dependencies\s*:\s*(?P<none>none|independent)\b',
+                                         re.IGNORECASE)
+# "Argument filename = notes.txt" gives a parameter value for this command
+ARGUMENT_PATTERN = re.compile(r'^\W*argument\s+`?([a-zA-Z_][a-zA-Z0-9_]*)`?\s*[=:]\s*(.+?)\s*$', re.IGNORECASE)
+# "Command 2:" opens the plan for the second command of a batch
+COMMAND_HEADER_PATTERN = re.compile(r'^\W*command\s+#?(\d+)\s*[:.)]', re.IGNORECASE)
+IDENTIFIER_PATTERN = re.compile(r'[a-zA-Z_][a-zA-Z0-9_]*')
+# "1. `func1`" or "- func1()" following a sequence header
+LIST_ITEM_PATTERN = re.compile(r'^\s*(?:\d+[.)]|[-*])\s*`?([a-zA-Z_][a-zA-Z0-9_]*)(?:\(\))?`?')
+
+FENCE_LANGUAGES = {"python", "py"}
+
+DEFAULT_COMPOSITE_NAME = "run_task"
+
+
+class PlanParseError(ValueError):
+    """Raised when a fenced code block in the plan is not valid Python."""
+
+
+@dataclass
+class ParsedPlan:
+    """Structured result of parsing a planner response."""
+
+    functions: Dict[str, str] = field(default_factory=dict)
+    sequence: List[str] = field(default_factory=list)
+    composite_name: str = DEFAULT_COMPOSITE_NAME
+    errors: List[str] = field(default_factory=list)
+    # Step -> steps whose results it needs; None if the plan did not say,
+    # in which case the sequence runs strictly in order
+    dependencies: Optional[Dict[str, List[str]]] = None
+    # Parameter -> value for this command, for values not spelled out in the utterance
+    arguments: Dict[str, str] = field(default_factory=dict)
+
+
+def _split_names(text: str) -> List[str]:
+    """Split a comma separated list of function names."""
+    names = [name.strip().strip('`').replace('()', '') for name in text.split(',')]
+    return [name for name in names if name]
+
+
+def functions_from_block(block: str) -> Dict[str, str]:
+    """
+    Extract top-level functions from a Python code block.
+
+    Imports in the block are kept with every function, and decorators other
+    than ``@staticmethod`` are preserved.
+
+    Raises:
+        SyntaxError: If the block is not valid Python.
+    """
+    source = textwrap.dedent(block).strip("\n")
+    tree = ast.parse(source)
+    lines = source.splitlines()
+    imports = [ast.get_source_segment(source, node) for node in tree.body
+               if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+    functions = {}
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        start = min([d.lineno for d in node.decorator_list] + [node.lineno])
+        body = [line for line in lines[start - 1:node.end_lineno] if line.strip() != "@staticmethod"]
+        functions[node.name] = "\n".join(imports + [""] + body if imports else body)
+    return functions
+
+
+def prune_dependencies(dependencies: Dict[str, List[str]], sequence: List[str]) -> Dict[str, List[str]]:
+    """
+    Keep only the dependency edges between two different steps of the sequence.
+
+    Prose such as "writing depends on Notes being open" can look like an
+    edge; naming something that is not a step makes it meaningless. Steps
+    left without dependencies are dropped.
+    """
+    steps = set(sequence)
+    pruned = {}
+    for step, deps in dependencies.items():
+        kept = [dep for dep in dict.fromkeys(deps) if dep in steps and dep != step]
+        if step in steps and kept:
+            pruned[step] = kept
+    return pruned
+
+
+def function_signature(node: ast.AST) -> str:
+    """Signature of a function definition, e.g. ``open_url(url: str) -> str``."""
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{node.name}({ast.unparse(node.args)}){returns}"
+
+
+class StreamingPlanParser:
+    """
+    Single-pass, incremental parser for planner responses.
+
+    Feed it text chunks as they stream in; each fenced code block is closed,
+    validated with ``ast.parse`` and returned as soon as its closing fence
+    arrives. Prose lines are scanned once for the call sequence and the
+    composite function name.
+    """
+
+    def __init__(self, strict: bool = False):
+        self.strict = strict
+        self.plan = ParsedPlan()
+        self._buffer = ""
+        self._fence: Optional[List[str]] = None
+        self._fence_is_python = False
+        self._awaiting_sequence = False
+        self._calls: List[str] = []
+        self._composite_found = False
+        # Set by "Dependencies: none", which declares every step independent
+        self._declared_independent = False
+
+    def feed(self, chunk: str) -> Dict[str, str]:
+        """
+        Consume a chunk of text.
+
+        Returns:
+            Functions whose code blocks were completed by this chunk.
+        """
+        self._buffer += chunk
+        completed: Dict[str, str] = {}
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            completed.update(self._feed_line(line))
+        return completed
+
+    def finish(self) -> ParsedPlan:
+        """Flush any remaining text and return the parsed plan."""
+        if self._buffer:
+            line, self._buffer = self._buffer, ""
+            self._feed_line(line)
+        if self._fence is not None:
+            self._error("Unterminated code block")
+            self._fence = None
+
+        plan = self.plan
+        if not plan.sequence:
+            # Fall back to explicit calls, then to every defined function
+            plan.sequence = self._calls or list(plan.functions)
+        if plan.dependencies is not None:
+            plan.dependencies = prune_dependencies(plan.dependencies, plan.sequence)
+            # Without a usable edge the plan said nothing about the order of
+            # its steps, unless it declared them independent
+            if not plan.dependencies and not self._declared_independent:
+                plan.dependencies = None
+        return plan
+
+    def _error(self, message: str) -> None:
+        """Record a parse error, raising it in strict mode."""
+        self.plan.errors.append(message)
+        if self.strict:
+            raise PlanParseError(message)
+
+    def _feed_line(self, line: str) -> Dict[str, str]:
+        """Process one complete line of the response."""
+        stripped = line.strip()
+        if self._fence is not None:
+            if stripped.startswith("```"):
+                return self._close_fence()
+            self._fence.append(line)
+            return {}
+
+        if stripped.startswith("```"):
+            self._fence = []
+            self._fence_is_python = stripped[3:].strip().lower() in FENCE_LANGUAGES
+            self._awaiting_sequence = False
+            return {}
+
+        self._scan_prose(line)
+        return {}
+
+    def _close_fence(self) -> Dict[str, str]:
+        """Validate a completed code block and collect its functions."""
+        block = "\n".join(self._fence)
+        is_python = self._fence_is_python
+        self._fence = None
+        if not is_python:
+            return {}
+        try:
+            functions = functions_from_block(block)
+        except SyntaxError as e:
+            self._error(f"Invalid Python in code block: {e}")
+            return {}
+        self.plan.functions.update(functions)
+        return functions
+
+    def _scan_prose(self, line: str) -> None:
+        """Look for the call sequence, dependencies, arguments and composite name in a prose line."""
+        argument_match = ARGUMENT_PATTERN.match(line)
+        if argument_match:
+            self.plan.arguments[argument_match.group(1)] = argument_match.group(2).strip("`\"'")
+            return
+        header_match = DEPENDENCIES_HEADER_PATTERN.search(line)
+        if header_match:
+            if self.plan.dependencies is None:
+                self.plan.dependencies = {}
+            if header_match.group("none"):
+                self._declared_independent = True
+            return
+        depends_match = DEPENDS_PATTERN.search(line)
+        if depends_match:
+            if self.plan.dependencies is None:
+                self.plan.dependencies = {}
+            deps = self.plan.dependencies.setdefault(depends_match.group(1), [])
+            deps.extend(IDENTIFIER_PATTERN.findall(depends_match.group(2)))
+            return
+
+        if self._awaiting_sequence:
+            item = LIST_ITEM_PATTERN.match(line)
+            if item:
+                self.plan.sequence.append(item.group(1))
+                return
+            if line.strip():
+                self._awaiting_sequence = False
+
+        if not self.plan.sequence:
+            sequence_match = SEQUENCE_PATTERN.search(line)
+            if sequence_match:
+                self.plan.sequence = _split_names(sequence_match.group(1))
+                # A bare header is followed by a list of names
+                self._awaiting_sequence = not self.plan.sequence
+                return
+            self._calls.extend(CALL_PATTERN.findall(line))
+
+        if not self._composite_found:
+            composite_match = COMPOSITE_PATTERN.search(line)
+            if composite_match:
+                self.plan.composite_name = composite_match.group(1)
+                self._composite_found = True
+
+
+def parse_plan(text: str, strict: bool = False) -> ParsedPlan:
+    """Parse a complete planner response in a single pass."""
+    parser = StreamingPlanParser(strict=strict)
+    parser.feed(text)
+    return parser.finish()
+
+
+def parse_batch_plan(text: str, count: int) -> Dict[int, ParsedPlan]:
+    """
+    Parse a response that plans several commands, each under a "Command N:" header.
+
+    Headers inside code blocks are ignored. Commands are numbered from 1 in
+    the response and from 0 in the result; sections for numbers outside
+    ``1..count`` are dropped, and commands without a section are missing.
+    """
+    sections: Dict[int, List[str]] = {}
+    current: Optional[List[str]] = None
+    in_fence = False
+    for line in text.splitlines():
+        if line.strip().startswith("```"):
+            in_fence = not in_fence
+        header = None if in_fence else COMMAND_HEADER_PATTERN.match(line)
+        if header:
+            number = int(header.group(1))
+            current = sections.setdefault(number - 1, []) if 1 <= number <= count else None
+            continue
+        if current is not None:
+            current.append(line)
+    return {index: parse_plan("\n".join(lines)) for index, lines in sections.items()}
+
 
 def extract_function_code(text: str) -> Dict[str, str]:
     """
     Extract function code from text.
-    
+
     Returns:
         Dictionary mapping function names to their code.
     """
-    # Pattern to match Python function definitions
-    pattern = r'```python\s*(?:@staticmethod\s*)?def\s+([a-zA-Z0-9_]+)\s*\([^)]*\).*?```'
-    
-    # Find all function blocks in code fence blocks
-    matches = re.finditer(pattern, text, re.DOTALL)
-    
-    functions = {}
-    for match in matches:
-        code_block = match.group(0).strip('`')
-        code_block = code_block.replace('```python', '').strip()
-        
-        # Extract function name
-        func_name_match = re.search(r'def\s+([a-zA-Z0-9_]+)', code_block)
-        if func_name_match:
-            func_name = func_name_match.group(1)
-            
-            # Format code for class method
-            formatted_code = f"""    @staticmethod
-{code_block.replace('def ', 'def ')}"""
-            functions[func_name] = formatted_code
-    
-    return functions
+    return parse_plan(text).functions
 
 
 def extract_function_sequence(text: str) -> List[str]:
     """
     Extract the sequence of functions to call from text.
-    
+
     Returns:
         List of function names to call in sequence.
     """
-    # Look for patterns like "call sequence: func1, func2, func3"
-    sequence_pattern = r'(?:call|execute|run|invoke)(?:\s+in)?(?:\s+this)?\s+sequence[:\s]+([a-zA-Z0-9_, ]+)'
-    sequence_match = re.search(sequence_pattern, text, re.IGNORECASE)
-    
-    if sequence_match:
-        sequence_str = sequence_match.group(1)
-        return [func.strip() for func in sequence_str.split(',')]
-    
-    # Try to find function calls directly
-    func_calls = re.findall(r'call\s+`?([a-zA-Z0-9_]+)`?', text)
-    if func_calls:
-        return func_calls
-    
-    # Extract any function names mentioned in the text as a fallback
-    func_names = re.findall(r'def\s+([a-zA-Z0-9_]+)', text)
-    return func_names
+    return parse_plan(text).sequence
 
 
 def parse_plan_from_agent_response(response: str) -> Tuple[Dict[str, str], List[str], str]:
@@ -65,21 +311,9 @@ def parse_plan_from_agent_response(response: str) -> Tuple[Dict[str, str], List[
     1. Function definitions
     2. Sequence of function calls
     3. Suggested name for composite function
-    
+
     Returns:
         Tuple of (function_dict, sequence, composite_name)
     """
-    # Extract function code
-    functions = extract_function_code(response)
-    
-    # Extract sequence
-    sequence = extract_function_sequence(response)
-    
-    # Extract composite function name suggestion
-    composite_name = "run_task"  # Default name
-    composite_pattern = r'(?:composite|combined|wrapper)\s+function(?:\s+name)?[:\s]+`?([a-zA-Z0-9_]+)`?'
-    composite_match = re.search(composite_pattern, response, re.IGNORECASE)
-    if composite_match:
-        composite_name = composite_match.group(1)
-    
-    return functions, sequence, composite_name 
\ No newline at end of file
+    plan = parse_plan(response)
+    return plan.functions, plan.sequence, plan.composite_name
@@ -0,0 +1,202 @@
+"""
+Staging of generated Catalog functions before they are committed.
+
+Every function is compiled on its own, as the complete module it will be
+stored as, and checked without running any of it: syntax errors, imports of
+modules that are not installed and undefined names therefore show up before
+the catalog changes rather than when it is reloaded, and generated code never
+runs in the assistant's process while it is planning. Undefined names that
+are common modules used as ``module.attribute``, such as ``subprocess.run``,
+or well-known objects, such as ``Path``, get their import added; any other
+undefined name rejects the function. The compiled code is kept and written
+as the module's cached bytecode, checked against a hash of the source, so the
+first import after a reload does not compile it again.
+"""
+
+import ast
+import builtins
+import importlib.util
+import logging
+import marshal
+import symtable
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import CodeType
+from typing import List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Imports for names that generated code often uses without importing them
+KNOWN_IMPORTS = {
+    "Path": "from pathlib import Path",
+    "date": "from datetime import date",
+    "timedelta": "from datetime import timedelta",
+    "timezone": "from datetime import timezone",
+    "defaultdict": "from collections import defaultdict",
+    "Counter": "from collections import Counter",
+    "OrderedDict": "from collections import OrderedDict",
+    "deque": "from collections import deque",
+    "urlparse": "from urllib.parse import urlparse",
+    "urlencode": "from urllib.parse import urlencode",
+    "quote": "from urllib.parse import quote",
+    **{name: f"from typing import {name}"
+       for name in ("Any", "Callable", "Dict", "Iterable", "List", "Optional", "Set", "Tuple", "Union")},
+}
+
+# Standard library modules that generated code often uses without importing them.
+# Modules that share their name with something they contain, like ``datetime``,
+# are left out, since the code may mean either.
+KNOWN_MODULES = frozenset({
+    "base64", "csv", "glob", "hashlib", "json", "math", "os", "platform", "random", "re", "shutil",
+    "socket", "statistics", "string", "subprocess", "sys", "tempfile", "time", "uuid", "webbrowser",
+})
+
+# Names that Catalog attribute lookup would never reach a stored function under
+RESERVED_NAMES = frozenset(dir(type))
+
+
+class StagingError(ValueError):
+    """Raised when generated code cannot be made into a working Catalog module."""
+
+
+@dataclass
+class StagedFunction:
+    """A function that compiled and checked out as its own module."""
+
+    name: str
+    # Function source with any added imports, as it is stored
+    source: str
+    # Compiled code of the complete module
+    code: CodeType
+    added_imports: List[str] = field(default_factory=list)
+
+
+def undefined_names(module_source: str) -> Set[str]:
+    """
+    Global names that a module reads but neither defines, imports nor gets from builtins.
+
+    Raises:
+        SyntaxError: If the source is not valid Python.
+    """
+    top = symtable.symtable(module_source, "<staging>", "exec")
+    defined = {symbol.get_name() for symbol in top.get_symbols() if symbol.is_assigned() or symbol.is_imported()}
+    used: Set[str] = set()
+    tables = [top]
+    while tables:
+        table = tables.pop()
+        for symbol in table.get_symbols():
+            if symbol.is_referenced() and (table is top or symbol.is_global()):
+                used.add(symbol.get_name())
+        tables.extend(table.get_children())
+    return {name for name in used - defined
+            if not hasattr(builtins, name) and not (name.startswith("__") and name.endswith("__"))}
+
+
+def attribute_owners(module_source: str) -> Set[str]:
+    """Names that a module uses as the object of an attribute access, like ``os`` in ``os.path``."""
+    return {node.value.id for node in ast.walk(ast.parse(module_source))
+            if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name)}
+
+
+def missing_modules(module_source: str) -> List[str]:
+    """
+    Top-level modules that a module imports absolutely but that cannot be found.
+
+    Only the top-level package is looked up, which does not import anything.
+    """
+    modules = set()
+    for node in ast.walk(ast.parse(module_source)):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.partition(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+            modules.add(node.module.partition(".")[0])
+    return sorted(module for module in modules if importlib.util.find_spec(module) is None)
+
+
+def defines_function(module_source: str, name: str) -> bool:
+    """Whether a module defines a top-level function called ``name``."""
+    return any(isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == name
+               for node in ast.parse(module_source).body)
+
+
+def import_for(name: str, as_module: bool = False) -> Optional[str]:
+    """
+    The import statement that defines ``name``, if it is a well-known object.
+
+    Known modules are only imported if ``as_module`` is set, that is if the
+    code uses ``name`` for attribute access, the way a module is used.
+    """
+    if name in KNOWN_IMPORTS:
+        return KNOWN_IMPORTS[name]
+    if as_module and name in KNOWN_MODULES:
+        return f"import {name}"
+    return None
+
+
+def stage_function(name: str, source: str, prefix: str = "", filename: str = "<catalog>") -> StagedFunction:
+    """
+    Compile and check one function as the module ``prefix + source``.
+
+    Missing imports of well-known names are added to the source. Nothing in
+    the module is executed.
+
+    Raises:
+        StagingError: If the function has a reserved name, does not compile,
+            uses names or modules that cannot be resolved or does not define
+            a function called ``name``.
+    """
+    if name in RESERVED_NAMES:
+        raise StagingError(f"{name}: the name is reserved by the Catalog class, choose another one")
+    try:
+        missing = undefined_names(f"{prefix}{source}\n")
+        owners = attribute_owners(f"{prefix}{source}\n") if missing else set()
+    except SyntaxError as e:
+        raise StagingError(f"{name}: invalid Python: {e}") from e
+
+    imports = {missing_name: import_for(missing_name, as_module=missing_name in owners)
+               for missing_name in sorted(missing)}
+    unresolved = [missing_name for missing_name, statement in imports.items() if statement is None]
+    if unresolved:
+        raise StagingError(f"{name}: uses undefined names {', '.join(unresolved)}")
+    added = sorted(set(imports.values()), key=lambda statement: (statement.startswith("from "), statement))
+    if added:
+        logger.info(f"Added missing imports to {name}: {'; '.join(added)}")
+        separator = "\n" if source.startswith(("import ", "from ")) else "\n\n"
+        source = "\n".join(added) + separator + source
+
+    module_source = f"{prefix}{source}\n"
+    try:
+        code = compile(module_source, filename, "exec")
+    except (SyntaxError, ValueError) as e:
+        raise StagingError(f"{name}: does not compile: {e}") from e
+    if not defines_function(module_source, name):
+        raise StagingError(f"{name}: the code does not define a function with that name")
+    not_installed = missing_modules(module_source)
+    if not_installed:
+        raise StagingError(f"{name}: imports modules that are not installed: {', '.join(not_installed)}")
+    return StagedFunction(name, source, code, added)
+
+
+def write_bytecode(code: CodeType, module_path: Path, source: bytes) -> None:
+    """
+    Write compiled module code as the cached bytecode of ``module_path``.
+
+    ``source`` is the module's content as written. The cache is a checked
+    hash-based pyc (PEP 552): the import system compares the hash of the
+    source file with the one stored here, so a module rewritten within the
+    same second, with the same size, is never run from a stale cache.
+    """
+    if sys.dont_write_bytecode:
+        return
+    cache_path = Path(importlib.util.cache_from_source(str(module_path)))
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    data = bytearray(importlib.util.MAGIC_NUMBER)
+    # Flags: hash-based, checked against the source
+    data += (0b11).to_bytes(4, "little")
+    data += importlib.util.source_hash(source)
+    data += marshal.dumps(code)
+    tmp_path = cache_path.with_suffix(".tmp")
+    tmp_path.write_bytes(bytes(data))
+    tmp_path.replace(cache_path)
+
@@ -0,0 +1,207 @@
+"""
+Declarative intent table mapping utterance patterns to Catalog calls.
+
+An intent matches when every phrase of one of its patterns occurs in the
+utterance. Built-in intents are declared in code; learned intents are added
+from plans that ran successfully and persisted as JSON. The table is compiled
+into a phrase index keyed by first word, so matching is a single pass over the
+utterance's words, without any model call. Learned intents keep the source hash
+of the functions they call and are forgotten once those change. Intents with slots leave the
+argument values out of their patterns, so "create a file called todo.txt"
+matches what was learned from "create a file called notes.txt".
+"""
+
+import json
+import logging
+import os
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .argument_extractor import value_words
+from .plan_cache import catalog_hash, normalize_utterance
+
+logger = logging.getLogger(__name__)
+
+INTENTS_PATH = Path(__file__).parent / "intents.json"
+
+# Share of an utterance's keywords a learned pattern must cover, so that
+# "open notes and delete them" does not run what was learned for "open notes"
+LEARNED_COVERAGE = float(os.environ.get("META_AGENT_INTENT_COVERAGE", "0.75"))
+
+# Words that carry no intent and are left out of learned patterns
+STOPWORDS = frozenset("""
+a an and are at be can could for from i in is it me my of on or please the this to up
+would you your hey just now some
+""".split())
+
+
+def keywords(utterance: str) -> List[str]:
+    """Content words of an utterance, in order, without duplicates."""
+    words = normalize_utterance(utterance).split()
+    return list(dict.fromkeys(word for word in words if word not in STOPWORDS))
+
+
+@dataclass
+class Intent:
+    """A Catalog call and the utterance patterns that trigger it."""
+
+    call: str
+    # Each pattern is a list of phrases that must all occur in the utterance
+    patterns: List[List[str]] = field(default_factory=list)
+    sequence: Optional[List[str]] = None
+    dependencies: Optional[Dict[str, List[str]]] = None
+    # Source of the call, for built-in intents whose function may not exist yet
+    code: Optional[str] = None
+    learned: bool = False
+    # Parameters of the call that are filled from the utterance
+    slots: List[str] = field(default_factory=list)
+    # Functions the learned call runs and the hash of their source when it was learned
+    functions: List[str] = field(default_factory=list)
+    catalog_hash: Optional[str] = None
+
+
+class IntentTable:
+    """Intents compiled into a phrase index for fast matching."""
+
+    def __init__(self, path: Path = INTENTS_PATH, builtins: Iterable[Intent] = ()):
+        self.path = path
+        self.intents: List[Intent] = list(builtins)
+        self._load()
+        self._compile()
+
+    def _load(self) -> None:
+        """Load learned intents from disk."""
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable intent table: {e}")
+            return
+        self.intents.extend(Intent(**entry) for entry in data)
+
+    def _save(self) -> None:
+        """Write learned intents to disk."""
+        learned = [asdict(intent) for intent in self.intents if intent.learned]
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(learned, indent=2))
+        tmp_path.replace(self.path)
+
+    def _compile(self) -> None:
+        """Build the first-word phrase index and the per-pattern phrase counts."""
+        # first word -> [(phrase words, phrase)]
+        self._phrases: Dict[str, List[Tuple[List[str], str]]] = {}
+        # phrase -> [(intent index, pattern index)]
+        self._patterns_by_phrase: Dict[str, List[Tuple[int, int]]] = {}
+        self._pattern_sizes: Dict[Tuple[int, int], int] = {}
+        for i, intent in enumerate(self.intents):
+            for j, pattern in enumerate(intent.patterns):
+                phrases = set(normalize_utterance(phrase) for phrase in pattern) - {""}
+                if not phrases:
+                    continue
+                self._pattern_sizes[(i, j)] = len(phrases)
+                for phrase in phrases:
+                    if phrase not in self._patterns_by_phrase:
+                        words = phrase.split()
+                        self._phrases.setdefault(words[0], []).append((words, phrase))
+                    self._patterns_by_phrase.setdefault(phrase, []).append((i, j))
+
+    def match(self, utterance: str, catalog: Optional[type] = None) -> Optional[Intent]:
+        """
+        Return the intent whose pattern matches the utterance most specifically.
+
+        Among matching patterns, the one with the most words wins, so a
+        learned "open notes app" beats a built-in "open". Learned patterns
+        must also cover LEARNED_COVERAGE of the utterance's keywords; for
+        intents with slots, words of argument values do not count. Given the
+        ``catalog``, a learned intent whose functions changed or disappeared
+        since it was learned is forgotten instead of returned.
+        """
+        words = normalize_utterance(utterance).split()
+        found = set()
+        for position, word in enumerate(words):
+            for phrase_words, phrase in self._phrases.get(word, ()):
+                if words[position:position + len(phrase_words)] == phrase_words:
+                    found.add(phrase)
+
+        hits: Counter = Counter()
+        specificity: Counter = Counter()
+        for phrase in found:
+            for key in self._patterns_by_phrase[phrase]:
+                hits[key] += 1
+                specificity[key] += len(phrase.split())
+        utterance_keywords = keywords(utterance)
+        slot_keywords: Optional[List[str]] = None
+
+        def covered(key: Tuple[int, int]) -> bool:
+            nonlocal slot_keywords
+            intent = self.intents[key[0]]
+            if not intent.learned:
+                return True
+            words = utterance_keywords
+            if intent.slots:
+                if slot_keywords is None:
+                    values = value_words(utterance)
+                    slot_keywords = [word for word in utterance_keywords if word not in values]
+                words = slot_keywords
+            return specificity[key] / max(len(words), 1) >= LEARNED_COVERAGE
+
+        matched = [key for key, count in hits.items() if count == self._pattern_sizes[key] and covered(key)]
+        if not matched:
+            return None
+        best = max(matched, key=lambda key: (specificity[key], -key[0]))
+        intent = self.intents[best[0]]
+        if catalog is not None and intent.learned and \
+                catalog_hash(catalog, intent.functions or [intent.call]) != intent.catalog_hash:
+            logger.info(f"Forgetting stale intent: {intent.call}")
+            self.forget(intent.call)
+            return self.match(utterance, catalog)
+        return intent
+
+    def learn(self, utterance: str, call: str, sequence: Optional[List[str]] = None,
+              dependencies: Optional[Dict[str, List[str]]] = None,
+              arguments: Optional[Dict[str, Any]] = None,
+              functions: Optional[List[str]] = None, catalog: Optional[type] = None) -> None:
+        """
+        Remember that ``call`` fulfilled ``utterance``, as a pattern of its keywords.
+
+        The words of ``arguments`` are left out of the pattern, and their
+        parameters become the intent's slots. ``functions`` are hashed in
+        ``catalog`` so the intent can be checked for staleness; patterns
+        learned for an earlier version of them are dropped.
+        """
+        arguments = arguments or {}
+        values = {word for value in arguments.values() for word in normalize_utterance(str(value)).split()}
+        pattern = [word for word in keywords(utterance) if word not in values]
+        if not pattern:
+            return
+        functions = functions or [call]
+        digest = catalog_hash(catalog, functions) if catalog is not None else None
+        intent = next((intent for intent in self.intents if intent.learned and intent.call == call), None)
+        if intent is not None and intent.catalog_hash != digest:
+            intent.patterns, intent.slots = [], []
+        if intent is None:
+            intent = Intent(call=call, learned=True)
+            self.intents.append(intent)
+        if pattern in intent.patterns and set(arguments) <= set(intent.slots):
+            return
+        if pattern not in intent.patterns:
+            intent.patterns.append(pattern)
+        intent.slots = sorted(set(intent.slots) | set(arguments))
+        intent.sequence = sequence
+        intent.dependencies = dependencies
+        intent.functions = functions
+        intent.catalog_hash = digest
+        logger.info(f"Learned intent {call}: {' '.join(pattern)}")
+        self._save()
+        self._compile()
+
+    def forget(self, call: str) -> None:
+        """Drop learned intents for a call that no longer exists."""
+        before = len(self.intents)
+        self.intents = [intent for intent in self.intents if not (intent.learned and intent.call == call)]
+        if len(self.intents) != before:
+            self._save()
+            self._compile()
@@ -0,0 +1,75 @@
+"""Lightweight counters and timings persisted across restarts."""
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+METRICS_PATH = Path(__file__).parent / "metrics.json"
+
+
+def _load() -> Dict[str, Dict[str, Any]]:
+    """Load previously recorded metrics from disk."""
+    if not METRICS_PATH.exists():
+        return {"counters": {}, "timings": {}}
+    try:
+        return json.loads(METRICS_PATH.read_text())
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable metrics file: {e}")
+        return {"counters": {}, "timings": {}}
+
+
+_metrics = _load()
+
+# Called with every observation, e.g. by the benchmark to keep individual samples
+_observers: List[Callable[[str, float], None]] = []
+
+
+def increment(name: str, amount: int = 1) -> None:
+    """Increase a counter."""
+    counters = _metrics["counters"]
+    counters[name] = counters.get(name, 0) + amount
+
+
+def observe(name: str, value: float) -> None:
+    """Record one observation of a timing, in seconds."""
+    timing = _metrics["timings"].setdefault(name, {"count": 0, "total": 0.0, "min": value, "max": value})
+    timing["count"] += 1
+    timing["total"] += value
+    timing["min"] = min(timing["min"], value)
+    timing["max"] = max(timing["max"], value)
+    for observer in _observers:
+        observer(name, value)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """Record how long the body of a ``with`` block takes, in seconds."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def add_observer(observer: Callable[[str, float], None]) -> None:
+    """Call ``observer(name, value)`` for every future observation."""
+    _observers.append(observer)
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    """Return a copy of all metrics, with the mean of every timing."""
+    timings = {name: dict(timing, mean=timing["total"] / timing["count"])
+               for name, timing in _metrics["timings"].items()}
+    return {"counters": dict(_metrics["counters"]), "timings": timings}
+
+
+def flush() -> None:
+    """Write the metrics to disk."""
+    tmp_path = METRICS_PATH.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(_metrics, indent=2, sort_keys=True))
+    tmp_path.replace(METRICS_PATH)
@@ -0,0 +1,136 @@
+"""Disk-backed cache mapping utterances to plans that already ran successfully."""
+
+import hashlib
+import inspect
+import json
+import logging
+import os
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .catalog_store import manifest_version
+
+logger = logging.getLogger(__name__)
+
+PLAN_CACHE_PATH = Path(__file__).parent / "plan_cache.json"
+
+# Maximum number of cached plans before the least recently used ones are evicted
+PLAN_CACHE_SIZE = int(os.environ.get("META_AGENT_PLAN_CACHE_SIZE", "256"))
+
+
+def normalize_utterance(utterance: str) -> str:
+    """Lowercase an utterance and strip punctuation and repeated whitespace."""
+    text = re.sub(r"[^a-z0-9\s]", " ", utterance.lower())
+    return " ".join(text.split())
+
+
+# Source hash of each catalog function, valid for one catalog version
+_source_hashes: Dict[str, Optional[str]] = {}
+_hashed_version: Optional[str] = None
+
+
+def _source_hash(catalog: type, name: str) -> Optional[str]:
+    """Hash of a Catalog function's name and source, or None if it is missing."""
+    func = getattr(catalog, name, None)
+    if func is None or not callable(func):
+        return None
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        return None
+    return hashlib.sha256(name.encode() + source.encode()).hexdigest()
+
+
+def catalog_hash(catalog: type, names: Iterable[str]) -> Optional[str]:
+    """
+    Hash the source of the given Catalog functions.
+
+    Function sources are only read again after the catalog changed on disk.
+
+    Returns:
+        Hex digest, or None if any of the functions is missing.
+    """
+    global _hashed_version
+    version = manifest_version()
+    if version != _hashed_version:
+        _source_hashes.clear()
+        _hashed_version = version
+    digest = hashlib.sha256()
+    for name in names:
+        if name not in _source_hashes:
+            _source_hashes[name] = _source_hash(catalog, name)
+        if _source_hashes[name] is None:
+            return None
+        digest.update(_source_hashes[name].encode())
+    return digest.hexdigest()
+
+
+class PlanCache:
+    """LRU cache of utterance -> plan, persisted as JSON."""
+
+    def __init__(self, path: Path = PLAN_CACHE_PATH, max_entries: int = PLAN_CACHE_SIZE):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._load()
+
+    def _load(self) -> None:
+        """Load cached entries from disk."""
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable plan cache: {e}")
+            return
+        self._entries = OrderedDict(data)
+
+    def _save(self) -> None:
+        """Write cached entries to disk."""
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._entries))
+        tmp_path.replace(self.path)
+
+    def get(self, utterance: str, catalog: type) -> Optional[Dict[str, Any]]:
+        """
+        Look up the plan for an utterance.
+
+        Entries whose functions changed or disappeared from the catalog are
+        evicted instead of returned.
+        """
+        key = normalize_utterance(utterance)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if catalog_hash(catalog, entry["functions"]) != entry["catalog_hash"]:
+            logger.info(f"Evicting stale cached plan for: {key}")
+            del self._entries[key]
+            self._save()
+            return None
+        # The new recency is written with the next put; hits stay off the disk
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, utterance: str, call: str, functions: List[str], catalog: type,
+            sequence: Optional[List[str]] = None,
+            dependencies: Optional[Dict[str, List[str]]] = None,
+            kwargs: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Remember that ``call`` fulfils ``utterance`` given the current catalog.
+
+        ``sequence`` and ``dependencies`` are stored alongside so the steps can
+        be replayed in parallel instead of through the composite function, and
+        ``kwargs`` so the call is repeated with the same arguments.
+        """
+        digest = catalog_hash(catalog, functions)
+        if digest is None:
+            return
+        key = normalize_utterance(utterance)
+        self._entries[key] = {"call": call, "functions": functions, "catalog_hash": digest,
+                              "sequence": sequence, "dependencies": dependencies, "kwargs": kwargs}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._save()
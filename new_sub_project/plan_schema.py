@@ -0,0 +1,94 @@
+"""Typed plan schema used as the structured output of the planning agent."""
+
+import ast
+from typing import Dict, List
+
+from pydantic import BaseModel, Field
+
+from .function_parser import DEFAULT_COMPOSITE_NAME, ParsedPlan, functions_from_block, prune_dependencies
+
+
+class PlannedFunction(BaseModel):
+    """A new function to add to the Catalog."""
+
+    name: str = Field(description="Function name, a valid Python identifier")
+    code: str = Field(description="Complete Python source of the function, including imports it needs")
+    docstring: str = Field(description="One-line summary of what the function does")
+
+
+class StepDependency(BaseModel):
+    """Steps of the sequence whose results a step needs before it can run."""
+
+    step: str = Field(description="Name of a function in the sequence")
+    depends_on: List[str] = Field(description="Functions in the sequence that must finish first")
+
+
+class PlannedArgument(BaseModel):
+    """Value of a parameter for this command."""
+
+    name: str = Field(description="Parameter name")
+    value: str = Field(description="Value to pass, as text")
+
+
+class CommandPlan(BaseModel):
+    """Plan for fulfilling a single user command."""
+
+    # Every field is required so the schema stays valid in strict structured-output mode
+    new_functions: List[PlannedFunction] = Field(
+        description="Functions that do not exist in the Catalog yet")
+    sequence: List[str] = Field(
+        description="Names of the Catalog functions to call, in order")
+    dependencies: List[StepDependency] = Field(
+        description="Prerequisites of each step; steps without any can run in parallel. "
+                    "Leave empty to run the steps strictly in order")
+    composite_name: str = Field(
+        description=f"Name for a function that calls the whole sequence, e.g. {DEFAULT_COMPOSITE_NAME}")
+    arguments: List[PlannedArgument] = Field(
+        description="Values for the parameters of the call that the command implies but does not spell out")
+
+    def to_parsed_plan(self) -> ParsedPlan:
+        """
+        Validate the generated code and convert it to a ParsedPlan.
+
+        Problems are reported in ``errors`` rather than raised, so callers can
+        retry with the error messages as feedback.
+        """
+        plan = ParsedPlan(sequence=list(self.sequence), composite_name=self.composite_name,
+                          arguments={argument.name: argument.value for argument in self.arguments})
+        # Without a usable edge the steps run in order, as in a text plan that names none
+        edges: Dict[str, List[str]] = {}
+        for dep in self.dependencies:
+            edges.setdefault(dep.step, []).extend(dep.depends_on)
+        plan.dependencies = prune_dependencies(edges, self.sequence) or None
+        for function in self.new_functions:
+            try:
+                functions = functions_from_block(function.code)
+            except SyntaxError as e:
+                plan.errors.append(f"{function.name}: invalid Python: {e}")
+                continue
+            code = functions.get(function.name)
+            if code is None:
+                plan.errors.append(f"{function.name}: code does not define a function with that name")
+                continue
+            plan.functions[function.name] = _with_docstring(code, function.docstring)
+        return plan
+
+
+class BatchPlan(BaseModel):
+    """Plans for several commands that were requested together."""
+
+    plans: List[CommandPlan] = Field(description="One plan per command, in the order the commands were given")
+
+
+def _with_docstring(code: str, docstring: str) -> str:
+    """Insert the docstring into a function that does not have one."""
+    node = ast.parse(code).body[-1]
+    first_statement = node.body[0]
+    # One-line functions have no room for a docstring
+    if ast.get_docstring(node) or not docstring or first_statement.lineno == node.lineno:
+        return code
+    lines = code.splitlines()
+    indent = " " * first_statement.col_offset
+    text = docstring.strip().replace('"""', "'''")
+    lines.insert(first_statement.lineno - 1, f'{indent}"""{text}"""')
+    return "\n".join(lines)
@@ -6,48 +6,205 @@ Uses OpenAI Agents SDK and LiveTranscriber for voice input.
 from __future__ import annotations
 
 import asyncio
-import json
+import inspect
 import logging
 import os
-import subprocess
-import sys
-from pathlib import Path
-from typing import Any, Dict, List, Optional
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Collection, Dict, List, Optional, Tuple
 
-from agents import Agent, Runner, function_tool
-from livetranscriber import LiveTranscriber
+from . import metrics, usage_stats
+from .argument_extractor import (Parameter, convert_argument, extract_arguments, function_parameters,
+                                 missing_arguments, parameters_from_code)
+from .batching import CoalescingBatcher
+from .catalog import Catalog, function_docs, function_names
+from .catalog_store import append_to_catalog as store_functions, manifest_version, stage_code
+from .catalog_summary import CatalogSummary
+from .command_journal import CommandJournal
+from .dag_executor import run_dag
+from .executor_pool import run_function, shutdown, warm_up
+from .fingerprint import function_fingerprint
+from .function_parser import DEFAULT_COMPOSITE_NAME, ParsedPlan, StreamingPlanParser, parse_batch_plan, parse_plan
+from .function_staging import StagedFunction, StagingError
+from .intent_table import IntentTable
+from .plan_cache import PlanCache
+from .reloader import hot_reload_enabled, reload_catalog, restart_process
+from .semantic_index import SemanticIndex
+from .speculation import SpeculativePlanner
+from .trace_log import command_trace, install as install_tracing, stage
 
-from .catalog import Catalog
-from .function_parser import parse_plan_from_agent_response
+# The SDK is only imported once an utterance needs the planner, so commands
+# served from the catalog never pay for it
+if TYPE_CHECKING:
+    from agents import Agent, ModelProvider, RunConfig
+    from livetranscriber import LiveTranscriber
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# State file to remember tasks between reloads
-STATE_PATH = Path(__file__).parent / "state.json"
+# "text" waits for the whole planner response, "streamed" parses it while it is generated,
+# "structured" asks for a typed CommandPlan instead of free text
+PLANNER_MODE = os.environ.get("META_AGENT_PLANNER_MODE", "text").lower()
+
+# Extra planning attempts when a structured plan fails validation
+PLAN_RETRIES = int(os.environ.get("META_AGENT_PLAN_RETRIES", "2"))
+
+# Planner models from cheapest to strongest; a plan that fails validation is
+# escalated to the next one. "default" is the SDK's default model
+PLANNER_MODELS = [name.strip() for name in os.environ.get("META_AGENT_PLANNER_MODELS", "gpt-4.1-mini,default").split(",")
+                  if name.strip()] or ["default"]
+
+# Start planning on stable interim transcripts, before the user stops talking
+SPECULATIVE_PLANNING = os.environ.get("META_AGENT_SPECULATIVE_PLANNING", "0") == "1"
+
+# Calls waiting for a catalog change to go live, kept across reloads
+journal = CommandJournal()
 
 # Keep reference to transcriber to prevent garbage collection
 transcriber_reference: Dict[str, Optional[LiveTranscriber]] = {"instance": None}
 
+# Plans that already ran successfully, so repeated commands skip the planner
+plan_cache = PlanCache()
 
-def load_state() -> Dict[str, Any]:
-    """Load the current state from disk."""
-    if STATE_PATH.exists():
-        return json.loads(STATE_PATH.read_text())
-    return {}
+# Utterance patterns learned from successful plans, matched before any model call
+intent_table = IntentTable()
 
+# Name/docstring index used to route utterances to existing functions; built by start()
+catalog_index = SemanticIndex()
 
-def save_state(data: Dict[str, Any]) -> None:
-    """Save the current state to disk."""
-    STATE_PATH.write_text(json.dumps(data))
+# Signatures and one-line docstrings served by the get_available_functions tool
+catalog_summary = CatalogSummary()
 
 
 def reload_self() -> None:
     """Reload the current Python process."""
-    logger.info("Reloading process...")
-    python = sys.executable
-    os.execv(python, [python] + sys.argv)
+    restart_process()
+
+
+def hot_reload() -> None:
+    """Swap the freshly appended Catalog functions into the running process."""
+    global Catalog
+    Catalog = reload_catalog()
+
+
+async def run_pending_calls() -> int:
+    """
+    Run the journaled calls that are still pending, oldest first.
+
+    Returns:
+        Number of calls that ran successfully.
+    """
+    completed = 0
+    while True:
+        entry = journal.claim_next()
+        if entry is None:
+            return completed
+        if not function_exists(entry.call):
+            logger.warning(f"Skipping pending call {entry.call}: not in the catalog")
+            journal.fail(entry.id, "not in the catalog")
+            continue
+        details = entry.details
+        try:
+            await execute_call(entry.call, details.get("sequence"), details.get("dependencies"), entry.kwargs)
+        except Exception as e:
+            logger.exception(f"Pending call {entry.call} failed: {e}")
+            journal.fail(entry.id, str(e))
+            continue
+        journal.complete(entry.id)
+        completed += 1
+        utterance = details.get("utterance")
+        if not utterance:
+            continue
+        # Fallback plans are placeholders: caching one would keep the command
+        # from ever being planned, and learning from one would make the
+        # placeholder answer every command that shares its keywords
+        if details.get("fallback"):
+            continue
+        plan_cache.put(utterance, entry.call, details.get("functions", [entry.call]), Catalog,
+                       details.get("sequence"), details.get("dependencies"), entry.kwargs)
+        intent_table.learn(utterance, entry.call, details.get("sequence"), details.get("dependencies"),
+                           entry.kwargs, details.get("functions", [entry.call]), Catalog)
+
+
+def replay_pending_calls() -> None:
+    """
+    Run calls left pending by a previous process, before any new command is accepted.
+
+    Running them first keeps journaled calls ahead of newer commands, and
+    nothing else touches the catalog state while they run.
+    """
+    if journal.pending_count():
+        logger.info(f"Replaying {journal.pending_count()} pending call(s)")
+        asyncio.run(run_pending_calls())
+
+
+async def execute_function(func_name: str, kwargs: Optional[Dict[str, Any]] = None) -> Any:
+    """Execute a Catalog function by name, off the event loop."""
+    logger.info(f"Executing function: {func_name}")
+    return await run_function(Catalog, func_name, kwargs)
+
+
+async def run_step(func_name: str, upstream: Dict[str, Any]) -> Any:
+    """Run one plan step, passing it the results of the steps it depends on."""
+    parameters = inspect.signature(getattr(Catalog, func_name)).parameters
+    kwargs = {name: value for name, value in upstream.items() if name in parameters}
+    return await execute_function(func_name, kwargs)
+
+
+async def execute_call(func_name: str, sequence: Optional[List[str]] = None,
+                       dependencies: Optional[Dict[str, List[str]]] = None,
+                       kwargs: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Execute a planned call.
+    
+    When the plan declared step dependencies, its steps run as a DAG so that
+    independent ones run concurrently, each receiving the arguments it takes
+    from ``kwargs``; otherwise ``func_name`` (usually the sequential
+    composite) is called directly.
+    """
+    with stage("execute", call=func_name):
+        if sequence and len(sequence) > 1 and dependencies is not None:
+            logger.info(f"Executing {func_name} as a dependency graph of {len(sequence)} steps")
+            
+            async def step_with_arguments(step: str, upstream: Dict[str, Any]) -> Any:
+                return await run_step(step, {**(kwargs or {}), **upstream})
+            
+            return await run_dag(sequence, dependencies, step_with_arguments)
+        try:
+            return await execute_function(func_name, kwargs)
+        finally:
+            # A composite calls its steps itself; count them as used so that
+            # compaction does not archive steps only reached through it
+            for step in sequence or []:
+                if step != func_name:
+                    usage_stats.record_use(step)
+
+
+def call_arguments(func_name: str, utterance: str) -> Optional[Dict[str, Any]]:
+    """
+    Arguments for calling an existing Catalog function on behalf of an utterance.
+    
+    Returns:
+        The arguments, or None if the utterance lacks a value for a required parameter.
+    """
+    parameters = function_parameters(getattr(Catalog, func_name))
+    arguments = extract_arguments(parameters, utterance)
+    missing = missing_arguments(parameters, arguments)
+    if missing:
+        logger.info(f"No value for {', '.join(missing)} of {func_name} in: {utterance}")
+        return None
+    return arguments
+
+
+async def apply_catalog_changes() -> None:
+    """Make catalog changes live, then run the pending calls."""
+    if not hot_reload_enabled():
+        reload_self()
+        return
+    with stage("reload"):
+        hot_reload()
+    await run_pending_calls()
 
 
 def print_utterance(utterance: str) -> None:
@@ -60,84 +217,284 @@ def function_exists(name: str) -> bool:
     return hasattr(Catalog, name) and callable(getattr(Catalog, name))
 
 
-def append_to_catalog(code: str) -> None:
-    """Append code to the catalog.py file."""
-    catalog_path = Path(__file__).parent / "catalog.py"
-    with open(catalog_path, "a", encoding="utf-8") as fp:
-        fp.write(f"\n{code}\n")
+def append_to_catalog(code: str, staged: Optional[Dict[str, StagedFunction]] = None) -> bool:
+    """
+    Store the functions defined in code as catalog modules.
+
+    ``staged`` is the result of staging the code, if it was staged already.
+
+    Returns:
+        True if the catalog changed, False if every function was already in it.
+
+    Raises:
+        StagingError: If the code does not stage.
+    """
+    version = manifest_version()
+    catalog_index.add_code(code, store_functions(code, staged))
+    return manifest_version() != version
 
 
-@function_tool
-def get_available_functions() -> str:
-    """Get a list of all available functions in the Catalog."""
-    function_names = [name for name, func in Catalog.__dict__.items() 
-                    if callable(func) and not name.startswith('_')]
+def get_available_functions(query: str = "", page: int = 1) -> str:
+    """
+    List Catalog functions with their signatures and one-line descriptions.
+    
+    Args:
+        query: What the functions should do; leave empty to list the most used functions first.
+        page: Page of results to return, starting at 1.
+    """
+    if query:
+        names = [name for name, score in catalog_index.search(query, k=len(catalog_index)) if score > 0]
+    else:
+        names = function_names()
     
-    if not function_names:
+    listing = catalog_summary.render(names, page)
+    if not listing:
+        if query:
+            return f"No functions in the Catalog match '{query}'."
         return "No functions are currently available in the Catalog."
     
-    return "Available functions: " + ", ".join(function_names)
+    return listing
+
+
+PLANNER_INSTRUCTIONS = """
+You are an expert function planner for a MacOS system. Your job is to:
+
+1. Analyze what the user wants to do on their MacOS system
+2. Check which functions already exist in the Catalog (relevant ones are listed
+   with the request; if none of them fit, search with get_available_functions
+   and a short query, asking for further pages only when needed)
+3. Determine what new functions need to be created 
+4. Define the sequence of function calls needed to fulfill the request
+
+All functions MUST follow Single Responsibility Principle strictly. Make them as small and focused 
+as possible, often just one line. Functions can and should call other functions when appropriate.
+
+All functions must be methods of the Catalog class.
+
+Never hardcode values taken from the command, such as file names, URLs, text or numbers.
+Make them typed parameters instead, e.g. `def create_text_file(filename: str, content: str = "")`,
+so that one function serves every variant of the command; prefer an existing function with
+parameters over a new one. Values are filled in from the command, and a parameter named after
+an earlier step of the sequence receives that step's result.
+
+Ensure each function has:
+- Proper docstring
+- Appropriate return values
+- Error handling where necessary
+- Minimal implementation that follows SRP
+"""
+
+TEXT_FORMAT_INSTRUCTIONS = """
+When providing your response, include:
+1. Any new functions needed, written as complete Python code blocks in ```python format
+2. A clear statement of which functions to call in sequence, e.g. "Call sequence: a, b, c"
+3. The dependencies between those calls, one per line as "c depends on a, b", or
+   "Dependencies: none" if every call is independent; independent calls run in parallel
+4. A suggested name for a composite function if multiple functions need to be called
+5. For every parameter whose value the command implies but does not spell out, a line
+   "Argument name = value", e.g. "Argument app_name = Notes"
+
+Example function format:
+```python
+def open_chrome():
+    \"\"\"Open Google Chrome browser.\"\"\"
+    subprocess.run(["open", "-a", "Google Chrome"], check=True)
+    return "Chrome opened successfully"
+```
+"""
+
+STRUCTURED_FORMAT_INSTRUCTIONS = """
+Respond with a plan object:
+- new_functions: every function that does not exist yet, each with its name, its complete
+  Python source in `code` (a plain `def`, including any imports it needs) and a one-line docstring
+- sequence: the names of the functions to call, in order
+- dependencies: for each step that needs another step to finish first, the steps it depends on;
+  steps without dependencies run in parallel, and an empty list runs the whole sequence in order
+- composite_name: a name for a function that calls the whole sequence
+- arguments: values for parameters that the command implies but does not spell out
+"""
+
+
+# Snapshot of the hot catalog for the planner's system prompt, rebuilt only when the catalog changes
+_catalog_context: Dict[str, Any] = {"version": None, "text": ""}
+
+# Planning agents are built once per output type and reused for every utterance
+_planning_agents: Dict[Tuple[bool, bool], Agent] = {}
+
+# Serves the planner's models; only set to plug in another model provider
+_model_provider: Optional[ModelProvider] = None
+
+# Runs the planner once with the given prompt on the given model tier
+PlanAttempt = Callable[[str, str], Awaitable[ParsedPlan]]
+
+
+def catalog_context() -> str:
+    """
+    Versioned description of the catalog, appended after the static instructions.
+    
+    Between catalog changes it is byte-for-byte identical, so the whole system
+    prompt forms a stable prefix that the provider can serve from its prompt
+    cache; only the user message differs between planning calls.
+    """
+    version = manifest_version()
+    if _catalog_context["version"] != version:
+        listing = catalog_summary.render(function_names()) or "(no functions yet)"
+        _catalog_context["text"] = f"\nCatalog version {version}. Most used existing functions:\n{listing}\n"
+        _catalog_context["version"] = version
+    return _catalog_context["text"]
+
 
+def _with_catalog_context(static_instructions: str) -> Callable[..., str]:
+    """Dynamic instructions: the static text first, the catalog snapshot last."""
+    def instructions(run_context, agent) -> str:
+        return static_instructions + catalog_context()
+    return instructions
 
-async def generate_plan(utterance: str) -> Dict[str, Any]:
+
+def create_planning_agent(structured: bool = False, batch: bool = False) -> Agent:
     """
-    Use an agent to generate a plan for implementing the user's command.
+    Create the agent that plans how to implement a command.
     
-    The plan consists of:
-    - missing_functions: Dict of function_name -> function_code for functions that need to be created
-    - sequence: List of function names to call in sequence
-    - composite_name: Name for a new function that will call the sequence
+    With ``structured`` and ``batch``, the agent returns a BatchPlan for
+    several commands instead of a single CommandPlan. Text planners answer
+    batches in their usual format, so the instructions are the same.
     """
-    planning_agent = Agent(
-        name="Function Planner",
-        instructions="""
-        You are an expert function planner for a MacOS system. Your job is to:
-        
-        1. Analyze what the user wants to do on their MacOS system
-        2. Check which functions already exist in the Catalog
-        3. Determine what new functions need to be created 
-        4. Define the sequence of function calls needed to fulfill the request
-        
-        All functions MUST follow Single Responsibility Principle strictly. Make them as small and focused 
-        as possible, often just one line. Functions can and should call other functions when appropriate.
-        
-        All functions must be methods of the Catalog class.
-        
-        When providing your response, include:
-        1. Any new functions needed, written as complete Python code blocks in ```python format
-        2. A clear statement of which functions to call in sequence
-        3. A suggested name for a composite function if multiple functions need to be called
-        
-        Example function format:
-        ```python
-        def open_chrome():
-            """Open Google Chrome browser."""
-            subprocess.run(["open", "-a", "Google Chrome"], check=True)
-            return "Chrome opened successfully"
-        ```
+    from agents import Agent, function_tool
+    
+    if structured:
+        from .plan_schema import BatchPlan, CommandPlan
         
-        Ensure each function has:
-        - Proper docstring
-        - Appropriate return values
-        - Error handling where necessary
-        - Minimal implementation that follows SRP
-        """,
-        tools=[get_available_functions],
+        return Agent(
+            name="Function Planner",
+            instructions=_with_catalog_context(PLANNER_INSTRUCTIONS + STRUCTURED_FORMAT_INSTRUCTIONS),
+            tools=[function_tool(get_available_functions)],
+            output_type=BatchPlan if batch else CommandPlan,
+        )
+    return Agent(
+        name="Function Planner",
+        instructions=_with_catalog_context(PLANNER_INSTRUCTIONS + TEXT_FORMAT_INSTRUCTIONS),
+        tools=[function_tool(get_available_functions)],
     )
+
+
+def set_model_provider(provider: Optional[ModelProvider]) -> None:
+    """Serve planner calls from ``provider`` instead of the default OpenAI models, e.g. in benchmarks."""
+    global _model_provider
+    _model_provider = provider
+
+
+def planner_run_config(model: str = "default") -> Optional[RunConfig]:
+    """Run configuration for a planner call on one model tier; None for the SDK's defaults."""
+    if model == "default" and _model_provider is None:
+        return None
+    from agents import RunConfig
     
-    # Run the planning agent with the user's utterance
-    result = await Runner.run(planning_agent, f"Plan how to implement this command: '{utterance}'")
+    options: Dict[str, Any] = {} if model == "default" else {"model": model}
+    if _model_provider is not None:
+        options["model_provider"] = _model_provider
+    return RunConfig(**options)
+
+
+def get_planning_agent(structured: bool = False, batch: bool = False) -> Agent:
+    """Return the long-lived planning agent, creating it on first use."""
+    # Text planners use the same agent for single commands and batches
+    key = (structured, batch and structured)
+    if key not in _planning_agents:
+        _planning_agents[key] = create_planning_agent(*key)
+    return _planning_agents[key]
+
+
+async def run_planner(agent: Agent, prompt: str, on_text: Optional[Callable[[str], bool]] = None,
+                      model: str = "default") -> Any:
+    """
+    Run the planner as a stream, recording time to first token and total latency.
     
-    # Parse the response to extract the plan
-    functions, sequence, composite_name = parse_plan_from_agent_response(result.final_output)
+    ``on_text`` receives every text delta as it arrives; returning True
+    cancels the run. ``model`` overrides the agent's model, "default" keeps
+    it. Returns the streamed run result.
+    """
+    from agents import Runner
+    from openai.types.responses import ResponseTextDeltaEvent
+    
+    start = time.perf_counter()
+    first_token = None
+    result = Runner.run_streamed(agent, prompt, run_config=planner_run_config(model))
+    async for event in result.stream_events():
+        if event.type != "raw_response_event" or not isinstance(event.data, ResponseTextDeltaEvent):
+            continue
+        if first_token is None:
+            first_token = time.perf_counter() - start
+            metrics.observe(f"planner.{PLANNER_MODE}.ttft", first_token)
+            logger.info(f"Planner first token after {first_token:.2f}s")
+        if on_text is not None and on_text(event.data.delta):
+            result.cancel()
+            break
+    metrics.observe(f"planner.{PLANNER_MODE}.latency", time.perf_counter() - start)
+    return result
+
+
+def build_planning_prompt(utterance: str) -> str:
+    """Build the planner input for an utterance."""
+    # Only show the planner the existing functions most relevant to the command
+    candidates = [name for name, score in catalog_index.search(utterance) if score > 0]
+    prompt = f"Plan how to implement this command: '{utterance}'"
+    listing = catalog_summary.render(candidates)
+    if listing:
+        prompt += "\nRelevant existing Catalog functions:\n" + listing
+    return prompt
+
+
+BATCH_TEXT_FORMAT = """
+Answer each command separately: start with a line "Command N:" and follow it with the plan
+for that command in the usual format. A function defined for one command can be used by the
+others without defining it again; give each composite function a distinct name."""
+
+BATCH_STRUCTURED_FORMAT = """
+Return one plan per command in `plans`, in the order of the commands. A function defined for
+one command can be used by the others without defining it again; give each composite function
+a distinct name."""
+
+
+def build_batch_planning_prompt(utterances: List[str]) -> str:
+    """Build the planner input for several commands planned in one call."""
+    prompt = "Plan how to implement each of these commands:\n"
+    prompt += "\n".join(f"Command {number}: '{utterance}'" for number, utterance in enumerate(utterances, 1))
+    candidates = list(dict.fromkeys(name for utterance in utterances
+                                    for name, score in catalog_index.search(utterance) if score > 0))
+    listing = catalog_summary.render(candidates)
+    if listing:
+        prompt += "\nRelevant existing Catalog functions:\n" + listing
+    return prompt + (BATCH_STRUCTURED_FORMAT if PLANNER_MODE == "structured" else BATCH_TEXT_FORMAT)
+
+
+def plan_from_parsed(utterance: str, parsed: ParsedPlan) -> Dict[str, Any]:
+    """Turn a parsed planner response into a plan for handle_plan()."""
+    functions, sequence, composite_name = parsed.functions, parsed.sequence, parsed.composite_name
+    
+    # Malformed code would only break the catalog, so give up before touching it
+    if parsed.errors:
+        metrics.increment("planner.rejected_plans")
+        logger.error(f"Planner returned malformed code: {'; '.join(parsed.errors)}")
+        return {
+            "utterance": utterance,
+            "missing_functions": {},
+            "sequence": [],
+            "composite_name": composite_name,
+            "dependencies": None,
+            "arguments": {}
+        }
     
     # If we couldn't extract any functions or sequence, use a fallback
-    if not functions and not sequence:
+    fallback = not functions and not sequence
+    if fallback:
+        metrics.increment("planner.fallback_plans")
         logger.warning("Could not extract functions or sequence from response, using fallback")
         function_name = "dummy_function"
         if "open" in utterance.lower() and "chrome" in utterance.lower():
             function_name = "open_chrome"
-            code = """    @staticmethod
+            code = """    import subprocess
+    
+    @staticmethod
     def open_chrome() -> str:
         \"\"\"Open Google Chrome browser.\"\"\"
         subprocess.run(["open", "-a", "Google Chrome"], check=True)
@@ -156,46 +513,451 @@ async def generate_plan(utterance: str) -> Dict[str, Any]:
         sequence = [function_name]
     
     return {
+        "utterance": utterance,
         "missing_functions": functions,
         "sequence": sequence,
-        "composite_name": composite_name
+        "composite_name": composite_name,
+        "dependencies": parsed.dependencies,
+        "arguments": parsed.arguments,
+        # A placeholder rather than the planner's answer, never reused for later commands
+        "fallback": fallback
     }
 
 
-def create_composite_function(name: str, sequence: List[str]) -> str:
-    """Create a composite function that calls a sequence of functions."""
-    body_lines = [f"        Catalog.{fn}()" for fn in sequence]
+@lru_cache(maxsize=64)
+def staged_code(code: str) -> Dict[str, StagedFunction]:
+    """
+    Stage the functions defined in code, once per distinct snippet.
+    
+    The streamed planner stages functions while the plan is written, and
+    validation and the catalog append reuse that result instead of
+    compiling the code again.
+    
+    Raises:
+        StagingError: If the code does not stage.
+    """
+    return stage_code(code)
+
+
+def plan_problems(parsed: ParsedPlan, defined: Collection[str] = ()) -> List[str]:
+    """
+    Reasons to reject a parsed plan: parse errors, functions that do not
+    stage, calls to functions that exist nowhere, or no plan at all.
+    
+    ``defined`` names functions that other plans of the same batch add.
+    """
+    problems = list(parsed.errors)
+    if not parsed.functions and not parsed.sequence:
+        problems.append("The plan defines no functions and no call sequence")
+    for code in parsed.functions.values():
+        try:
+            staged_code(code)
+        except StagingError as e:
+            problems.append(str(e))
+    for step in parsed.sequence:
+        if step not in parsed.functions and step not in defined and not function_exists(step):
+            problems.append(f"The sequence calls {step}, which is neither defined in the plan nor in the Catalog")
+    return problems
+
+
+async def plan_in_tiers(utterance: str, attempt: PlanAttempt, first_tier: int = 0,
+                        attempts: int = 1) -> ParsedPlan:
+    """
+    Plan on the cheapest model tier first and escalate while plans fail validation.
+    
+    Every failed attempt moves to the next tier in PLANNER_MODELS, with the
+    problems as feedback, until the strongest tier has been tried; if
+    ``attempts`` allows more, the strongest tier is retried. Attempts, valid
+    plans and failures are counted per tier, so the hit rate of each tier
+    can be read from metrics.
+    
+    Returns:
+        The first valid plan, or the last one if none was valid.
+    """
+    tiers = PLANNER_MODELS[min(first_tier, len(PLANNER_MODELS) - 1):]
+    prompt = build_planning_prompt(utterance)
+    parsed = ParsedPlan()
+    for number in range(max(attempts, len(tiers))):
+        model = tiers[min(number, len(tiers) - 1)]
+        metrics.increment(f"planner.{PLANNER_MODE}.model_calls")
+        metrics.increment(f"planner.tiers.{model}.attempts")
+        if number:
+            metrics.increment(f"planner.{PLANNER_MODE}.retries")
+        parsed = await attempt(prompt, model)
+        problems = plan_problems(parsed)
+        if not problems:
+            metrics.increment(f"planner.{PLANNER_MODE}.valid_plans")
+            metrics.increment(f"planner.tiers.{model}.hits")
+            return parsed
+        metrics.increment(f"planner.{PLANNER_MODE}.validation_failures")
+        metrics.increment(f"planner.tiers.{model}.failures")
+        logger.warning(f"Plan from {model} failed validation (attempt {number + 1}): {'; '.join(problems)}")
+        prompt = (build_planning_prompt(utterance)
+                  + "\nYour previous plan was rejected, fix these problems: " + "; ".join(problems))
+    return parsed
+
+
+async def generate_plan(utterance: str, first_tier: int = 0) -> Dict[str, Any]:
+    """
+    Use an agent to generate a plan for implementing the user's command.
+    
+    The plan consists of:
+    - missing_functions: Dict of function_name -> function_code for functions that need to be created
+    - sequence: List of function names to call in sequence
+    - composite_name: Name for a new function that will call the sequence
+    
+    Planning starts on the model tier ``first_tier`` of PLANNER_MODELS and
+    escalates to stronger models while the plan fails validation.
+    """
+    if PLANNER_MODE == "structured":
+        # Structured output may also be retried on the strongest tier
+        parsed = await plan_in_tiers(utterance, plan_structured, first_tier, PLAN_RETRIES + 1)
+    elif PLANNER_MODE == "streamed":
+        parsed = await plan_in_tiers(utterance, plan_streamed, first_tier)
+    else:
+        parsed = await plan_in_tiers(utterance, plan_text, first_tier)
+    metrics.flush()
+    return plan_from_parsed(utterance, parsed)
+
+
+async def plan_text(prompt: str, model: str) -> ParsedPlan:
+    """Run the planner once and parse its complete response."""
+    with stage("plan", mode=PLANNER_MODE, model=model):
+        result = await run_planner(get_planning_agent(), prompt, model=model)
+    with stage("parse"):
+        return parse_plan(result.final_output)
+
+
+async def plan_structured(prompt: str, model: str) -> ParsedPlan:
+    """
+    Run the planner once with the typed CommandPlan schema as structured output.
+    
+    Output that does not match the schema is reported in ``errors``.
+    """
+    from agents import ModelBehaviorError
+    from .plan_schema import CommandPlan
+    
+    try:
+        with stage("plan", mode=PLANNER_MODE, model=model):
+            result = await run_planner(get_planning_agent(structured=True), prompt, model=model)
+    except ModelBehaviorError as e:
+        return ParsedPlan(errors=[f"Output did not match the plan schema: {e}"])
+    with stage("parse"):
+        return result.final_output_as(CommandPlan).to_parsed_plan()
+
+
+async def plan_streamed(prompt: str, model: str) -> ParsedPlan:
+    """
+    Run the planner once as a stream, parsing the response while it is generated.
+    
+    Text deltas are fed to the function parser as they arrive, and every
+    function is staged as soon as its code block closes, while the planner is
+    still writing the rest of the plan; validation and the catalog append
+    reuse the result. Code that does not stage cancels the run immediately.
+    """
+    parser = StreamingPlanParser()
+    staged = 0
+    start = time.perf_counter()
+    
+    def on_text(delta: str) -> bool:
+        nonlocal staged
+        for name, code in parser.feed(delta).items():
+            try:
+                staged_code(code)
+            except StagingError as e:
+                parser.plan.errors.append(str(e))
+                continue
+            staged += 1
+            logger.info(f"Staged {name} after {time.perf_counter() - start:.2f}s")
+        return bool(parser.plan.errors)
+    
+    # Parsing overlaps with generation here, so "plan" includes most of it
+    with stage("plan", mode=PLANNER_MODE, model=model):
+        await run_planner(get_planning_agent(), prompt, on_text, model=model)
+    
+    with stage("parse"):
+        parsed = parser.finish()
+        logger.info(f"Streamed plan finished after {time.perf_counter() - start:.2f}s "
+                    f"with {staged} staged function(s)")
+        return parsed
+
+
+async def generate_batch_plans(utterances: List[str]) -> List[Dict[str, Any]]:
+    """
+    Plan several commands with a single model call on the cheapest model tier.
+    
+    Commands whose part of the answer is missing or fails validation are
+    planned again on their own, starting on the next tier, so a bad batch
+    answer costs extra calls but never loses a command.
+    """
+    from agents import ModelBehaviorError
+    
+    structured = PLANNER_MODE == "structured"
+    model = PLANNER_MODELS[0]
+    metrics.increment("planner.batch.model_calls")
+    metrics.increment("planner.batch.commands", len(utterances))
+    metrics.increment(f"planner.tiers.{model}.attempts", len(utterances))
+    parsed: Dict[int, ParsedPlan] = {}
+    try:
+        with stage("plan", mode=PLANNER_MODE, model=model, commands=len(utterances)):
+            result = await run_planner(get_planning_agent(structured, batch=True),
+                                       build_batch_planning_prompt(utterances), model=model)
+    except ModelBehaviorError as e:
+        logger.warning(f"Batch plan did not match the schema: {e}")
+    else:
+        with stage("parse"):
+            if structured:
+                from .plan_schema import BatchPlan
+                
+                plans = result.final_output_as(BatchPlan).plans[:len(utterances)]
+                parsed = {index: plan.to_parsed_plan() for index, plan in enumerate(plans)}
+            else:
+                parsed = parse_batch_plan(result.final_output, len(utterances))
+    
+    defined = {name for part in parsed.values() for name in part.functions}
+    plans = []
+    for index, utterance in enumerate(utterances):
+        part = parsed.get(index)
+        problems = plan_problems(part, defined) if part is not None else ["No plan in the batch answer"]
+        if problems:
+            metrics.increment("planner.batch.fallbacks")
+            metrics.increment(f"planner.tiers.{model}.failures")
+            logger.warning(f"No usable plan for '{utterance}' in the batch ({'; '.join(problems)}), "
+                           f"planning it on its own")
+            plans.append(await generate_plan(utterance, first_tier=1))
+        else:
+            metrics.increment(f"planner.tiers.{model}.hits")
+            plans.append(plan_from_parsed(utterance, part))
+    metrics.flush()
+    return plans
+
+
+def create_composite_function(name: str, sequence: List[str],
+                              parameters: Optional[Dict[str, List[Parameter]]] = None) -> str:
+    """
+    Create a composite function that calls a sequence of functions.
+    
+    Parameters of the steps (``parameters`` maps each step to its own) become
+    parameters of the composite and are passed through by keyword, except
+    those named after an earlier step, which receive that step's result.
+    """
+    parameters = parameters or {}
+    results_used = {param.name for fn in sequence for param in parameters.get(fn, [])} & set(sequence)
+    signature: Dict[str, Parameter] = {}
+    done = set()
+    body_lines = []
+    for fn in sequence:
+        step_parameters = parameters.get(fn, [])
+        for param in step_parameters:
+            if param.name not in done:
+                signature.setdefault(param.name, param)
+        call = f"Catalog.{fn}({', '.join(f'{param.name}={param.name}' for param in step_parameters)})"
+        body_lines.append(f"        {fn} = {call}" if fn in results_used else f"        {call}")
+        done.add(fn)
     body = "\n".join(body_lines) if body_lines else "        pass"
+    # Required parameters must come before those with defaults
+    ordered = sorted(signature.values(), key=lambda param: not param.required)
     
     return f"""    @staticmethod
-    def {name}() -> str:
+    def {name}({', '.join(param.source() for param in ordered)}) -> str:
         \"\"\"Execute a sequence of functions.\"\"\"
 {body}
         return "Task completed"
 """
 
 
-def handle_plan(plan: Dict[str, Any]) -> None:
-    """Implement the plan by adding functions to the catalog and reloading."""
+def planned_parameters(func_name: str, missing: Dict[str, str]) -> List[Parameter]:
+    """Parameters of a function in a plan, read from its new code or from the catalog."""
+    if func_name in missing:
+        try:
+            return parameters_from_code(missing[func_name])
+        except SyntaxError:
+            return []
+    if function_exists(func_name):
+        return function_parameters(getattr(Catalog, func_name))
+    return []
+
+
+def plan_arguments(parameters: List[Parameter], plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Arguments for a planned call: values in the utterance, overridden by the planner's.
+    
+    Returns:
+        The arguments, or None if a required parameter has no value.
+    """
+    arguments = extract_arguments(parameters, plan.get("utterance", ""))
+    for param in parameters:
+        if param.name in plan.get("arguments", {}):
+            arguments[param.name] = convert_argument(param, plan["arguments"][param.name])
+    missing = missing_arguments(parameters, arguments)
+    if missing:
+        logger.error(f"No value for {', '.join(missing)} in the command, not running it")
+        return None
+    return arguments
+
+
+def _replaces_function(name: str, code: str) -> bool:
+    """Whether storing ``code`` as ``name`` would overwrite a different catalog function."""
+    if not function_exists(name):
+        return False
+    try:
+        return function_fingerprint(inspect.getsource(getattr(Catalog, name))) != function_fingerprint(code)
+    except (OSError, TypeError, SyntaxError, ValueError):
+        return True
+
+
+def composite_name_for(plan: Dict[str, Any], planned: Dict[str, str],
+                       composites: Optional[Dict[str, List[str]]] = None) -> str:
+    """
+    Name for a plan's composite function that does not take over another function's name.
+
+    The planner's choice gets a numbered suffix while it names a different
+    catalog function, a step, a function in ``planned``, or another
+    composite of the same batch (``composites`` maps those to their
+    sequences). A composite identical to the catalog function of that name
+    keeps the name, so a repeated plan reuses it.
+    """
+    sequence = plan.get("sequence", [])
+    composites = composites or {}
+    name = base = plan.get("composite_name") or DEFAULT_COMPOSITE_NAME
+    suffix = 1
+    while (composites.get(name, sequence) != sequence or name in sequence or name in planned
+           or _replaces_function(name, create_composite_function(
+               name, sequence, {fn: planned_parameters(fn, planned) for fn in sequence}))):
+        suffix += 1
+        name = f"{base}_{suffix}"
+    return name
+
+
+def add_plan(plan: Dict[str, Any], composite_name: Optional[str] = None,
+             batch_functions: Optional[Dict[str, str]] = None) -> bool:
+    """
+    Add a plan's functions to the catalog and journal its call.
+    
+    The call runs once the catalog change is live. ``composite_name``
+    overrides the name chosen by ``composite_name_for()`` for the composite function, and
+    ``batch_functions`` holds the code of functions that other plans of the
+    same batch add, which this plan may call.
+    
+    Returns:
+        True if the catalog changed.
+    """
     # Add missing functions
     missing = plan.get("missing_functions", {})
-    for _, code in missing.items():
-        append_to_catalog(code)
+    if not missing and not plan.get("sequence"):
+        logger.warning("Plan is empty, nothing to do")
+        return False
     
-    # Create composite function if needed
     sequence = plan.get("sequence", [])
+    utterance = plan.get("utterance", "")
+    planned = {**(batch_functions or {}), **missing}
+    with stage("catalog_append", functions=list(missing)):
+        codes = list(missing.values())
+        
+        # Create composite function if needed
+        if len(sequence) > 1:
+            composite_name = composite_name or composite_name_for(plan, planned)
+            composite_code = create_composite_function(
+                composite_name, sequence, {fn: planned_parameters(fn, planned) for fn in sequence})
+            codes.append(composite_code)
+        
+        # Stage everything first, so a broken function leaves the catalog untouched and costs no reload
+        try:
+            staged = [staged_code(code) for code in codes]
+        except StagingError as e:
+            metrics.increment("staging.rejected_plans")
+            logger.error(f"Not running '{utterance}', its code does not load: {e}")
+            return False
+        changed = False
+        for code, functions in zip(codes, staged):
+            changed |= append_to_catalog(code, functions)
+    
+    arguments = None
     if len(sequence) > 1:
-        composite_name = plan.get("composite_name", "run_task")
-        composite_code = create_composite_function(composite_name, sequence)
-        append_to_catalog(composite_code)
-        # Save state to remember what to call after reload
-        save_state({"call": composite_name})
+        arguments = plan_arguments(parameters_from_code(composite_code), plan)
+        # Journal the call so it runs once the catalog change is live, even across a reload
+        if arguments is not None:
+            journal.append(composite_name, arguments, utterance=utterance,
+                           functions=[composite_name] + sequence,
+                           sequence=sequence, dependencies=plan.get("dependencies"),
+                           fallback=plan.get("fallback", False))
     elif len(sequence) == 1:
         # If only one function, just call it directly
-        save_state({"call": sequence[0]})
+        arguments = plan_arguments(planned_parameters(sequence[0], planned), plan)
+        if arguments is not None:
+            journal.append(sequence[0], arguments, utterance=utterance, functions=sequence,
+                           fallback=plan.get("fallback", False))
+    return changed
+
+
+async def handle_plans(plans: List[Dict[str, Any]]) -> None:
+    """
+    Implement several plans with one catalog update and at most one reload.
     
-    # Reload to apply changes
-    reload_self()
+    Every call is journaled before the reload, so none of them is lost to it.
+    Composite functions that would share a name with each other or with a
+    different catalog function get a numbered suffix.
+    """
+    changed = False
+    batch_functions = {name: code for plan in plans for name, code in plan.get("missing_functions", {}).items()}
+    composites: Dict[str, List[str]] = {}
+    for plan in plans:
+        name = None
+        if len(plan.get("sequence", [])) > 1:
+            name = composite_name_for(plan, {**batch_functions, **plan.get("missing_functions", {})}, composites)
+            composites[name] = plan["sequence"]
+        changed |= add_plan(plan, name, batch_functions)
+    
+    # Reload to apply changes; reused functions are live already
+    if changed:
+        await apply_catalog_changes()
+    else:
+        await run_pending_calls()
+
+
+async def handle_plan(plan: Dict[str, Any]) -> None:
+    """Implement the plan by adding functions to the catalog and reloading."""
+    await handle_plans([plan])
+
+
+async def plan_and_handle(utterances: List[str]) -> None:
+    """Plan a batch of utterances, with one model call if there are several, and implement the plans."""
+    if len(utterances) == 1:
+        plans = [await generate_plan(utterances[0])]
+    else:
+        plans = await generate_batch_plans(utterances)
+    await handle_plans(plans)
+
+
+# Utterances that need the planner within a short window are planned together
+planning_batcher = CoalescingBatcher(plan_and_handle)
+
+
+async def plan_speculatively(text: str) -> Optional[Dict[str, Any]]:
+    """Plan for an interim transcript, unless the command will not need the planner."""
+    if plan_cache.get(text, Catalog) or intent_table.match(text, Catalog) or catalog_index.match(text):
+        return None
+    return await generate_plan(text)
+
+
+speculator = SpeculativePlanner(plan_speculatively)
+
+
+def adopt_speculative_plan(plan: Dict[str, Any], utterance: str) -> Dict[str, Any]:
+    """
+    Reuse a speculative plan's functions for the final utterance.
+
+    The planner's arguments came from an interim transcript, whose values
+    the user may still have corrected, so only those that also appear in the
+    final utterance are kept; the rest are extracted from it again.
+    """
+    text = utterance.lower()
+    arguments = {name: value for name, value in plan.get("arguments", {}).items()
+                 if str(value).lower() in text}
+    dropped = set(plan.get("arguments", {})) - set(arguments)
+    if dropped:
+        logger.info(f"Re-extracting {', '.join(sorted(dropped))} from the final utterance")
+    return {**plan, "utterance": utterance, "arguments": arguments}
 
 
 async def process_utterance(utterance: str) -> None:
@@ -203,37 +965,98 @@ async def process_utterance(utterance: str) -> None:
     if not utterance.strip():
         return
     
-    # Check if we have pending tasks from previous run
-    state = load_state()
-    if state:
-        func_name = state.get("call")
-        if func_name and function_exists(func_name):
-            logger.info(f"Executing function: {func_name}")
-            func = getattr(Catalog, func_name)
-            func()
-        # Clear state
-        STATE_PATH.unlink(missing_ok=True)
+    # Reuse a plan that already ran for the same command
+    cached = plan_cache.get(utterance, Catalog)
+    if cached:
+        speculator.cancel()
+        logger.info(f"Using cached plan: {cached['call']}")
+        await execute_call(cached["call"], cached.get("sequence"), cached.get("dependencies"), cached.get("kwargs"))
+        return
+    
+    # Run the call learned from earlier plans for similar commands, with this command's arguments
+    intent = intent_table.match(utterance, Catalog)
+    if intent:
+        arguments = call_arguments(intent.call, utterance)
+        if arguments is not None:
+            speculator.cancel()
+            logger.info(f"Matched intent: {intent.call}")
+            await execute_call(intent.call, intent.sequence, intent.dependencies, arguments)
+            return
+    
+    # Route straight to an existing function that clearly matches the command
+    match = catalog_index.match(utterance)
+    arguments = call_arguments(match, utterance) if match else None
+    if arguments is not None:
+        speculator.cancel()
+        logger.info(f"Matched existing function: {match}")
+        await execute_call(match, kwargs=arguments)
         return
     
-    # Generate a plan for implementing the utterance
-    plan = await generate_plan(utterance)
-    handle_plan(plan)
+    # Use the plan made while the user was speaking, or generate one now
+    plan = await speculator.claim(utterance)
+    if plan is not None:
+        logger.info("Using speculative plan")
+        await handle_plan(adopt_speculative_plan(plan, utterance))
+    else:
+        await planning_batcher.submit(utterance)
 
 
 async def manager(utterance: str, transcriber: Optional[LiveTranscriber] = None) -> None:
     """Entry point for new utterances from the transcriber."""
-    print_utterance(utterance)
-    await process_utterance(utterance)
+    with command_trace(utterance):
+        print_utterance(utterance)
+        await process_utterance(utterance)
+
+
+async def interim_manager(transcript: str, transcriber: Optional[LiveTranscriber] = None) -> None:
+    """Entry point for interim transcripts, used for speculative planning."""
+    speculator.update(transcript)
+
+
+def transcriber_options(transcriber_class: type) -> Dict[str, Any]:
+    """Extra LiveTranscriber arguments, e.g. the interim transcript callback."""
+    if not SPECULATIVE_PLANNING:
+        return {}
+    if "interim_callback" not in inspect.signature(transcriber_class).parameters:
+        logger.warning("This LiveTranscriber does not report interim transcripts; speculative planning is off")
+        return {}
+    return {"interim_callback": interim_manager}
+
+
+def start() -> None:
+    """
+    Prepare the assistant for its first utterance.
+
+    Calls interrupted by a crash go back to pending, the catalog index is
+    built and, if tracing is on, the SDK's tracing is set up. This is real
+    work, so it runs here rather than at import time or on the first command.
+    """
+    journal.recover()
+    catalog_index.build(function_docs())
+    install_tracing()
 
 
 def _run_transcriber() -> None:
     """Run the LiveTranscriber."""
+    from livetranscriber import LiveTranscriber
+    
     logger.info("Starting LiveTranscriber...")
-    tr = LiveTranscriber(callback=manager)
+    warm_up()
+    replay_pending_calls()
+    tr = LiveTranscriber(callback=manager, **transcriber_options(LiveTranscriber))
     transcriber_reference["instance"] = tr
-    tr.run()
+    try:
+        tr.run()
+    finally:
+        shutdown()
     logger.info("LiveTranscriber stopped")
 
 
+def main() -> None:
+    """Start the assistant and listen for commands."""
+    start()
+    _run_transcriber()
+
+
 if __name__ == "__main__":
-    _run_transcriber() 
\ No newline at end of file
+    main() 
\ No newline at end of file
@@ -0,0 +1,60 @@
+"""Helpers for applying catalog changes without restarting the process."""
+
+import importlib
+import logging
+import os
+import sys
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# "hot" swaps new Catalog functions into the running process, "exec" restarts it
+RELOAD_MODE = os.environ.get("META_AGENT_RELOAD_MODE", "hot").lower()
+
+CATALOG_MODULE = f"{__package__}.catalog"
+
+# Replaces os.execv when the process is managed by a supervisor such as the fork server
+_restart_handler: Optional[Callable[[], None]] = None
+
+
+def hot_reload_enabled() -> bool:
+    """Check whether catalog changes should be applied in-process."""
+    return RELOAD_MODE != "exec"
+
+
+def reload_catalog() -> type:
+    """
+    Re-read the catalog manifest and return the refreshed Catalog class.
+
+    Function modules are dropped from ``sys.modules`` so that replaced
+    functions are imported afresh on their next use. Composite functions
+    resolve ``Catalog`` through the reloaded package, so they see new
+    functions as well.
+    """
+    importlib.invalidate_caches()
+    prefixes = (f"{CATALOG_MODULE}.functions.", f"{CATALOG_MODULE}.archive.")
+    for name in [name for name in sys.modules if name.startswith(prefixes)]:
+        del sys.modules[name]
+    module = sys.modules.get(CATALOG_MODULE)
+    if module is None:
+        module = importlib.import_module(CATALOG_MODULE)
+    else:
+        module = importlib.reload(module)
+    logger.info("Catalog reloaded in-process")
+    return module.Catalog
+
+
+def set_restart_handler(handler: Optional[Callable[[], None]]) -> None:
+    """Install a function that restarts the process instead of os.execv."""
+    global _restart_handler
+    _restart_handler = handler
+
+
+def restart_process() -> None:
+    """Replace the current process with a fresh interpreter."""
+    logger.info("Reloading process...")
+    if _restart_handler is not None:
+        _restart_handler()
+        return
+    python = sys.executable
+    os.execv(python, [python] + sys.argv)
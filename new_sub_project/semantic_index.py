@@ -0,0 +1,167 @@
+"""Character n-gram TF-IDF index over Catalog functions for LLM-free command routing."""
+
+import ast
+import logging
+import math
+import os
+import re
+import textwrap
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Minimum cosine similarity for an utterance to be routed straight to a function
+MATCH_THRESHOLD = float(os.environ.get("META_AGENT_MATCH_THRESHOLD", "0.7"))
+
+# Minimum lead of the best function over the runner-up for a direct match
+MATCH_MARGIN = float(os.environ.get("META_AGENT_MATCH_MARGIN", "0.2"))
+
+# Words that turn a command around; an utterance containing one is never matched directly
+NEGATIONS = frozenset({"not", "dont", "never", "no", "stop", "without", "cancel", "undo"})
+
+# Number of candidate functions handed to the planner
+TOP_K = int(os.environ.get("META_AGENT_TOP_K", "8"))
+
+NGRAM_SIZE = 3
+
+
+def _ngrams(text: str) -> Counter:
+    """Split text into padded character n-grams per word."""
+    words = re.findall(r"[a-z0-9]+", text.lower().replace("_", " "))
+    grams: Counter = Counter()
+    for word in words:
+        padded = f" {word} "
+        for i in range(max(len(padded) - NGRAM_SIZE + 1, 1)):
+            grams[padded[i:i + NGRAM_SIZE]] += 1
+    return grams
+
+
+def _words(text: str) -> List[str]:
+    """Lowercase words of a text, with function names split at underscores."""
+    return re.findall(r"[a-z0-9]+", text.lower().replace("'", "").replace("_", " "))
+
+
+def keywords_agree(name: str, utterance: str) -> bool:
+    """
+    Check that an utterance asks for what a function does, not just something similar.
+
+    The verb the function name starts with must be in the utterance, as must
+    one of its other words if it has any, and the utterance must not be
+    negated. This keeps "delete the text file" away from ``create_text_file``
+    and "do not open chrome" away from ``open_chrome``.
+    """
+    words = set(_words(utterance))
+    name_words = _words(name)
+    if not name_words or (words & NEGATIONS) - set(name_words):
+        return False
+    verb, rest = name_words[0], name_words[1:]
+    return verb in words and (not rest or any(word in words for word in rest))
+
+
+def _describe(name: str, doc: Optional[str]) -> str:
+    """Build the text that represents a function in the index."""
+    first_line = (doc or "").strip().split("\n")[0]
+    return f"{name} {first_line}"
+
+
+class SemanticIndex:
+    """Incrementally maintained TF-IDF index of function names and docstrings."""
+
+    def __init__(self):
+        self._docs: Dict[str, Counter] = {}
+        self._df: Counter = Counter()
+        self._vectors: Dict[str, Dict[str, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, name: str, doc: Optional[str] = None) -> None:
+        """Add or replace a function in the index."""
+        self.remove(name)
+        grams = _ngrams(_describe(name, doc))
+        self._docs[name] = grams
+        self._df.update(grams.keys())
+        # Document frequencies changed, so cached vectors are stale
+        self._vectors.clear()
+
+    def remove(self, name: str) -> None:
+        """Remove a function from the index if present."""
+        grams = self._docs.pop(name, None)
+        if grams is None:
+            return
+        self._df.subtract(grams.keys())
+        self._df += Counter()  # drop zero counts
+        self._vectors.clear()
+
+    def add_code(self, code: str, names: Optional[Iterable[str]] = None) -> None:
+        """Index the functions defined in a snippet of catalog code, or only ``names`` if given."""
+        try:
+            tree = ast.parse(textwrap.dedent(code))
+        except SyntaxError:
+            logger.warning("Could not parse code for the semantic index")
+            return
+        wanted = None if names is None else set(names)
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                if wanted is None or node.name in wanted:
+                    self.add(node.name, ast.get_docstring(node))
+
+    def build(self, docs: Dict[str, Optional[str]]) -> None:
+        """Index functions from a mapping of names to docstrings."""
+        self._docs.clear()
+        self._df.clear()
+        self._vectors.clear()
+        for name, doc in docs.items():
+            self.add(name, doc)
+
+    def _idf(self, gram: str) -> float:
+        """Smoothed inverse document frequency."""
+        n_docs = len(self._docs)
+        return math.log((1 + n_docs) / (1 + self._df.get(gram, 0))) + 1
+
+    def _weigh(self, grams: Counter) -> Dict[str, float]:
+        """Turn n-gram counts into an L2-normalised TF-IDF vector."""
+        vector = {gram: count * self._idf(gram) for gram, count in grams.items()}
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        return {gram: w / norm for gram, w in vector.items()}
+
+    def _vector(self, name: str) -> Dict[str, float]:
+        """Return the cached TF-IDF vector of an indexed function."""
+        if name not in self._vectors:
+            self._vectors[name] = self._weigh(self._docs[name])
+        return self._vectors[name]
+
+    def search(self, utterance: str, k: int = TOP_K) -> List[Tuple[str, float]]:
+        """Return the k functions most similar to the utterance."""
+        if not self._docs:
+            return []
+        query = self._weigh(_ngrams(utterance))
+        scores = []
+        for name in self._docs:
+            vector = self._vector(name)
+            score = sum(w * vector.get(gram, 0.0) for gram, w in query.items())
+            scores.append((name, score))
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores[:k]
+
+    def match(self, utterance: str, threshold: float = MATCH_THRESHOLD,
+              margin: float = MATCH_MARGIN) -> Optional[str]:
+        """
+        Return the function to run directly for an utterance, if one clearly matches.
+
+        The best function must clear the threshold, lead the runner-up by
+        ``margin`` and agree with the utterance's keywords. Anything less
+        only makes it a candidate for the planner, through ``search``.
+        """
+        results = self.search(utterance, k=2)
+        if not results:
+            return None
+        name, score = results[0]
+        runner_up = results[1][1] if len(results) > 1 else 0.0
+        if score < threshold or score - runner_up < margin:
+            return None
+        if not keywords_agree(name, utterance):
+            logger.info(f"Not running {name} for '{utterance}': similar ({score:.2f}) but the keywords disagree")
+            return None
+        return name
@@ -1,47 +1,126 @@
 """Simple prototype for meta-agent system."""
 
+from __future__ import annotations
+
 import asyncio
-import json
 import logging
-import os
 import subprocess
-import sys
 from pathlib import Path
-from typing import Dict, Any, Optional
-
-from livetranscriber import LiveTranscriber
-from agents import Agent, Runner, function_tool
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
+from .argument_extractor import extract_arguments, function_parameters, missing_arguments, parameters_from_code
 from .catalog import Catalog
+from .catalog_store import append_to_catalog as store_functions, manifest_version
+from .command_journal import CommandJournal
+from .executor_pool import run_function, shutdown, warm_up
+from .function_staging import StagingError
+from .intent_table import Intent, IntentTable
+from .reloader import hot_reload_enabled, reload_catalog, restart_process
+from .trace_log import command_trace, stage
+
+if TYPE_CHECKING:
+    from livetranscriber import LiveTranscriber
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# State file for persistence
-STATE_PATH = Path(__file__).parent / "state.json"
+# Calls waiting for a catalog change to go live, kept across reloads
+journal = CommandJournal()
+journal.recover()
 
 # Keep reference to transcriber
 transcriber_reference = {"instance": None}
 
+# Commands this prototype knows without a planner, with the code of their function
+BUILTIN_INTENTS = [
+    Intent(
+        call="open_chrome",
+        patterns=[["chrome"], ["browser"]],
+        code="""    import subprocess
+    
+    @staticmethod
+    def open_chrome() -> str:
+        \"\"\"Open Google Chrome browser.\"\"\"
+        subprocess.run(["open", "-a", "Google Chrome"], check=True)
+        return "Chrome opened successfully"
+""",
+    ),
+    Intent(
+        call="create_text_file",
+        patterns=[["text file"], ["create", "file"]],
+        code="""    from pathlib import Path
+    
+    @staticmethod
+    def create_text_file(filename: str = "new_file.txt", content: str = "Created by meta-agent") -> str:
+        \"\"\"Create a text file on the desktop.\"\"\"
+        path = Path.home() / "Desktop" / filename
+        with open(path, "w") as f:
+            f.write(content)
+        return f"Created file at {path}"
+""",
+        slots=["filename", "content"],
+    ),
+]
 
-def load_state() -> Dict[str, Any]:
-    """Load state from disk."""
-    if STATE_PATH.exists():
-        return json.loads(STATE_PATH.read_text())
-    return {}
-
-
-def save_state(data: Dict[str, Any]) -> None:
-    """Save state to disk."""
-    STATE_PATH.write_text(json.dumps(data))
+# Built-in intents plus those learned by the full prototype
+intent_table = IntentTable(builtins=BUILTIN_INTENTS)
 
 
 def reload_self() -> None:
     """Reload the current process."""
-    logger.info("Reloading process...")
-    python = sys.executable
-    os.execv(python, [python] + sys.argv)
+    restart_process()
+
+
+def hot_reload() -> None:
+    """Swap the freshly appended Catalog functions into the running process."""
+    global Catalog
+    Catalog = reload_catalog()
+
+
+async def run_pending_calls() -> int:
+    """Run the journaled calls that are still pending, oldest first. Returns how many succeeded."""
+    completed = 0
+    while True:
+        entry = journal.claim_next()
+        if entry is None:
+            return completed
+        if not function_exists(entry.call):
+            logger.warning(f"Skipping pending call {entry.call}: not in the catalog")
+            journal.fail(entry.id, "not in the catalog")
+            continue
+        logger.info(f"Executing function: {entry.call}")
+        try:
+            with stage("execute", call=entry.call):
+                await run_function(Catalog, entry.call, entry.kwargs)
+        except Exception as e:
+            logger.exception(f"Pending call {entry.call} failed: {e}")
+            journal.fail(entry.id, str(e))
+            continue
+        journal.complete(entry.id)
+        completed += 1
+
+
+def replay_pending_calls() -> None:
+    """
+    Run calls left pending by a previous process, before any new command is accepted.
+
+    Running them first keeps journaled calls ahead of newer commands, and
+    nothing else touches the catalog state while they run.
+    """
+    if journal.pending_count():
+        logger.info(f"Replaying {journal.pending_count()} pending call(s)")
+        asyncio.run(run_pending_calls())
+
+
+async def apply_catalog_changes() -> None:
+    """Make catalog changes live, then run the pending calls."""
+    if not hot_reload_enabled():
+        reload_self()
+        return
+    with stage("reload"):
+        hot_reload()
+    await run_pending_calls()
 
 
 def function_exists(name: str) -> bool:
@@ -49,14 +128,27 @@ def function_exists(name: str) -> bool:
     return hasattr(Catalog, name) and callable(getattr(Catalog, name))
 
 
-def append_to_catalog(code: str) -> None:
-    """Add code to the catalog file."""
-    catalog_path = Path(__file__).parent / "catalog.py"
-    with open(catalog_path, "a", encoding="utf-8") as fp:
-        fp.write(f"\n{code}\n")
+def append_to_catalog(code: str) -> bool:
+    """
+    Store the functions defined in code as catalog modules. Returns True if the catalog changed.
+
+    Raises:
+        StagingError: If the code does not stage.
+    """
+    version = manifest_version()
+    store_functions(code)
+    return manifest_version() != version
+
+
+async def commit_call(call: str, catalog_changed: bool, kwargs: Optional[Dict[str, Any]] = None) -> None:
+    """Journal a call and run it, reloading first if the catalog changed."""
+    journal.append(call, kwargs)
+    if catalog_changed:
+        await apply_catalog_changes()
+    else:
+        await run_pending_calls()
 
 
-@function_tool
 def open_chrome() -> str:
     """Open Google Chrome browser."""
     try:
@@ -66,7 +158,6 @@ def open_chrome() -> str:
         return "Failed to open Chrome"
 
 
-@function_tool
 def create_text_file(filename: str, content: str = "") -> str:
     """Create a text file with optional content."""
     try:
@@ -80,47 +171,38 @@ def create_text_file(filename: str, content: str = "") -> str:
 
 async def process_command(utterance: str) -> None:
     """Process a user command."""
-    logger.info(f"Processing command: {utterance}")
-    
-    # Check if we have a pending task
-    state = load_state()
-    if state:
-        func_name = state.get("call")
-        if func_name and function_exists(func_name):
-            logger.info(f"Executing function: {func_name}")
-            func = getattr(Catalog, func_name)
-            func()
-        # Clear state
-        STATE_PATH.unlink(missing_ok=True)
-        return
-    
-    # For this simple prototype, just handle a few hardcoded commands
-    if "chrome" in utterance.lower() or "browser" in utterance.lower():
-        code = """    @staticmethod
-    def open_chrome() -> str:
-        \"\"\"Open Google Chrome browser.\"\"\"
-        subprocess.run(["open", "-a", "Google Chrome"], check=True)
-        return "Chrome opened successfully"
-"""
-        append_to_catalog(code)
-        save_state({"call": "open_chrome"})
-        reload_self()
-    
-    elif "text file" in utterance.lower() or "create file" in utterance.lower():
-        code = """    @staticmethod
-    def create_text_file() -> str:
-        \"\"\"Create a new text file on the desktop.\"\"\"
-        path = Path.home() / "Desktop" / "new_file.txt"
-        with open(path, "w") as f:
-            f.write("Created by meta-agent")
-        return f"Created file at {path}"
-"""
-        append_to_catalog(code)
-        save_state({"call": "create_text_file"})
-        reload_self()
-    
-    else:
-        logger.info("Command not recognized")
+    with command_trace(utterance):
+        logger.info(f"Processing command: {utterance}")
+        
+        # For this simple prototype, only handle commands in the intent table
+        intent = intent_table.match(utterance, Catalog)
+        if intent is None:
+            logger.info("Command not recognized")
+            return
+        
+        # Built-in functions are stored the first time they are needed; learned ones exist already
+        catalog_changed = False
+        if function_exists(intent.call):
+            parameters = function_parameters(getattr(Catalog, intent.call))
+        elif intent.code:
+            try:
+                with stage("catalog_append", functions=[intent.call]):
+                    catalog_changed = append_to_catalog(intent.code)
+            except StagingError as e:
+                logger.error(f"Not running {intent.call}, its code does not load: {e}")
+                return
+            parameters = parameters_from_code(intent.code)
+        else:
+            logger.warning(f"Not running {intent.call}: not in the catalog")
+            intent_table.forget(intent.call)
+            return
+        # Fill the function's parameters, e.g. the file name, from the command
+        kwargs = extract_arguments(parameters, utterance)
+        missing = missing_arguments(parameters, kwargs)
+        if missing:
+            logger.info(f"No value for {', '.join(missing)} of {intent.call} in: {utterance}")
+            return
+        await commit_call(intent.call, catalog_changed, kwargs)
 
 
 async def manager(utterance: str, transcriber: Optional[LiveTranscriber] = None) -> None:
@@ -131,10 +213,17 @@ async def manager(utterance: str, transcriber: Optional[LiveTranscriber] = None)
 
 def _run_transcriber() -> None:
     """Run the LiveTranscriber."""
+    from livetranscriber import LiveTranscriber
+    
     logger.info("Starting LiveTranscriber...")
+    warm_up()
+    replay_pending_calls()
     tr = LiveTranscriber(callback=manager)
     transcriber_reference["instance"] = tr
-    tr.run()
+    try:
+        tr.run()
+    finally:
+        shutdown()
     logger.info("LiveTranscriber stopped")
 
 
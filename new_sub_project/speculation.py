@@ -0,0 +1,106 @@
+"""Speculative planning on interim transcripts, committed or cancelled on the final one."""
+
+import asyncio
+import logging
+import os
+from difflib import SequenceMatcher
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from . import metrics
+from .plan_cache import normalize_utterance
+from .trace_log import SPECULATION_WORKFLOW_NAME, command_trace, stage
+
+logger = logging.getLogger(__name__)
+
+# Seconds an interim transcript must stay unchanged before planning starts on it
+SPECULATION_DELAY = float(os.environ.get("META_AGENT_SPECULATION_DELAY", "0.3"))
+
+# Minimum similarity (0-1) between the speculated and the final transcript to keep the plan
+SPECULATION_TOLERANCE = float(os.environ.get("META_AGENT_SPECULATION_TOLERANCE", "0.9"))
+
+Planner = Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+
+
+def similarity(a: str, b: str) -> float:
+    """Similarity of two transcripts, ignoring case and punctuation."""
+    return SequenceMatcher(None, normalize_utterance(a), normalize_utterance(b)).ratio()
+
+
+class SpeculativePlanner:
+    """
+    Starts planning while the user is still speaking.
+
+    Every interim transcript resets a short timer; once the transcript has
+    been stable for ``delay`` seconds, ``plan`` runs on it in the background.
+    The final utterance then claims the plan if it is within ``tolerance`` of
+    the speculated text, and cancels it otherwise. Planning must be free of
+    side effects, since a speculative plan may be thrown away. It starts
+    before the final utterance has a trace, so it is traced on its own, and
+    the final utterance's trace records the wait for it.
+    """
+
+    def __init__(self, plan: Planner, delay: float = SPECULATION_DELAY,
+                 tolerance: float = SPECULATION_TOLERANCE):
+        self.plan = plan
+        self.delay = delay
+        self.tolerance = tolerance
+        self._timer: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self._speculated: Optional[str] = None
+
+    def update(self, interim: str) -> None:
+        """Note an interim transcript. Must be called on the event loop."""
+        if self._speculated is not None and similarity(interim, self._speculated) >= self.tolerance:
+            return
+        self.cancel()
+        self._timer = asyncio.ensure_future(self._speculate_when_stable(interim))
+
+    async def _speculate_when_stable(self, text: str) -> None:
+        await asyncio.sleep(self.delay)
+        logger.info(f"Planning speculatively for: {text}")
+        metrics.increment("speculation.started")
+        self._speculated = text
+        self._task = asyncio.ensure_future(self._plan_traced(text))
+
+    async def _plan_traced(self, text: str) -> Optional[Dict[str, Any]]:
+        with command_trace(text, SPECULATION_WORKFLOW_NAME):
+            return await self.plan(text)
+
+    def cancel(self) -> None:
+        """Drop any pending or running speculation."""
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            metrics.increment("speculation.cancelled")
+        self._timer = self._task = self._speculated = None
+
+    async def claim(self, utterance: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the speculative plan for the final utterance.
+
+        Returns:
+            The plan, or None if nothing was speculated, the final utterance
+            differs too much from the speculated text, or speculation failed.
+        """
+        task, speculated = self._task, self._speculated
+        self._task = None
+        self.cancel()
+        if task is None:
+            return None
+        if similarity(utterance, speculated) < self.tolerance:
+            logger.info(f"Discarding speculative plan for: {speculated}")
+            task.cancel()
+            metrics.increment("speculation.mismatched")
+            return None
+        try:
+            with stage("speculative_plan", speculated=speculated):
+                plan = await task
+        except asyncio.CancelledError:
+            return None
+        except Exception as e:
+            logger.warning(f"Speculative planning failed: {e}")
+            return None
+        if plan is not None:
+            metrics.increment("speculation.committed")
+        return plan
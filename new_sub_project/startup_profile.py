@@ -0,0 +1,130 @@
+"""Startup timings recorded by run_assistant.py --profile-startup."""
+
+import builtins
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPORT_PATH = Path("startup_profile.json")
+
+
+def _loaded(name: str, fromlist: Any) -> bool:
+    """Whether an import has nothing left to load, including submodules named in ``from ... import``."""
+    module = sys.modules.get(name)
+    return module is not None and all(hasattr(module, item) for item in fromlist or () if item != "*")
+
+
+class StartupProfiler:
+    """
+    Records import times, phase durations and milestones since process start.
+
+    Imports are timed by wrapping ``builtins.__import__``; only the outermost
+    import of a module that was not loaded yet is counted, attributed to its
+    top-level package, so the figures do not double count nested imports.
+    """
+
+    def __init__(self, path: Path = DEFAULT_REPORT_PATH, started_at: Optional[float] = None):
+        self.path = path
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.imports: Dict[str, float] = {}
+        self.phases: Dict[str, float] = {}
+        self.milestones: Dict[str, float] = {}
+        self._original_import = builtins.__import__
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def install(self) -> None:
+        """Start timing imports."""
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def uninstall(self) -> None:
+        """Stop timing imports."""
+        if builtins.__import__ is self._timed_import:
+            builtins.__import__ = self._original_import
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        depth = getattr(self._local, "depth", 0)
+        if depth or level or _loaded(name, fromlist):
+            return self._original_import(name, globals, locals, fromlist, level)
+        self._local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            self._local.depth = depth
+            top_level = name.partition(".")[0]
+            with self._lock:
+                self.imports[top_level] = self.imports.get(top_level, 0.0) + time.perf_counter() - start
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a block of startup work."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    def mark(self, name: str) -> None:
+        """Record the first time a milestone is reached, relative to process start."""
+        if name not in self.milestones:
+            self.milestones[name] = time.perf_counter() - self.started_at
+            logger.info(f"Startup milestone {name} after {self.milestones[name]:.3f}s")
+            self.save()
+
+    def report(self) -> Dict[str, Any]:
+        """Return the recorded timings, slowest imports first."""
+        imports = dict(sorted(self.imports.items(), key=lambda item: item[1], reverse=True))
+        return {"imports": imports, "phases": dict(self.phases), "milestones": dict(self.milestones)}
+
+    def save(self) -> None:
+        """Write the report to disk."""
+        with self._lock:
+            report = self.report()
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(report, indent=2))
+        tmp_path.replace(self.path)
+
+
+_profiler: Optional[StartupProfiler] = None
+
+
+def enable(path: Path = DEFAULT_REPORT_PATH, started_at: Optional[float] = None) -> StartupProfiler:
+    """Turn on startup profiling for this process; if it is on already, only change the report path."""
+    global _profiler
+    if _profiler is not None:
+        _profiler.path = path
+        return _profiler
+    _profiler = StartupProfiler(path, started_at)
+    _profiler.install()
+    return _profiler
+
+
+def phase(name: str) -> ContextManager[None]:
+    """Time a block of startup work if profiling is enabled."""
+    if _profiler is None:
+        return nullcontext()
+    return _profiler.phase(name)
+
+
+def mark(name: str) -> None:
+    """Record a milestone if profiling is enabled."""
+    if _profiler is not None:
+        _profiler.mark(name)
+
+
+def finish() -> None:
+    """Stop timing imports and write the final report."""
+    if _profiler is None:
+        return
+    _profiler.uninstall()
+    _profiler.save()
+    logger.info(f"Startup profile written to {_profiler.path}")
@@ -0,0 +1,25 @@
+"""Tests for filling function parameters from the values in an utterance."""
+
+from new_sub_project.argument_extractor import extract_arguments, missing_arguments, parameters_from_code
+
+
+def test_names_and_text():
+    parameters = parameters_from_code("def create_text_file(filename: str, content: str = '') -> str:\n    pass")
+    assert extract_arguments(parameters, "create a note called todo.txt saying call the bank") == {
+        "filename": "todo.txt", "content": "call the bank"}
+
+
+def test_numbers_are_converted_to_the_annotated_type():
+    parameters = parameters_from_code("def add(a: int, b: int) -> int:\n    return a + b")
+    assert extract_arguments(parameters, "add 2 and 3") == {"a": 2, "b": 3}
+
+
+def test_urls():
+    parameters = parameters_from_code("def parse_url(url: str) -> str:\n    return url")
+    assert extract_arguments(parameters, "parse the url https://example.com/docs?page=2") == {
+        "url": "https://example.com/docs?page=2"}
+
+
+def test_missing_required_arguments():
+    parameters = parameters_from_code("def parse_url(url: str, strict: bool = False) -> str:\n    return url")
+    assert missing_arguments(parameters, extract_arguments(parameters, "parse the url")) == ["url"]
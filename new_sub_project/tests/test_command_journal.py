@@ -0,0 +1,41 @@
+"""Tests for the durable call journal."""
+
+import time
+
+from new_sub_project import command_journal
+from new_sub_project.command_journal import CommandJournal
+
+
+def test_calls_are_claimed_once_in_order(tmp_path):
+    journal = CommandJournal(tmp_path / "journal.db")
+    first = journal.append("open_notes", {"name": "todo"}, utterance="open my todo note")
+    journal.append("open_chrome")
+    entry = journal.claim_next()
+    assert (entry.id, entry.call, entry.kwargs) == (first, "open_notes", {"name": "todo"})
+    assert entry.details == {"utterance": "open my todo note"}
+    assert journal.claim_next().call == "open_chrome"
+    assert journal.claim_next() is None
+    assert journal.pending_count() == 0
+
+
+def test_recover_interrupts_running_calls_and_prunes_finished_ones(tmp_path, monkeypatch):
+    path = tmp_path / "journal.db"
+    journal = CommandJournal(path)
+    for call in ("done", "running", "failed", "old_failure", "pending"):
+        journal.append(call)
+    journal.complete(journal.claim_next().id)
+    journal.claim_next()
+    journal.fail(journal.claim_next().id, "boom")
+    journal.fail(journal.claim_next().id, "boom")
+    journal._conn.execute("UPDATE calls SET updated_at = ? WHERE call = 'old_failure'",
+                          (time.time() - 30 * 86400,))
+    journal.close()
+
+    monkeypatch.setattr(command_journal, "JOURNAL_RETENTION_DAYS", 7)
+    journal = CommandJournal(path)
+    assert journal.recover() == 1
+    rows = dict(journal._conn.execute("SELECT call, status FROM calls").fetchall())
+    assert rows == {"running": command_journal.INTERRUPTED, "failed": command_journal.FAILED,
+                    "pending": command_journal.PENDING}
+    # Interrupted calls are not run again
+    assert journal.claim_next().call == "pending"
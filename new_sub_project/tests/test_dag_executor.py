@@ -0,0 +1,59 @@
+"""Tests for running plan steps concurrently."""
+
+import asyncio
+from typing import Any, Dict, List
+
+import pytest
+
+from new_sub_project.dag_executor import run_dag, topological_order
+
+
+def run(steps: List[str], dependencies, results: Dict[str, Any] = None):
+    """Run steps that record their order and the results they received."""
+    calls = []
+
+    async def run_step(step: str, upstream: Dict[str, Any]) -> Any:
+        calls.append((step, dict(upstream)))
+        await asyncio.sleep(0)
+        return (results or {}).get(step, step.upper())
+
+    return asyncio.run(run_dag(steps, dependencies, run_step)), calls
+
+
+def test_without_dependencies_steps_run_in_order():
+    results, calls = run(["a", "b", "c"], None)
+    assert [step for step, _ in calls] == ["a", "b", "c"]
+    assert calls[1] == ("b", {"a": "A"})
+    assert results == {"a": "A", "b": "B", "c": "C"}
+
+
+def test_dependencies_pass_results():
+    results, calls = run(["a", "b", "c"], {"c": ["a", "b"]})
+    assert dict(calls)["c"] == {"a": "A", "b": "B"}
+    assert dict(calls)["a"] == {}
+
+
+def test_repeated_step_runs_once_per_occurrence():
+    _, calls = run(["beep", "beep"], None)
+    assert [step for step, _ in calls] == ["beep", "beep"]
+    _, calls = run(["beep", "wait", "beep"], {"beep": ["beep"], "wait": ["beep"]})
+    assert [step for step, _ in calls] == ["beep", "wait", "beep"]
+
+
+def test_cycle_is_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        run(["a", "b"], {"a": ["b"], "b": ["a"]})
+
+
+def test_failed_step_skips_its_dependents_and_is_raised():
+    async def run_step(step: str, upstream: Dict[str, Any]) -> Any:
+        if step == "a":
+            raise RuntimeError("a broke")
+        return step
+
+    with pytest.raises(RuntimeError, match="a broke"):
+        asyncio.run(run_dag(["a", "b"], {"b": ["a"]}, run_step))
+
+
+def test_topological_order():
+    assert topological_order(["c", "b", "a"], {"c": ["b"], "b": ["a"]}) == ["a", "b", "c"]
@@ -0,0 +1,94 @@
+"""Tests for running Catalog functions in worker processes."""
+
+import asyncio
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from new_sub_project import executor_pool
+from new_sub_project.benchmark import PACKAGE_DIR, _ignore_state
+from new_sub_project.executor_pool import ExecutionError, ExecutorPool
+
+FUNCTIONS = '''
+import time
+from pathlib import Path
+
+def make_path(name: str) -> Path:
+    return Path(name)
+
+def echo(value):
+    return value
+
+def make_lambda():
+    return lambda: None
+
+def fail():
+    raise ValueError("broken on purpose")
+
+def sleep_then_return(seconds: float, value: str) -> str:
+    time.sleep(seconds)
+    return value
+'''
+
+
+@pytest.fixture(scope="module")
+def workspace(tmp_path_factory):
+    """A copy of the package whose catalog holds FUNCTIONS."""
+    root = tmp_path_factory.mktemp("workspace")
+    shutil.copytree(PACKAGE_DIR, root / PACKAGE_DIR.name, ignore=_ignore_state)
+    subprocess.run([sys.executable, "-c", "import sys\nfrom new_sub_project.catalog_store import append_to_catalog\n"
+                    "append_to_catalog(sys.stdin.read())"],
+                   input=FUNCTIONS, text=True, cwd=root, check=True)
+    return root
+
+
+@pytest.fixture
+def pool(workspace, monkeypatch):
+    monkeypatch.setattr(executor_pool, "PACKAGE_ROOT", workspace)
+    pool = ExecutorPool(size=1, timeout=10)
+    yield pool
+    pool.stop()
+
+
+def test_results_keep_their_types(pool):
+    async def calls():
+        return (await pool.run("make_path", {"name": "notes.txt"}),
+                await pool.run("echo", {"value": (1, {"a": b"x"})}))
+
+    path, value = asyncio.run(calls())
+    assert path == Path("notes.txt")
+    assert value == (1, {"a": b"x"})
+
+
+def test_errors_are_raised(pool):
+    with pytest.raises(ExecutionError, match="broken on purpose"):
+        asyncio.run(pool.run("fail"))
+
+
+def test_unpicklable_result_is_an_error(pool):
+    with pytest.raises(ExecutionError, match="cannot be passed back"):
+        asyncio.run(pool.run("make_lambda"))
+
+
+def test_timed_out_call_gets_a_new_worker(pool):
+    async def calls():
+        with pytest.raises(TimeoutError):
+            await pool.run("sleep_then_return", {"seconds": 1, "value": "late"}, timeout=0.2)
+        return await pool.run("echo", {"value": "next"})
+
+    assert asyncio.run(calls()) == "next"
+
+
+def test_cancelled_call_does_not_answer_the_next_one(pool):
+    async def calls():
+        task = asyncio.ensure_future(pool.run("sleep_then_return", {"seconds": 0.5, "value": "cancelled"}))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await pool.run("echo", {"value": "next"})
+
+    assert asyncio.run(calls()) == "next"
@@ -0,0 +1,68 @@
+"""Tests for parsing planner responses, in particular their dependencies."""
+
+from new_sub_project.function_parser import parse_batch_plan, parse_plan, prune_dependencies
+from new_sub_project.plan_schema import CommandPlan, StepDependency
+
+RESPONSE = """
+```python
+def open_notes() -> str:
+    \"\"\"Open the Notes app.\"\"\"
+    return "opened"
+```
+
+Call sequence: open_notes, write_note
+Composite function name: take_note
+Argument text = buy milk
+"""
+
+
+def test_functions_sequence_and_composite_name():
+    plan = parse_plan(RESPONSE)
+    assert list(plan.functions) == ["open_notes"]
+    assert plan.sequence == ["open_notes", "write_note"]
+    assert plan.composite_name == "take_note"
+    assert plan.arguments == {"text": "buy milk"}
+    assert plan.errors == []
+
+
+def test_prose_that_looks_like_a_dependency_keeps_the_steps_in_order():
+    plan = parse_plan(RESPONSE + "Writing depends on Notes being open\n")
+    assert plan.dependencies is None
+
+
+def test_dependencies_between_steps_are_kept():
+    plan = parse_plan("Call sequence: a, b, c\nc depends on a, b\nb runs after `missing`\n")
+    assert plan.dependencies == {"c": ["a", "b"]}
+
+
+def test_declared_independent_steps():
+    plan = parse_plan("Call sequence: a, b\nDependencies: none\n")
+    assert plan.dependencies == {}
+
+
+def test_prune_dependencies():
+    assert prune_dependencies({"b": ["a", "a", "b", "x"], "x": ["a"], "c": []}, ["a", "b", "c"]) == {"b": ["a"]}
+
+
+def test_invalid_code_block_is_reported():
+    plan = parse_plan("```python\ndef broken(:\n```\nCall sequence: broken\n")
+    assert plan.functions == {}
+    assert len(plan.errors) == 1
+
+
+def test_batch_plan_sections():
+    plans = parse_batch_plan("Command 1:\nCall sequence: a\nCommand 2:\nCall sequence: b, c\nCommand 3:\n", 2)
+    assert {index: plan.sequence for index, plan in plans.items()} == {0: ["a"], 1: ["b", "c"]}
+
+
+def test_structured_plan_without_usable_dependencies_runs_in_order():
+    plan = CommandPlan(new_functions=[], sequence=["a", "b"], composite_name="run_task", arguments=[],
+                       dependencies=[StepDependency(step="b", depends_on=["notes_app"])])
+    assert plan.to_parsed_plan().dependencies is None
+
+
+def test_structured_plan_dependencies():
+    plan = CommandPlan(new_functions=[], sequence=["a", "b", "c"], composite_name="run_task", arguments=[],
+                       dependencies=[StepDependency(step="c", depends_on=["a"]),
+                                     StepDependency(step="c", depends_on=["b"])])
+    assert plan.to_parsed_plan().dependencies == {"c": ["a", "b"]}
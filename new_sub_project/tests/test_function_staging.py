@@ -0,0 +1,57 @@
+"""Tests for staging generated functions before they are stored."""
+
+import importlib.util
+import sys
+
+import pytest
+
+from new_sub_project.function_staging import StagingError, stage_function, write_bytecode
+
+
+def test_missing_imports_of_known_names_are_added():
+    staged = stage_function("home", "def home():\n    return Path.home(), os.getcwd()")
+    assert staged.added_imports == ["import os", "from pathlib import Path"]
+    assert staged.source.startswith("import os\nfrom pathlib import Path\n\ndef home():")
+
+
+@pytest.mark.parametrize("name, source, problem", [
+    ("broken", "def broken(:\n    pass", "invalid Python"),
+    ("uses", "def other():\n    return 1", "does not define a function"),
+    ("uses", "def uses():\n    return undefined_thing", "undefined names undefined_thing"),
+    ("uses", "import no_such_module_here\n\ndef uses():\n    return no_such_module_here.x", "not installed"),
+])
+def test_broken_functions_are_rejected(name, source, problem):
+    with pytest.raises(StagingError, match=problem):
+        stage_function(name, source)
+
+
+def test_reserved_names_are_rejected():
+    with pytest.raises(StagingError, match="reserved"):
+        stage_function("mro", "def mro():\n    return 1")
+
+
+def test_module_body_is_not_run(tmp_path, monkeypatch):
+    marker = tmp_path / "imported"
+    (tmp_path / "noisy_module.py").write_text(f"open({str(marker)!r}, 'w').close()\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    stage_function("uses_noisy", "import noisy_module\n\ndef uses_noisy():\n    return noisy_module")
+    assert not marker.exists()
+
+
+def _import(path):
+    spec = importlib.util.spec_from_file_location("staged_module", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_bytecode_is_checked_against_the_source_hash(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    path = tmp_path / "staged.py"
+    source = b"VALUE = 'source'\n"
+    path.write_bytes(source)
+    write_bytecode(compile("VALUE = 'cached'\n", str(path), "exec"), path, source)
+    assert _import(path).VALUE == "cached"
+    # Same size and, most likely, the same second: only the hash tells them apart
+    path.write_bytes(b"VALUE = 'sourcE'\n")
+    assert _import(path).VALUE == "sourcE"
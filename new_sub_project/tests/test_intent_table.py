@@ -0,0 +1,59 @@
+"""Tests for matching utterances against built-in and learned intents."""
+
+from new_sub_project import plan_cache
+from new_sub_project.intent_table import Intent, IntentTable
+
+
+class Catalog:
+    @staticmethod
+    def create_text_file(filename: str) -> str:
+        return filename
+
+    @staticmethod
+    def open_chrome() -> str:
+        return "opened"
+
+
+class RewrittenCatalog:
+    @staticmethod
+    def create_text_file(filename: str, content: str = "") -> str:
+        return filename
+
+
+def test_builtin_patterns(tmp_path):
+    table = IntentTable(tmp_path / "intents.json", builtins=[Intent(call="open_chrome", patterns=[["chrome"]])])
+    assert table.match("please open chrome").call == "open_chrome"
+    assert table.match("open safari") is None
+
+
+def test_learned_intent_matches_other_arguments(tmp_path):
+    table = IntentTable(tmp_path / "intents.json")
+    table.learn("create a file called notes.txt", "create_text_file",
+                arguments={"filename": "notes.txt"}, catalog=Catalog)
+    intent = IntentTable(tmp_path / "intents.json").match("create a file called todo.txt", Catalog)
+    assert intent.call == "create_text_file"
+    assert intent.slots == ["filename"]
+
+
+def test_learned_intent_needs_to_cover_the_utterance(tmp_path):
+    table = IntentTable(tmp_path / "intents.json")
+    table.learn("open chrome", "open_chrome", catalog=Catalog)
+    assert table.match("open chrome and delete every bookmark", Catalog) is None
+
+
+def test_stale_intent_is_forgotten(tmp_path, monkeypatch):
+    table = IntentTable(tmp_path / "intents.json")
+    table.learn("create a file called notes.txt", "create_text_file",
+                arguments={"filename": "notes.txt"}, catalog=Catalog)
+    # The function was rewritten since the intent was learned
+    monkeypatch.setattr(plan_cache, "manifest_version", lambda: "changed")
+    assert table.match("create a file called todo.txt", RewrittenCatalog) is None
+    assert IntentTable(tmp_path / "intents.json").intents == []
+
+
+def test_intent_for_missing_function_is_forgotten(tmp_path, monkeypatch):
+    table = IntentTable(tmp_path / "intents.json")
+    table.learn("open chrome", "open_chrome", catalog=Catalog)
+    monkeypatch.setattr(plan_cache, "manifest_version", lambda: "changed")
+    assert table.match("open chrome", RewrittenCatalog) is None
+    assert table.intents == []
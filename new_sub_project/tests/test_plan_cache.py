@@ -0,0 +1,50 @@
+"""Tests for the cache of plans that already ran."""
+
+from new_sub_project import plan_cache
+from new_sub_project.plan_cache import PlanCache
+
+
+class Catalog:
+    @staticmethod
+    def open_notes() -> str:
+        return "opened"
+
+
+class RewrittenCatalog:
+    @staticmethod
+    def open_notes() -> str:
+        return "opened again"
+
+
+def test_hit_returns_the_plan_without_writing(tmp_path):
+    cache = PlanCache(tmp_path / "plan_cache.json")
+    cache.put("Open my notes!", "open_notes", ["open_notes"], Catalog, kwargs={"name": "todo"})
+    cache.path.write_text("not rewritten")
+    entry = cache.get("open my notes", Catalog)
+    assert entry["call"] == "open_notes" and entry["kwargs"] == {"name": "todo"}
+    assert cache.path.read_text() == "not rewritten"
+
+
+def test_entries_of_changed_functions_are_evicted(tmp_path, monkeypatch):
+    cache = PlanCache(tmp_path / "plan_cache.json")
+    cache.put("open my notes", "open_notes", ["open_notes"], Catalog)
+    # Source hashes are read again once the catalog changed on disk
+    monkeypatch.setattr(plan_cache, "manifest_version", lambda: "changed")
+    assert cache.get("open my notes", RewrittenCatalog) is None
+    assert PlanCache(cache.path).get("open my notes", Catalog) is None
+
+
+def test_plans_for_missing_functions_are_not_cached(tmp_path):
+    cache = PlanCache(tmp_path / "plan_cache.json")
+    cache.put("close my notes", "close_notes", ["close_notes"], Catalog)
+    assert cache.get("close my notes", Catalog) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = PlanCache(tmp_path / "plan_cache.json", max_entries=2)
+    for utterance in ("one", "two"):
+        cache.put(utterance, "open_notes", ["open_notes"], Catalog)
+    cache.get("one", Catalog)
+    cache.put("three", "open_notes", ["open_notes"], Catalog)
+    assert cache.get("two", Catalog) is None
+    assert cache.get("one", Catalog) is not None
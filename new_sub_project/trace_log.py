@@ -0,0 +1,119 @@
+"""
+Per-stage tracing of voice commands, written to a local JSONL file.
+
+Every command runs inside an SDK ``trace()`` and each of its stages inside a
+``custom_span``, next to the agent and model spans the SDK records itself.
+A ``JsonlTraceProcessor`` appends every finished span and trace to a file,
+one JSON object per line with its duration in seconds, so the time of each
+command can be broken down without the hosted trace dashboard.
+
+Tracing is off unless enabled with ``enable()`` or META_AGENT_TRACE_PATH.
+The SDK is imported by ``enable()`` or ``install()`` at startup, so the first
+traced command does not wait for it.
+
+Work done for a command in another task, such as a planning batch, must run
+in the context of that command's trace; ``in_context()`` captures it.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Iterator, Optional, TypeVar
+
+from . import metrics
+
+if TYPE_CHECKING:
+    from .trace_processor import JsonlTraceProcessor
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_TRACE_PATH = Path("traces.jsonl")
+
+# Traces are written here when set, e.g. META_AGENT_TRACE_PATH=traces.jsonl
+TRACE_PATH = os.environ.get("META_AGENT_TRACE_PATH", "")
+
+WORKFLOW_NAME = "Voice command"
+# Planning on interim transcripts runs before the command it is for has a trace
+SPECULATION_WORKFLOW_NAME = "Speculative plan"
+
+_path: Optional[Path] = Path(TRACE_PATH) if TRACE_PATH else None
+_processor: Optional["JsonlTraceProcessor"] = None
+
+
+def enable(path: Path = DEFAULT_TRACE_PATH) -> None:
+    """Trace every following command to ``path``, importing the SDK now."""
+    global _path
+    _path = path
+    install()
+
+
+def install() -> bool:
+    """Register the file processor with the SDK unless done already; False if tracing is off."""
+    global _processor
+    if _path is None:
+        return False
+    if _processor is None:
+        from agents import add_trace_processor
+        from .trace_processor import JsonlTraceProcessor
+
+        _processor = JsonlTraceProcessor(_path)
+        add_trace_processor(_processor)
+        logger.info(f"Writing command traces to {_path}")
+    return True
+
+
+@contextmanager
+def command_trace(utterance: str, workflow: str = WORKFLOW_NAME) -> Iterator[None]:
+    """
+    Run the handling of one command inside a trace.
+
+    The trace starts with a "transcription_received" span that records the
+    utterance and how long the trace setup itself took.
+    """
+    received = time.perf_counter()
+    if not install():
+        yield
+        return
+    from agents import custom_span, trace
+
+    with trace(workflow, metadata={"utterance": utterance}):
+        with custom_span("transcription_received",
+                         data={"utterance": utterance, "setup_seconds": time.perf_counter() - received}):
+            pass
+        yield
+
+
+@contextmanager
+def stage(name: str, **data: Any) -> Iterator[None]:
+    """
+    Time one stage of a command.
+
+    The duration is recorded in metrics as ``stage.<name>``. While tracing,
+    the stage is also a custom span, carrying ``data``, in the current trace.
+    """
+    with metrics.timed(f"stage.{name}"):
+        if _processor is None:
+            span = nullcontext()
+        else:
+            from agents import custom_span
+
+            span = custom_span(name, data=data)
+        with span:
+            yield
+
+
+def in_context(context: contextvars.Context, work: Callable[[], Awaitable[T]]) -> "asyncio.Task[T]":
+    """
+    Start ``work`` as a task in ``context``, captured with ``contextvars.copy_context()``.
+
+    Spans of the task then belong to the trace, and nest under the span,
+    that were current where the context was captured, rather than where the
+    task happens to be started.
+    """
+    return context.run(lambda: asyncio.ensure_future(work()))
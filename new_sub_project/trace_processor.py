@@ -0,0 +1,69 @@
+"""Trace processor that appends finished traces and spans to a local JSONL file."""
+
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from agents import Span, Trace, TracingProcessor
+
+
+def _now() -> str:
+    return datetime.now().astimezone().isoformat()
+
+
+def _duration(started_at: Optional[str], ended_at: Optional[str]) -> Optional[float]:
+    """Seconds between two ISO timestamps, or None if either is missing."""
+    if not started_at or not ended_at:
+        return None
+    return (datetime.fromisoformat(ended_at) - datetime.fromisoformat(started_at)).total_seconds()
+
+
+class JsonlTraceProcessor(TracingProcessor):
+    """
+    Writes one JSON object per finished span or trace, as exported by the SDK.
+
+    Every record gets a ``duration`` in seconds. Traces do not carry
+    timestamps of their own, so their start and end are recorded here.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = path.open("a", encoding="utf-8")
+        self._trace_starts: Dict[str, str] = {}
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._file.write(json.dumps(record, default=str) + "\n")
+            self._file.flush()
+
+    def on_trace_start(self, trace: Trace) -> None:
+        self._trace_starts[trace.trace_id] = _now()
+
+    def on_trace_end(self, trace: Trace) -> None:
+        started_at = self._trace_starts.pop(trace.trace_id, None)
+        exported = trace.export()
+        if exported is None:
+            return
+        ended_at = _now()
+        self._write({**exported, "started_at": started_at, "ended_at": ended_at,
+                     "duration": _duration(started_at, ended_at)})
+
+    def on_span_start(self, span: Span[Any]) -> None:
+        pass
+
+    def on_span_end(self, span: Span[Any]) -> None:
+        exported = span.export()
+        if exported is None:
+            return
+        self._write({**exported, "duration": _duration(exported.get("started_at"), exported.get("ended_at"))})
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def force_flush(self) -> None:
+        with self._lock:
+            self._file.flush()
@@ -0,0 +1,116 @@
+"""
+Per-function usage statistics of the Catalog, persisted across restarts.
+
+Calls are counted in memory and written out at most every
+``USAGE_FLUSH_INTERVAL`` seconds, on ``flush()`` and at exit. Writing merges
+this process's new counts into the file under the catalog lock, so processes
+that record usage side by side, such as fork-server children, do not
+overwrite each other's counts.
+"""
+
+import atexit
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .catalog_store import catalog_lock
+
+logger = logging.getLogger(__name__)
+
+USAGE_PATH = Path(__file__).parent / "catalog" / "usage.json"
+
+# Seconds between writes of the recorded usage
+USAGE_FLUSH_INTERVAL = float(os.environ.get("META_AGENT_USAGE_FLUSH_INTERVAL", "10"))
+
+COUNTERS = ("calls", "errors", "timed_calls", "total_time")
+
+
+def _load() -> Dict[str, Dict[str, Any]]:
+    """Load previously recorded usage from disk."""
+    if not USAGE_PATH.exists():
+        return {}
+    try:
+        return json.loads(USAGE_PATH.read_text())
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable usage file: {e}")
+        return {}
+
+
+_usage = _load()
+# Usage recorded since the last flush, merged into the file by the next one
+_unsaved: Dict[str, Dict[str, Any]] = {}
+_flushed_at = time.monotonic()
+
+
+def _new_stats() -> Dict[str, Any]:
+    return {"calls": 0, "errors": 0, "timed_calls": 0, "total_time": 0.0, "last_used": 0.0}
+
+
+def _add(usage: Dict[str, Dict[str, Any]], name: str, delta: Dict[str, Any]) -> None:
+    """Add counts to a function's stats."""
+    stats = usage.setdefault(name, _new_stats())
+    # Stats written before timed calls were counted separately timed every call
+    stats.setdefault("timed_calls", stats.get("calls", 0))
+    for counter in COUNTERS:
+        stats[counter] = stats.get(counter, 0) + delta[counter]
+    stats["last_used"] = max(stats.get("last_used", 0.0), delta["last_used"])
+
+
+def _record(name: str, delta: Dict[str, Any]) -> None:
+    _add(_usage, name, delta)
+    _add(_unsaved, name, delta)
+    if time.monotonic() - _flushed_at >= USAGE_FLUSH_INTERVAL:
+        flush()
+
+
+def record_call(name: str, seconds: float, ok: bool = True) -> None:
+    """Record one timed execution of a Catalog function."""
+    _record(name, {"calls": 1, "errors": 0 if ok else 1, "timed_calls": 1, "total_time": seconds,
+                   "last_used": time.time()})
+
+
+def record_use(name: str) -> None:
+    """Record that a function ran as a step of another one, whose call was timed instead."""
+    _record(name, {"calls": 1, "errors": 0, "timed_calls": 0, "total_time": 0.0, "last_used": time.time()})
+
+
+def get(name: str) -> Optional[Dict[str, Any]]:
+    """Usage of one function, with its average latency, or None if it never ran."""
+    stats = _usage.get(name)
+    if stats is None:
+        return None
+    timed_calls = stats.get("timed_calls", stats["calls"])
+    return dict(stats, average_time=stats["total_time"] / timed_calls if timed_calls else None)
+
+
+def call_count(name: str) -> int:
+    """Number of times a function ran."""
+    return _usage.get(name, {}).get("calls", 0)
+
+
+def last_used(name: str) -> Optional[float]:
+    """Time a function last ran, as a Unix timestamp, or None if it never ran."""
+    return _usage.get(name, {}).get("last_used")
+
+
+def flush() -> None:
+    """Merge the usage recorded since the last flush into the file on disk."""
+    global _usage, _flushed_at
+    _flushed_at = time.monotonic()
+    if not _unsaved:
+        return
+    with catalog_lock():
+        usage = _load()
+        for name, delta in _unsaved.items():
+            _add(usage, name, delta)
+        tmp_path = USAGE_PATH.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(usage, indent=2, sort_keys=True))
+        tmp_path.replace(USAGE_PATH)
+    _unsaved.clear()
+    _usage = usage
+
+
+atexit.register(flush)
@@ -0,0 +1,148 @@
+"""Bounded utterance queue processed on a dedicated asyncio event-loop thread."""
+
+import asyncio
+import logging
+import os
+import threading
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from .plan_cache import normalize_utterance
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(os.environ.get("META_AGENT_QUEUE_SIZE", "8"))
+WORKERS = int(os.environ.get("META_AGENT_WORKERS", "2"))
+
+# "coalesce" skips utterances already waiting in the queue and drops the oldest one
+# when full; "drop_oldest" only does the latter; "drop_newest" rejects new utterances when full
+OVERFLOW_POLICY = os.environ.get("META_AGENT_QUEUE_OVERFLOW", "coalesce").lower()
+
+
+class UtteranceQueue:
+    """
+    Hands utterances from the transcriber thread to async workers.
+
+    ``submit()`` never blocks, so the audio thread keeps running under bursty
+    speech. Workers run on their own event loop; utterances for the same
+    command are processed one at a time and in arrival order, while different
+    commands may run concurrently.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str], Awaitable[None]],
+        maxsize: int = QUEUE_SIZE,
+        workers: int = WORKERS,
+        overflow: str = OVERFLOW_POLICY,
+    ):
+        self.handler = handler
+        self.maxsize = maxsize
+        self.workers = max(workers, 1)
+        self.overflow = overflow
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._pending: Counter = Counter()
+        self._active: Counter = Counter()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Utterances set aside for hand_over() instead of being queued
+        self._held: Optional[List[str]] = None
+
+    def start(self) -> None:
+        """Start the event-loop thread and its workers."""
+        self._thread = threading.Thread(target=self._run_loop, name="utterance-queue", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the workers and the event-loop thread."""
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, utterance: str) -> None:
+        """Queue an utterance from any thread without blocking."""
+        if self.loop is None:
+            raise RuntimeError("UtteranceQueue has not been started")
+        self.loop.call_soon_threadsafe(self._enqueue, utterance)
+
+    async def hand_over(self) -> List[str]:
+        """
+        Stop taking new work and return every utterance not processed yet.
+
+        Utterances still waiting in the queue, and any submitted while those
+        already being processed finish, are returned. Must run on the queue's
+        event loop. Callers must stop submitting before they call it:
+        ``submit()`` schedules onto this loop in order, so every utterance
+        submitted earlier is included, but one submitted after it returned
+        is not.
+        """
+        self._held = []
+        while not self._queue.empty():
+            _, utterance = self._queue.get_nowait()
+            self._queue.task_done()
+            self._held.append(utterance)
+        self._pending.clear()
+        await self._queue.join()
+        return self._held
+
+    def _run_loop(self) -> None:
+        """Body of the event-loop thread."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        for i in range(self.workers):
+            self.loop.create_task(self._worker(i))
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            for task in asyncio.all_tasks(self.loop):
+                task.cancel()
+            self.loop.run_until_complete(asyncio.sleep(0))
+            self.loop.close()
+
+    def _enqueue(self, utterance: str) -> None:
+        """Add an utterance to the queue, applying the overflow policy."""
+        if self._held is not None:
+            self._held.append(utterance)
+            return
+
+        key = normalize_utterance(utterance)
+        if self.overflow == "coalesce" and self._pending[key]:
+            logger.info(f"Coalesced duplicate utterance: {utterance}")
+            return
+
+        if self._queue.full():
+            if self.overflow == "drop_newest":
+                logger.warning(f"Utterance queue full, dropping: {utterance}")
+                return
+            _, dropped = self._queue.get_nowait()
+            self._queue.task_done()
+            self._pending -= Counter({normalize_utterance(dropped): 1})
+            logger.warning(f"Utterance queue full, dropping oldest: {dropped}")
+
+        self._pending[key] += 1
+        self._queue.put_nowait((key, utterance))
+
+    async def _worker(self, worker_id: int) -> None:
+        """Process queued utterances, one command key at a time."""
+        while True:
+            key, utterance = await self._queue.get()
+            self._pending -= Counter({key: 1})
+            self._active[key] += 1
+            lock = self._locks.setdefault(key, asyncio.Lock())
+            try:
+                async with lock:
+                    await self.handler(utterance)
+            except Exception as e:
+                logger.exception(f"Worker {worker_id} failed to process utterance: {e}")
+            finally:
+                self._active -= Counter({key: 1})
+                if not self._active[key]:
+                    self._locks.pop(key, None)
+                self._queue.task_done()
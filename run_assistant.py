@@ -3,16 +3,31 @@
 Standalone runner for the meta-agent voice assistant.
 """
 
-import asyncio
-import logging
+import time
+
+# Taken before any other import so --profile-startup covers the whole startup
+STARTED_AT = time.perf_counter()
+
 import os
 import sys
-from pathlib import Path
 
 # Add the current directory to the Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from livetranscriber import LiveTranscriber
+from new_sub_project import startup_profile
+
+# Start timing imports before the ones below; main() sets the report path once arguments are parsed
+if any(arg.partition("=")[0] == "--profile-startup" for arg in sys.argv[1:]):
+    startup_profile.enable(started_at=STARTED_AT)
+
+import argparse
+import asyncio
+import importlib.util
+import logging
+from pathlib import Path
+
+from new_sub_project import executor_pool, trace_log
+from new_sub_project.utterance_queue import UtteranceQueue
 
 # Set up logging
 logging.basicConfig(
@@ -46,41 +61,106 @@ async def process_utterance(utterance: str) -> None:
         logger.info("source .venv/bin/activate && uv pip install openai-agents livetranscriber")
 
 
-async def manager(utterance: str, transcriber=None) -> None:
-    """Handle new utterances from the transcriber."""
+async def replay_journal() -> None:
+    """Run calls that a previous process journaled but did not get to run."""
+    try:
+        from new_sub_project.simple_prototype import run_pending_calls
+        await run_pending_calls()
+    except Exception as e:
+        logger.exception(f"Error replaying pending calls: {e}")
+
+
+# Utterances are processed on a dedicated event-loop thread, off the audio thread
+utterance_queue = UtteranceQueue(process_utterance)
+
+
+def manager(utterance: str, transcriber=None) -> None:
+    """Handle new utterances from the transcriber without blocking it."""
+    startup_profile.mark("first_utterance")
     logger.info(f"User said: {utterance}")
-    await process_utterance(utterance)
+    utterance_queue.submit(utterance)
 
 
 def run_transcriber() -> None:
     """Run the voice transcriber."""
     logger.info("Starting LiveTranscriber...")
     logger.info("Listening for voice commands. Press Ctrl+C to stop.")
+    with startup_profile.phase("executor_warm_up"):
+        executor_pool.warm_up()
+    utterance_queue.start()
+    # Journaled calls run before the transcriber can submit new utterances
+    asyncio.run_coroutine_threadsafe(replay_journal(), utterance_queue.loop).result()
     try:
-        tr = LiveTranscriber(callback=manager)
+        with startup_profile.phase("transcriber_connect"):
+            from livetranscriber import LiveTranscriber
+            tr = LiveTranscriber(callback=manager)
         transcriber_reference["instance"] = tr
+        startup_profile.mark("listening")
         tr.run()
     except Exception as e:
         logger.exception(f"Error starting transcriber: {e}")
         logger.info("Make sure your microphone is properly connected and you have necessary permissions")
+    finally:
+        utterance_queue.stop()
+        executor_pool.shutdown()
     logger.info("LiveTranscriber stopped")
 
 
 def check_dependencies() -> bool:
-    """Check if all dependencies are installed."""
-    try:
-        import agents
-        import livetranscriber
-        return True
-    except ImportError as e:
-        logger.error(f"Missing dependency: {e}")
+    """
+    Check if all dependencies are installed.
+
+    Only locates the packages without importing them; the SDK is imported
+    when the first utterance needs the planner.
+    """
+    missing = [name for name in ("agents", "livetranscriber") if importlib.util.find_spec(name) is None]
+    if missing:
+        logger.error(f"Missing dependency: {', '.join(missing)}")
         logger.info("Please install all dependencies:")
         logger.info("source .venv/bin/activate && uv pip install openai-agents livetranscriber")
         return False
+    return True
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Meta-agent voice assistant")
+    parser.add_argument(
+        "--fork-server",
+        action="store_true",
+        help="keep heavy modules imported in a zygote process and fork a fresh child on every reload",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        nargs="?",
+        const=startup_profile.DEFAULT_REPORT_PATH,
+        type=Path,
+        metavar="REPORT",
+        help=f"record import and startup phase timings to REPORT (default: {startup_profile.DEFAULT_REPORT_PATH})",
+    )
+    parser.add_argument(
+        "--trace",
+        nargs="?",
+        const=trace_log.DEFAULT_TRACE_PATH,
+        type=Path,
+        metavar="FILE",
+        help=f"append a trace with per-stage spans of every command to FILE (default: {trace_log.DEFAULT_TRACE_PATH})",
+    )
+    return parser.parse_args()
 
 
 def main() -> None:
     """Main entry point."""
+    args = parse_args()
+    if args.profile_startup:
+        startup_profile.enable(args.profile_startup, STARTED_AT)
+        startup_profile.mark("main")
+    # The tracing SDK is imported now rather than when the first command arrives
+    with startup_profile.phase("trace_setup"):
+        if args.trace:
+            trace_log.enable(args.trace)
+        else:
+            trace_log.install()
     print("="*80)
     print("Meta-Agent Voice Assistant")
     print("="*80)
@@ -98,15 +178,23 @@ def main() -> None:
         sys.exit(1)
     
     # Check dependencies
-    if not check_dependencies():
+    with startup_profile.phase("dependency_check"):
+        dependencies_ok = check_dependencies()
+    if not dependencies_ok:
         sys.exit(1)
     
     try:
-        run_transcriber()
+        if args.fork_server:
+            from new_sub_project.fork_server import run_fork_server
+            run_fork_server(process_utterance, replay_journal)
+        else:
+            run_transcriber()
     except KeyboardInterrupt:
         print("\nExiting...")
     except Exception as e:
         logger.exception(f"Error: {e}")
+    finally:
+        startup_profile.finish()
 
 
 if __name__ == "__main__":